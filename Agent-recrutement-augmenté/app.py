@@ -4,6 +4,7 @@ Application Streamlit pour l'Agent de Recrutement Augmenté.
 import streamlit as st
 import os
 import json
+import time
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -333,18 +334,34 @@ st.markdown("""
 
 # Importation des modules après configuration
 try:
-    from src.parsers.cv_parser import load_all_cvs
-    from src.models.ranking_model import HybridRankingModel
-    from src.utils.report_generator import generate_csv_report, generate_html_report
     from src.utils.comparison import CVComparisonEngine
     from src.utils.logger import logger
     from src.utils.advanced_features import (
-        PerformanceMonitor, SmartScorer, ExperienceAnalyzer, RecommendationEngine
+        ExperienceAnalyzer, RecommendationEngine
     )
+    from src.utils.job_queue import (
+        JobQueue, compute_job_key, start_workers,
+        STATUS_PENDING, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED
+    )
+    from config.settings import config as app_config
 except ImportError as e:
     st.error(f"Erreur d'importation: {e}")
     st.stop()
 
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """File d'attente partagée par toutes les sessions du serveur Streamlit."""
+    queue = JobQueue(app_config.jobs.db_path)
+    if app_config.jobs.autostart_workers:
+        start_workers(
+            app_config.jobs.db_path,
+            app_config.jobs.num_workers,
+            app_config.jobs.poll_interval,
+            app_config.jobs.stale_after_seconds,
+            max_attempts=app_config.jobs.max_attempts
+        )
+    return queue
+
 def main():
     st.title("📊 Agent de Recrutement Augmenté")
     st.markdown("""
@@ -369,6 +386,10 @@ def main():
         st.session_state.ranking_done = False
         st.session_state.ranked_candidates = []
     
+    # Reprise d'une analyse en cours après un rafraîchissement du navigateur
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = st.experimental_get_query_params().get("job", [None])[0]
+    
     # Colonne latérale pour la navigation
     with st.sidebar:
         st.header("🧭 Navigation")
@@ -602,77 +623,83 @@ def show_config_page():
         elif not job_description.strip():
             st.error("Veuillez fournir une description de poste pour lancer l'analyse.")
         else:
-            with st.spinner("Analyse en cours... Veuillez patienter."):
-                try:
-                    monitor = PerformanceMonitor()
-                    
-                    # Démarrage de l'analyse
-                    monitor.start_timer("full_analysis")
-                    
-                    status_text = st.empty()
-                    
-                    status_text.info("📂 Chargement des CVs...")
-                    monitor.start_timer("load_cvs")
-                    cvs = load_all_cvs("data/cv_samples")
-                    monitor.end_timer("load_cvs")
-                    
-                    if not cvs:
-                        st.error("Aucun CV valide n'a pu être chargé. Vérifiez les fichiers dans `data/cv_samples`.")
-                        return
+            try:
+                job_key = compute_job_key("data/cv_samples", job_description)
+                job_id = get_job_queue().submit(
+                    "ranking",
+                    {
+                        "cv_folder": "data/cv_samples",
+                        "job_description": job_description,
+                        "output_dir": "output"
+                    },
+                    job_key
+                )
+                st.session_state.job_id = job_id
+                st.experimental_set_query_params(job=job_id)
+                logger.info(
+                    "Analyse soumise",
+                    module="app",
+                    function="show_config_page",
+                    data={"job_id": job_id, "job_key": job_key}
+                )
+            except Exception as e:
+                st.error(f"Impossible de soumettre l'analyse : {e}")
+                logger.error("Erreur de soumission", module="app", function="show_config_page", error=str(e))
 
-                    status_text.info("🤖 Initialisation du modèle de classement...")
-                    monitor.start_timer("init_model")
-                    ranking_model = HybridRankingModel()
-                    monitor.end_timer("init_model")
+    if st.session_state.get("job_id"):
+        show_job_status(st.session_state.job_id)
 
-                    status_text.info("🏢 Détection de l'industrie...")
-                    industry = SmartScorer.detect_industry(job_description)
-                    
-                    status_text.info(f"⚖️ Classement de {len(cvs)} candidat(s)...")
-                    monitor.start_timer("ranking")
-                    ranked = ranking_model.rank_candidates(cvs, job_description)
-                    monitor.end_timer("ranking")
+def show_job_status(job_id: str):
+    """Suit l'avancement d'une analyse exécutée par les workers en arrière-plan."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.warning("Analyse introuvable. Elle a peut-être été supprimée.")
+        st.session_state.job_id = None
+        st.experimental_set_query_params()
+        return
 
-                    status_text.info("📄 Génération des rapports...")
-                    monitor.start_timer("reports")
-                    csv_output = "output/ranking_report.csv"
-                    html_output = "output/ranking_report.html"
-                    generate_csv_report(ranked, csv_output)
-                    generate_html_report(ranked, html_output)
-                    monitor.end_timer("reports")
-                    
-                    monitor.end_timer("full_analysis")
+    if job["status"] in (STATUS_PENDING, STATUS_RUNNING):
+        st.info(f"⏳ {job['message'] or 'Analyse en cours...'}")
+        st.progress(float(job["progress"]))
+        st.caption("Vous pouvez fermer ou rafraîchir la page : l'analyse continue en arrière-plan.")
+        time.sleep(app_config.jobs.poll_interval)
+        st.experimental_rerun()
 
-                    # Sauvegarde des résultats dans la session
-                    st.session_state.ranked_candidates = ranked
-                    st.session_state.ranking_done = True
-                    st.session_state.industry = industry
-                    st.session_state.performance = monitor.get_report()
-                    st.session_state.job_description = job_description
+    elif job["status"] == STATUS_FAILED:
+        st.error(f"Une erreur est survenue durant l'analyse : {job['error']}")
+        st.session_state.job_id = None
+        st.experimental_set_query_params()
 
-                    status_text.success(f"✅ Analyse terminée avec succès en {monitor.get_report()['total_time']:.2f} secondes !")
-                    
-                    logger.info(
-                        "Analyse terminée", 
-                        module="app", 
-                        function="show_config_page",
-                        data={
-                            "candidate_count": len(ranked),
-                            "industry": industry,
-                            "total_time": monitor.get_report()['total_time']
-                        }
-                    )
-                    
-                    st.balloons()
-                    
-                    # Proposer de voir les résultats
-                    if st.button("📊 Voir les résultats", use_container_width=True):
-                        st.session_state.page = "📊 Résultats"
-                        st.experimental_rerun()
+    elif job["status"] == STATUS_COMPLETED:
+        result = job["result"]
+        if st.session_state.get("loaded_job_id") != job_id:
+            # Sauvegarde des résultats dans la session
+            st.session_state.ranked_candidates = result["ranked_candidates"]
+            st.session_state.ranking_done = True
+            st.session_state.industry = result["industry"]
+            st.session_state.performance = result["performance"]
+            st.session_state.job_description = result["job_description"]
+            st.session_state.loaded_job_id = job_id
 
-                except Exception as e:
-                    st.error(f"Une erreur est survenue durant l'analyse : {e}")
-                    logger.error("Erreur d'analyse", module="app", function="show_config_page", error=str(e))
+            logger.info(
+                "Analyse terminée",
+                module="app",
+                function="show_job_status",
+                data={
+                    "job_id": job_id,
+                    "candidate_count": len(result["ranked_candidates"]),
+                    "industry": result["industry"],
+                    "total_time": result["performance"]["total_time"]
+                }
+            )
+            st.balloons()
+
+        st.success(f"✅ Analyse terminée avec succès en {result['performance']['total_time']:.2f} secondes !")
+
+        # Proposer de voir les résultats
+        if st.button("📊 Voir les résultats", use_container_width=True):
+            st.session_state.page = "📊 Résultats"
+            st.experimental_rerun()
 
 def show_results_page():
     """Affiche la page des résultats avec un design moderne."""
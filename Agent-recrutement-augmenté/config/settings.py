@@ -87,6 +87,16 @@ class LoggingConfig:
     backup_count: int = 5
     log_to_console: bool = True
 
+@dataclass
+class JobQueueConfig:
+    """Configuration for the background job queue"""
+    db_path: str = "cache/jobs.db"
+    num_workers: int = 2
+    poll_interval: float = 1.0  # Seconds between two polls of an idle worker
+    stale_after_seconds: int = 300  # Running jobs without heartbeat are requeued
+    max_attempts: int = 3  # Stale jobs are failed instead of requeued after this many attempts
+    autostart_workers: bool = True  # Start local workers from the Streamlit app
+
 @dataclass
 class AppConfig:
     """Main application configuration"""
@@ -109,6 +119,7 @@ class Config:
     extraction: ExtractionConfig = field(default_factory=ExtractionConfig)
     ranking: RankingConfig = field(default_factory=RankingConfig)
     logging: LoggingConfig = field(default_factory=LoggingConfig)
+    jobs: JobQueueConfig = field(default_factory=JobQueueConfig)
     app: AppConfig = field(default_factory=AppConfig)
     
     def __post_init__(self):
@@ -126,6 +137,7 @@ class Config:
             extraction=ExtractionConfig(**config_dict.get('extraction', {})),
             ranking=RankingConfig(**config_dict.get('ranking', {})),
             logging=LoggingConfig(**config_dict.get('logging', {})),
+            jobs=JobQueueConfig(**config_dict.get('jobs', {})),
             app=AppConfig(**config_dict.get('app', {}))
         )
     
@@ -147,6 +159,7 @@ class Config:
             'extraction': self.extraction.__dict__,
             'ranking': self.ranking.__dict__,
             'logging': self.logging.__dict__,
+            'jobs': self.jobs.__dict__,
             'app': self.app.__dict__
         }
     
@@ -0,0 +1,511 @@
+"""
+File d'attente persistante (SQLite) pour les analyses longues.
+
+Les analyses (parsing, OCR, classement) sont exécutées par des processus
+workers indépendants du script Streamlit : un rafraîchissement du navigateur
+n'interrompt plus le travail et plusieurs utilisateurs peuvent suivre la même
+tâche. Les soumissions identiques (même jeu de CVs, même description de poste)
+sont dédupliquées vers une seule tâche active.
+
+Lancement manuel des workers :
+    python -m src.utils.job_queue --workers 2
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+CV_EXTENSIONS = ('.pdf', '.docx')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_jobs_active_key
+    ON jobs (job_key) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS ix_jobs_status_created
+    ON jobs (status, created_at);
+"""
+
+
+def compute_job_key(cv_folder: str, job_description: str) -> str:
+    """
+    Calcule la clé de déduplication d'une analyse.
+
+    La clé dépend du contenu des CVs (et non de leur date de modification)
+    et de la description de poste normalisée.
+
+    Args:
+        cv_folder: Dossier contenant les CVs
+        job_description: Description du poste
+
+    Returns:
+        str: Empreinte SHA-256 hexadécimale
+    """
+    digest = hashlib.sha256()
+    digest.update(" ".join(job_description.split()).encode("utf-8"))
+
+    for filename in list_cv_files(cv_folder):
+        digest.update(b"\0" + filename.encode("utf-8") + b"\0")
+        with open(os.path.join(cv_folder, filename), "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def list_cv_files(cv_folder: str) -> List[str]:
+    """Liste triée des fichiers CV supportés d'un dossier."""
+    if not os.path.isdir(cv_folder):
+        return []
+    return sorted(f for f in os.listdir(cv_folder) if f.lower().endswith(CV_EXTENSIONS))
+
+
+class JobQueue:
+    """File d'attente de tâches stockée dans une base SQLite locale."""
+
+    def __init__(self, db_path: str = "cache/jobs.db"):
+        """
+        Initialise la file d'attente.
+
+        Args:
+            db_path: Chemin du fichier SQLite partagé entre l'UI et les workers
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction en écriture exclusive (BEGIN IMMEDIATE)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, job_type: str, payload: Dict[str, Any], job_key: str) -> str:
+        """
+        Soumet une tâche, ou rattache l'appelant à la tâche active équivalente.
+
+        Args:
+            job_type: Type de tâche (clé de JOB_HANDLERS)
+            payload: Paramètres JSON-sérialisables de la tâche
+            job_key: Clé de déduplication
+
+        Returns:
+            str: Identifiant de la tâche (nouvelle ou existante)
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE job_key = ? AND status IN (?, ?)",
+                (job_key, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is not None:
+                logger.info(f"Tâche déjà active pour la clé {job_key[:12]}: {row['id']}")
+                return row["id"]
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, job_key, job_type, status, payload, message, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job_key, job_type, STATUS_PENDING,
+                 json.dumps(payload, ensure_ascii=False), "En attente d'un worker", time.time())
+            )
+        logger.info(f"Tâche {job_type} soumise: {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'état complet d'une tâche, ou None si inconnue."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row)
+
+    def latest_completed(self, job_key: str) -> Optional[Dict[str, Any]]:
+        """Retourne le dernier résultat terminé pour une clé donnée."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_key = ? AND status = ? "
+                "ORDER BY finished_at DESC LIMIT 1",
+                (job_key, STATUS_COMPLETED)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row)
+
+    def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Réserve atomiquement la plus ancienne tâche en attente.
+
+        Args:
+            worker_id: Identifiant du worker demandeur
+
+        Returns:
+            La tâche réservée, ou None si la file est vide
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (STATUS_PENDING,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, "
+                "started_at = ?, heartbeat_at = ?, message = ? WHERE id = ?",
+                (STATUS_RUNNING, worker_id, now, now, "Démarrage", row["id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._row_to_job(job)
+
+    def update_progress(self, job_id: str, worker_id: str, progress: float, message: str = "") -> None:
+        """Enregistre l'avancement (0.0 - 1.0) et rafraîchit le heartbeat."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = ? AND worker_id = ?",
+                (min(max(progress, 0.0), 1.0), message, time.time(), job_id, STATUS_RUNNING, worker_id)
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        """
+        Marque une tâche comme terminée et stocke son résultat.
+
+        Sans effet si la tâche n'est plus détenue par ce worker (relancée
+        après expiration de son heartbeat) : le résultat est alors ignoré.
+
+        Returns:
+            bool: True si le résultat a été enregistré
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1.0, message = ?, result = ?, "
+                "finished_at = ?, heartbeat_at = ? WHERE id = ? AND status = ? AND worker_id = ?",
+                (STATUS_COMPLETED, "Terminé", json.dumps(result, ensure_ascii=False, default=str),
+                 now, now, job_id, STATUS_RUNNING, worker_id)
+            )
+            applied = cursor.rowcount == 1
+        if not applied:
+            logger.warning(f"[{worker_id}] Résultat ignoré : la tâche {job_id} ne lui est plus attribuée")
+        return applied
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Marque une tâche comme échouée (mêmes conditions que `complete`).
+
+        Returns:
+            bool: True si l'échec a été enregistré
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, error = ?, finished_at = ?, "
+                "heartbeat_at = ? WHERE id = ? AND status = ? AND worker_id = ?",
+                (STATUS_FAILED, "Échec", error, now, now, job_id, STATUS_RUNNING, worker_id)
+            )
+            applied = cursor.rowcount == 1
+        if not applied:
+            logger.warning(f"[{worker_id}] Échec ignoré : la tâche {job_id} ne lui est plus attribuée")
+        return applied
+
+    def requeue_stale(self, stale_after_seconds: float, max_attempts: int = 3) -> int:
+        """
+        Remet en attente les tâches dont le worker ne donne plus signe de vie.
+
+        Une tâche ayant déjà épuisé ses `max_attempts` tentatives est marquée
+        en échec plutôt que relancée (CV faisant planter le worker, par exemple).
+
+        Returns:
+            int: Nombre de tâches remises en attente
+        """
+        now = time.time()
+        threshold = now - stale_after_seconds
+        with self._transaction() as conn:
+            abandoned = conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, message = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (STATUS_FAILED, "Échec", f"Worker arrêté à chacune des {max_attempts} tentatives",
+                 now, STATUS_RUNNING, threshold, max_attempts)
+            ).rowcount
+            count = conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, message = ? "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (STATUS_PENDING, "Relancée après arrêt du worker", STATUS_RUNNING, threshold)
+            ).rowcount
+        if abandoned:
+            logger.error(f"{abandoned} tâche(s) abandonnée(s) après {max_attempts} tentatives")
+        if count:
+            logger.warning(f"{count} tâche(s) bloquée(s) remise(s) en attente")
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Nombre de tâches par statut."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+
+ProgressCallback = Callable[[float, str], None]
+
+
+def run_ranking_job(payload: Dict[str, Any], report_progress: ProgressCallback) -> Dict[str, Any]:
+    """
+    Exécute une analyse complète : parsing/OCR, classement et rapports.
+
+    Args:
+        payload: {"cv_folder", "job_description", "output_dir"}
+        report_progress: Callback d'avancement (fraction, message)
+
+    Returns:
+        Dict[str, Any]: Candidats classés, industrie détectée et métriques
+    """
+    from src.parsers.cv_parser import parse_cv
+    from src.models.ranking_model import HybridRankingModel
+    from src.utils.report_generator import generate_csv_report, generate_html_report
+    from src.utils.advanced_features import PerformanceMonitor, SmartScorer
+
+    cv_folder = payload["cv_folder"]
+    job_description = payload["job_description"]
+    output_dir = payload.get("output_dir", "output")
+
+    monitor = PerformanceMonitor()
+    monitor.start_timer("full_analysis")
+
+    filenames = list_cv_files(cv_folder)
+    if not filenames:
+        raise ValueError(f"Aucun CV trouvé dans {cv_folder}")
+    total_steps = 2 * len(filenames) + 2
+
+    # Parsing et OCR : première moitié de l'avancement
+    monitor.start_timer("load_cvs")
+    cvs = []
+    for index, filename in enumerate(filenames):
+        report_progress(index / total_steps, f"📂 Lecture de {filename}")
+        cv_data = parse_cv(os.path.join(cv_folder, filename))
+        if cv_data["text"]:
+            cvs.append(cv_data)
+    monitor.end_timer("load_cvs")
+
+    if not cvs:
+        raise ValueError("Aucun CV valide n'a pu être chargé")
+
+    report_progress(len(filenames) / total_steps, "🤖 Initialisation du modèle de classement")
+    monitor.start_timer("init_model")
+    ranking_model = HybridRankingModel()
+    monitor.end_timer("init_model")
+    industry = SmartScorer.detect_industry(job_description)
+
+    # Classement candidat par candidat pour suivre l'avancement
+    monitor.start_timer("ranking")
+    ranked = []
+    for index, cv in enumerate(cvs):
+        report_progress((len(filenames) + 1 + index) / total_steps,
+                        f"⚖️ Classement de {cv['filename']} ({index + 1}/{len(cvs)})")
+        ranked.extend(ranking_model.rank_candidates([cv], job_description))
+    ranked.sort(key=lambda x: x["score"], reverse=True)
+    monitor.end_timer("ranking")
+
+    report_progress((total_steps - 1) / total_steps, "📄 Génération des rapports")
+    monitor.start_timer("reports")
+    os.makedirs(output_dir, exist_ok=True)
+    generate_csv_report(ranked, os.path.join(output_dir, "ranking_report.csv"))
+    generate_html_report(ranked, os.path.join(output_dir, "ranking_report.html"))
+    monitor.end_timer("reports")
+
+    monitor.end_timer("full_analysis")
+
+    return {
+        "ranked_candidates": ranked,
+        "industry": industry,
+        "performance": monitor.get_report(),
+        "job_description": job_description
+    }
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any], ProgressCallback], Any]] = {
+    "ranking": run_ranking_job,
+}
+
+
+class JobWorker:
+    """Worker qui consomme la file d'attente et exécute les tâches."""
+
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None,
+                 poll_interval: float = 1.0, stale_after_seconds: float = 300,
+                 max_attempts: int = 3):
+        self.queue = queue
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.stale_after_seconds = stale_after_seconds
+        self.max_attempts = max_attempts
+
+    def run_once(self) -> bool:
+        """
+        Exécute au plus une tâche.
+
+        Returns:
+            bool: True si une tâche a été traitée
+        """
+        self.queue.requeue_stale(self.stale_after_seconds, self.max_attempts)
+        job = self.queue.claim_next(self.worker_id)
+        if job is None:
+            return False
+
+        job_id = job["id"]
+        handler = JOB_HANDLERS.get(job["job_type"])
+        if handler is None:
+            self.queue.fail(job_id, self.worker_id, f"Type de tâche inconnu: {job['job_type']}")
+            return True
+
+        logger.info(f"[{self.worker_id}] Début de la tâche {job_id} ({job['job_type']})")
+        try:
+            result = handler(
+                job["payload"],
+                lambda progress, message="": self.queue.update_progress(
+                    job_id, self.worker_id, progress, message
+                )
+            )
+            if self.queue.complete(job_id, self.worker_id, result):
+                logger.info(f"[{self.worker_id}] Tâche {job_id} terminée")
+        except Exception as e:
+            logger.error(f"[{self.worker_id}] Tâche {job_id} échouée: {e}")
+            self.queue.fail(job_id, self.worker_id, str(e))
+        return True
+
+    def run_forever(self, stop_event=None) -> None:
+        """Boucle principale du worker."""
+        while stop_event is None or not stop_event.is_set():
+            try:
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"[{self.worker_id}] Base de tâches indisponible: {e}")
+                time.sleep(self.poll_interval)
+
+
+def _worker_main(db_path: str, poll_interval: float, stale_after_seconds: float,
+                 max_attempts: int) -> None:
+    """Point d'entrée d'un processus worker."""
+    JobWorker(JobQueue(db_path), poll_interval=poll_interval,
+              stale_after_seconds=stale_after_seconds, max_attempts=max_attempts).run_forever()
+
+
+def start_workers(db_path: str, num_workers: int = 2, poll_interval: float = 1.0,
+                  stale_after_seconds: float = 300, daemon: bool = True,
+                  max_attempts: int = 3) -> List[multiprocessing.Process]:
+    """
+    Démarre des processus workers locaux.
+
+    Args:
+        db_path: Chemin de la base SQLite des tâches
+        num_workers: Nombre de processus
+        poll_interval: Délai entre deux interrogations d'une file vide
+        stale_after_seconds: Délai sans heartbeat avant relance d'une tâche
+        daemon: Arrêter les workers avec le processus parent
+        max_attempts: Nombre de tentatives avant abandon d'une tâche relancée
+
+    Returns:
+        List[multiprocessing.Process]: Processus démarrés
+    """
+    JobQueue(db_path)  # Création du schéma avant le démarrage concurrent
+    processes = []
+    for _ in range(num_workers):
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(db_path, poll_interval, stale_after_seconds, max_attempts),
+            daemon=daemon
+        )
+        process.start()
+        processes.append(process)
+    logger.info(f"{num_workers} worker(s) démarré(s) sur {db_path}")
+    return processes
+
+
+def main():
+    from config.settings import config
+
+    parser = argparse.ArgumentParser(description="Workers de la file d'analyses")
+    parser.add_argument("--db", default=config.jobs.db_path, help="Base SQLite des tâches")
+    parser.add_argument("--workers", type=int, default=config.jobs.num_workers, help="Nombre de processus")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=config.logging.format)
+    processes = start_workers(args.db, args.workers, config.jobs.poll_interval,
+                              config.jobs.stale_after_seconds, daemon=False,
+                              max_attempts=config.jobs.max_attempts)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Tests unitaires pour la file d'attente des analyses.
+"""
+import unittest
+import os
+import tempfile
+import time
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import job_queue
+from src.utils.job_queue import (
+    JobQueue, JobWorker, compute_job_key,
+    STATUS_PENDING, STATUS_RUNNING, STATUS_COMPLETED, STATUS_FAILED
+)
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test de la file d'attente SQLite."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.temp_dir.name, "jobs.db"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_duplicate_submission_returns_active_job(self):
+        """Deux soumissions identiques partagent la même tâche active."""
+        first = self.queue.submit("ranking", {"a": 1}, "key-1")
+        second = self.queue.submit("ranking", {"a": 1}, "key-1")
+        other = self.queue.submit("ranking", {"a": 2}, "key-2")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.queue.stats(), {STATUS_PENDING: 2})
+
+    def test_finished_job_allows_resubmission(self):
+        """Une tâche terminée ne bloque plus une nouvelle soumission."""
+        first = self.queue.submit("ranking", {}, "key-1")
+        self.queue.claim_next("worker")
+        self.queue.complete(first, "worker", {"ok": True})
+
+        second = self.queue.submit("ranking", {}, "key-1")
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.queue.latest_completed("key-1")["result"], {"ok": True})
+
+    def test_claim_progress_and_complete(self):
+        """Cycle de vie complet d'une tâche."""
+        job_id = self.queue.submit("ranking", {"cv_folder": "x"}, "key-1")
+
+        job = self.queue.claim_next("worker-1")
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["status"], STATUS_RUNNING)
+        self.assertEqual(job["payload"], {"cv_folder": "x"})
+        self.assertIsNone(self.queue.claim_next("worker-2"))
+
+        self.queue.update_progress(job_id, "worker-1", 0.5, "Moitié")
+        job = self.queue.get(job_id)
+        self.assertEqual(job["progress"], 0.5)
+        self.assertEqual(job["message"], "Moitié")
+
+        self.queue.complete(job_id, "worker-1", {"ranked_candidates": []})
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], STATUS_COMPLETED)
+        self.assertEqual(job["result"], {"ranked_candidates": []})
+
+    def test_requeue_stale_jobs(self):
+        """Les tâches sans heartbeat sont remises en attente."""
+        job_id = self.queue.submit("ranking", {}, "key-1")
+        self.queue.claim_next("worker-1")
+
+        self.assertEqual(self.queue.requeue_stale(stale_after_seconds=60), 0)
+        with patch.object(job_queue.time, "time", return_value=time.time() + 120):
+            self.assertEqual(self.queue.requeue_stale(stale_after_seconds=60), 1)
+
+        job = self.queue.claim_next("worker-2")
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["attempts"], 2)
+
+    def test_stale_worker_cannot_overwrite_retried_job(self):
+        """Le worker d'origine, relancé entre-temps, n'écrase pas la nouvelle tentative."""
+        job_id = self.queue.submit("ranking", {}, "key-1")
+        self.queue.claim_next("worker-1")
+        with patch.object(job_queue.time, "time", return_value=time.time() + 120):
+            self.queue.requeue_stale(stale_after_seconds=60)
+        self.queue.claim_next("worker-2")
+
+        self.queue.update_progress(job_id, "worker-1", 0.9, "Ancien worker")
+        self.assertFalse(self.queue.complete(job_id, "worker-1", {"from": "worker-1"}))
+        self.assertFalse(self.queue.fail(job_id, "worker-1", "Trop tard"))
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], STATUS_RUNNING)
+        self.assertEqual(job["progress"], 0.0)
+
+        self.assertTrue(self.queue.complete(job_id, "worker-2", {"from": "worker-2"}))
+        self.assertEqual(self.queue.get(job_id)["result"], {"from": "worker-2"})
+
+    def test_requeue_stops_after_max_attempts(self):
+        """Une tâche qui bloque à chaque tentative finit en échec."""
+        job_id = self.queue.submit("ranking", {}, "key-1")
+        for attempt in range(2):
+            self.queue.claim_next(f"worker-{attempt}")
+            with patch.object(job_queue.time, "time", return_value=time.time() + 120):
+                requeued = self.queue.requeue_stale(stale_after_seconds=60, max_attempts=2)
+            self.assertEqual(requeued, 1 - attempt)
+
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], STATUS_FAILED)
+        self.assertIsNone(self.queue.claim_next("worker-3"))
+
+
+class TestJobWorker(unittest.TestCase):
+    """Test de l'exécution des tâches par un worker."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.temp_dir.name, "jobs.db"))
+        self.worker = JobWorker(self.queue, worker_id="test-worker")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_run_once_stores_result(self):
+        """Le résultat du handler est persisté."""
+        def handler(payload, report_progress):
+            report_progress(0.5, "En cours")
+            return {"double": payload["value"] * 2}
+
+        job_id = self.queue.submit("double", {"value": 21}, "key-1")
+        with patch.dict(job_queue.JOB_HANDLERS, {"double": handler}):
+            self.assertTrue(self.worker.run_once())
+
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], STATUS_COMPLETED)
+        self.assertEqual(job["result"], {"double": 42})
+        self.assertFalse(self.worker.run_once())
+
+    def test_run_once_records_failure(self):
+        """Une exception du handler marque la tâche en échec."""
+        def handler(payload, report_progress):
+            raise ValueError("Aucun CV")
+
+        job_id = self.queue.submit("broken", {}, "key-1")
+        with patch.dict(job_queue.JOB_HANDLERS, {"broken": handler}):
+            self.worker.run_once()
+
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], STATUS_FAILED)
+        self.assertEqual(job["error"], "Aucun CV")
+
+
+class TestJobKey(unittest.TestCase):
+    """Test de la clé de déduplication."""
+
+    def test_key_depends_on_cv_content_and_description(self):
+        with tempfile.TemporaryDirectory() as cv_folder:
+            with open(os.path.join(cv_folder, "cv.pdf"), "wb") as f:
+                f.write(b"contenu")
+            key = compute_job_key(cv_folder, "Développeur Python")
+
+            self.assertEqual(key, compute_job_key(cv_folder, "Développeur   Python"))
+            self.assertNotEqual(key, compute_job_key(cv_folder, "Data Scientist"))
+
+            with open(os.path.join(cv_folder, "cv.pdf"), "wb") as f:
+                f.write(b"autre contenu")
+            self.assertNotEqual(key, compute_job_key(cv_folder, "Développeur Python"))
+
+
+if __name__ == '__main__':
+    unittest.main()
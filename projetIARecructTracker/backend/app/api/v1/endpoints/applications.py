@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
 from app.core.database import get_db
+from app.core.pagination import next_cursor, set_pagination_headers
 from app.models.schemas import (
     Application, ApplicationCreate, ApplicationUpdate,
     ApplicationWithEvents, ApplicationFull
@@ -16,11 +17,14 @@ router = APIRouter()
 
 @router.get("/", response_model=List[Application])
 def get_applications(
+    response: Response,
     skip: int = Query(0, ge=0, description="Nombre d'éléments à ignorer"),
     limit: int = Query(50, ge=1, le=100, description="Nombre d'éléments à retourner"),
     status: Optional[str] = Query(None, description="Filtrer par statut"),
     company: Optional[str] = Query(None, description="Filtrer par entreprise"),
     q: Optional[str] = Query(None, description="Recherche textuelle"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor) ; remplace skip"),
+    count: str = Query("none", pattern="^(none|estimated|exact)$", description="Calcul du total (en-tête X-Total-Count)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -38,11 +42,23 @@ def get_applications(
             limit=limit, 
             status=status, 
             company=company, 
-            search_query=q
+            search_query=q,
+            cursor=cursor
+        )
+
+        set_pagination_headers(
+            response,
+            next_cursor(applications, limit, "updated_at"),
+            application_service.count_applications(
+                current_user.id, status=status, company=company, search_query=q, mode=count
+            ),
+            count
         )
         
         logger.info(f"✅ Found {len(applications)} applications for user {current_user.email}")
         return applications
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         from loguru import logger
         logger.error(f"❌ Error in get_applications: {e}")
@@ -157,11 +173,11 @@ def get_applications_summary(
     db: Session = Depends(get_db)
 ):
     """
-    Récupérer un résumé statistique des candidatures
+    Récupérer un résumé statistique des candidatures de l'utilisateur connecté
     """
     try:
         application_service = ApplicationService(db)
-        return application_service.get_applications_summary()
+        return application_service.get_applications_summary(current_user.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime, timezone
+import asyncio
 from uuid import UUID
 from app.core.database import get_db
+from app.core.pagination import next_cursor, set_pagination_headers
 from app.models.schemas import Email, EmailCreate
 from app.models.models import User
 from app.services.email_service import EmailService
+from app.services.email_import_service import EmailImportService
 from app.api.v1.endpoints.auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Email])
 def get_emails(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     unlinked: bool = Query(False, description="Afficher uniquement les emails non liés"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor) ; remplace skip"),
+    count: str = Query("none", pattern="^(none|estimated|exact)$", description="Calcul du total (en-tête X-Total-Count)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -23,29 +30,52 @@ def get_emails(
     """
     try:
         email_service = EmailService(db)
-        return email_service.get_emails(
+        emails = email_service.get_emails(
             user_id=current_user.id,
             skip=skip, 
             limit=limit, 
-            unlinked_only=unlinked
+            unlinked_only=unlinked,
+            cursor=cursor
         )
+        set_pagination_headers(
+            response,
+            next_cursor(emails, limit, "created_at"),
+            email_service.count_emails(current_user.id, unlinked_only=unlinked, mode=count),
+            count
+        )
+        return emails
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/import")
-def import_emails(
+async def import_emails(
     files: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Importer des emails depuis des fichiers .eml ou .mbox pour l'utilisateur connecté
+    Importer des emails depuis des fichiers .eml, .mbox ou .zip (de .eml / .mbox) pour l'utilisateur connecté
+
+    Les messages sont insérés par lots ; le traitement NLP est lancé ensuite
+    en arrière-plan (suivi via GET /nlp/batch-jobs/{nlp_job_id}).
     """
     try:
+        imported_since = datetime.now(timezone.utc)
         email_service = EmailService(db)
-        results = email_service.import_email_files(files, current_user.id)
-        return {"message": f"Import réussi", "results": results}
+        # Analyse et insertions synchrones : hors de la boucle d'événements
+        results = await asyncio.to_thread(email_service.import_email_files, files, current_user.id)
+        imported = sum(result["imported"] for result in results)
+        nlp_job_id = await EmailImportService.schedule_nlp(imported_since, current_user.id) if imported else None
+        return {
+            "message": f"Import réussi",
+            "imported": imported,
+            "already_exists": sum(result["already_exists"] for result in results),
+            "nlp_job_id": nlp_job_id,
+            "results": results
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
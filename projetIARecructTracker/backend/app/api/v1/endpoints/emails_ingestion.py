@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
 from typing import Dict, Any
 from pydantic import BaseModel
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.services.email_ingestion import EmailIngestionService
 from app.services.email_to_application_service import EmailToApplicationService
 from app.nlp.nlp_orchestrator import NLPOrchestrator
 from loguru import logger
+import asyncio
 
 router = APIRouter()
 
@@ -18,7 +21,8 @@ class EmailIngestionRequest(BaseModel):
 @router.post("/ingest")
 async def ingest_emails(
     request: EmailIngestionRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     [DEPRECATED] Ingérer les emails depuis IMAP
@@ -33,21 +37,21 @@ async def ingest_emails(
         # Service d'ingestion
         ingestion_service = EmailIngestionService(db)
         
-        # Ingérer les emails
-        result = ingestion_service.ingest_emails(days_back=request.days_back)
+        # Ingérer les emails (IMAP et session synchrones : hors de la boucle asyncio)
+        result = await asyncio.to_thread(ingestion_service.ingest_emails, days_back=request.days_back)
         
         # Si des emails ont été ingérés et que l'analyse est demandée
         if result["emails_saved"] > 0 and request.analyze_after_ingestion:
             logger.info("Starting NLP analysis of newly ingested emails")
             
             # Analyser les nouveaux emails
-            orchestrator = NLPOrchestrator(db)
+            orchestrator = NLPOrchestrator(async_db)
             
             # Récupérer les emails non classifiés
             from app.models.models import Email
-            unclassified_emails = db.query(Email).filter(
-                Email.classification.is_(None)
-            ).all()
+            unclassified_emails = (await async_db.execute(
+                select(Email).options(undefer(Email.raw_body)).where(Email.classification.is_(None))
+            )).scalars().all()
             
             processed_count = 0
             errors = []
@@ -71,7 +75,7 @@ async def ingest_emails(
                 logger.info("Starting automatic application creation from classified emails")
                 
                 app_service = EmailToApplicationService(db)
-                app_results = app_service.process_classified_emails()
+                app_results = await asyncio.to_thread(app_service.process_classified_emails)
                 
                 result["applications"] = app_results
                 logger.info(f"Created {app_results['created_applications']} applications, linked {app_results['linked_applications']} emails")
@@ -13,7 +13,7 @@ def run_ingestion(db: Session = Depends(get_db)):
     try:
         ingestion_service = IngestionService(db)
         result = ingestion_service.run_ingestion()
-        return {"message": "Ingestion terminée", "result": result}
+        return {"message": "Ingestion planifiée", "result": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from app.core.database import get_db
 from app.models.models import User
 from app.services.intelligent_application_tracker import IntelligentApplicationTracker
@@ -13,6 +13,11 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _email_date(email) -> datetime:
+    """Date d'un email : envoi, à défaut enregistrement en base"""
+    return email.sent_at or email.created_at
+
+
 @router.post("/process-emails", response_model=Dict[str, Any])
 def process_emails_for_applications(
     limit: int = Query(50, description="Nombre maximum d'emails à traiter"),
@@ -131,14 +136,17 @@ def get_application_insights(
         if not application:
             raise HTTPException(status_code=404, detail="Candidature non trouvée")
         
-        # Récupérer les emails liés
-        linked_emails = db.query(Email).filter(Email.application_id == application_id).all()
+        # Récupérer les emails liés, du plus ancien au plus récent
+        linked_emails = sorted(
+            db.query(Email).filter(Email.application_id == application_id).all(),
+            key=_email_date
+        )
         
         # Analyser la progression
         email_timeline = []
-        for email in sorted(linked_emails, key=lambda x: x.received_date):
+        for email in linked_emails:
             email_timeline.append({
-                "date": email.received_date.isoformat(),
+                "date": _email_date(email).isoformat(),
                 "subject": email.subject,
                 "sender": email.sender,
                 "classification": email.classification,
@@ -149,8 +157,8 @@ def get_application_insights(
         response_times = []
         if len(linked_emails) > 1:
             for i in range(1, len(linked_emails)):
-                prev_date = linked_emails[i-1].received_date
-                curr_date = linked_emails[i].received_date
+                prev_date = _email_date(linked_emails[i-1])
+                curr_date = _email_date(linked_emails[i])
                 diff = (curr_date - prev_date).days
                 response_times.append(diff)
         
@@ -161,8 +169,8 @@ def get_application_insights(
         
         # Si pas de réponse depuis longtemps
         if linked_emails:
-            last_email_date = max(email.received_date for email in linked_emails)
-            days_since_last = (datetime.utcnow() - last_email_date).days
+            last_email_date = _email_date(linked_emails[-1])
+            days_since_last = (datetime.now(timezone.utc) - last_email_date).days
             
             if days_since_last > 7 and application.status not in ['REJECTED', 'ACCEPTED']:
                 recommendations.append({
@@ -201,6 +209,8 @@ def get_application_insights(
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des insights: {str(e)}")
         raise HTTPException(
@@ -244,12 +254,12 @@ def simulate_excel_import(
             
             # Calculer des métriques
             email_count = len(emails)
-            last_interaction = max(email.received_date for email in emails) if emails else app.created_at
+            last_interaction = max(_email_date(email) for email in emails) if emails else app.created_at
             
             # Extraire le dernier statut détecté
             latest_status_email = None
             if emails:
-                latest_status_email = max(emails, key=lambda x: x.received_date)
+                latest_status_email = max(emails, key=_email_date)
             
             excel_row = {
                 "ID": app.id,
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
 from typing import Dict, Any, Optional
 from uuid import UUID
-from datetime import datetime, timedelta
-from app.core.database import get_db
+from datetime import datetime, timedelta, timezone
+from app.core.database import get_async_db, get_db
+from app.core.llm_cache import llm_cache
+from app.core.resilience import get_providers_snapshot
 from app.nlp.nlp_orchestrator import NLPOrchestrator
+from app.nlp.batch_jobs import NLPBatchRunner, job_progress
 from app.nlp.matching_service import EmailMatchingService
-from app.models.models import Email, User
+from app.services.stats_service import StatsService
+from app.models.models import Email, NLPBatchJob, User
 from app.api.v1.endpoints.auth import get_current_user
 from pydantic import BaseModel
 
@@ -26,16 +32,19 @@ class BatchProcessRequest(BaseModel):
     days_back: Optional[int] = 30  # Nombre de jours dans le passé
     hours_back: Optional[int] = None  # Nombre d'heures dans le passé (prioritaire si fourni)
     force_reprocess: bool = False  # Forcer le retraitement même si déjà traité
+    background: bool = False  # Retourner immédiatement (suivi via /batch-jobs/{job_id})
+    chunk_size: Optional[int] = None  # Emails par lot (défaut: NLP_BATCH_CHUNK_SIZE)
+    concurrency: Optional[int] = None  # Workers NLP par lot (défaut: NLP_CONCURRENCY)
 
 @router.post("/process")
 async def process_email_nlp(
     email_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Traiter un email avec tous les services NLP
     """
-    email = db.query(Email).filter(Email.id == email_id).first()
+    email = await db.get(Email, email_id, options=[undefer(Email.raw_body)])
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     
@@ -86,7 +95,7 @@ async def classify_email(
 async def find_matching_applications(
     request: MatchingRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Trouver les candidatures correspondant à un email pour l'utilisateur connecté
@@ -98,13 +107,15 @@ async def find_matching_applications(
         request.sender_email,
         current_user.id  # Filtrer par utilisateur
     )
+    # Embeddings des candidatures calculés pendant le matching (cache en base)
+    await db.commit()
     
     return {"matches": matches}
 
 @router.post("/reprocess/{email_id}")
 async def reprocess_email(
     email_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retraiter un email avec les services NLP
@@ -115,21 +126,16 @@ async def reprocess_email(
     return result
 
 @router.get("/stats")
-async def get_nlp_stats(db: Session = Depends(get_db)):
+async def get_nlp_stats(db: AsyncSession = Depends(get_async_db)):
     """
     Statistiques sur le traitement NLP des emails
     """
-    # Statistiques sur les emails traités
-    total_emails = db.query(Email).count()
-    classified_emails = db.query(Email).filter(Email.classification.isnot(None)).count()
-    linked_emails = db.query(Email).filter(Email.application_id.isnot(None)).count()
-    
-    # Répartition par type de classification
-    from sqlalchemy import func
-    classification_stats = db.query(
-        Email.classification,
-        func.count(Email.id).label('count')
-    ).filter(Email.classification.isnot(None)).group_by(Email.classification).all()
+    # Compteurs matérialisés (stats_counters), tous utilisateurs confondus
+    counters = await StatsService.aget_counters(db)
+    email_counters = counters.get("emails", {})
+    total_emails = email_counters.get("total", 0)
+    classified_emails = email_counters.get("classified", 0)
+    linked_emails = email_counters.get("linked", 0)
     
     return {
         "total_emails": total_emails,
@@ -137,58 +143,135 @@ async def get_nlp_stats(db: Session = Depends(get_db)):
         "linked_emails": linked_emails,
         "classification_rate": classified_emails / total_emails if total_emails > 0 else 0,
         "linking_rate": linked_emails / total_emails if total_emails > 0 else 0,
-        "classification_breakdown": {
-            result.classification: result.count for result in classification_stats
-        }
+        "classification_breakdown": counters.get("email_classification", {})
+    }
+
+@router.get("/providers")
+async def get_llm_providers_status(provider: Optional[str] = Query(None, description="mistral ou gemini")):
+    """
+    État des fournisseurs LLM : disjoncteur, histogrammes de latence
+    (cumulatifs, par issue) et compteurs du cache de réponses
+    """
+    return {
+        "providers": get_providers_snapshot(provider),
+        "cache": dict(llm_cache.stats)
     }
 
 @router.post("/batch-process")
 async def batch_process_emails(
     request: BatchProcessRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Traiter en lot les emails d'un intervalle de temps donné
+    
+    Les emails sont traités par lots avec point de reprise (table
+    nlp_batch_jobs). Avec `background=true`, la réponse est immédiate et la
+    progression se suit via GET /nlp/batch-jobs/{job_id}.
     """
     # Calculer la date de début selon l'intervalle
     if request.hours_back is not None:
-        start_date = datetime.utcnow() - timedelta(hours=request.hours_back)
+        start_date = datetime.now(timezone.utc) - timedelta(hours=request.hours_back)
     else:
-        start_date = datetime.utcnow() - timedelta(days=request.days_back or 30)
-    
-    # Récupérer les emails dans l'intervalle
-    query = db.query(Email).filter(Email.created_at >= start_date)
-    
-    # Si force_reprocess est False, exclure les emails déjà traités
-    if not request.force_reprocess:
-        query = query.filter(Email.classification.is_(None))
+        start_date = datetime.now(timezone.utc) - timedelta(days=request.days_back or 30)
+    interval = f"Derniers {request.hours_back} heures" if request.hours_back else f"Derniers {request.days_back} jours"
     
-    emails_to_process = query.all()
+    job = await NLPBatchRunner.create_job(
+        db,
+        start_date,
+        force_reprocess=request.force_reprocess,
+        chunk_size=request.chunk_size,
+        concurrency=request.concurrency
+    )
     
-    if not emails_to_process:
+    if job.total_emails == 0:
+        await NLPBatchRunner.run(job.id)
         return {
             "message": "Aucun email à traiter dans l'intervalle spécifié",
+            "job_id": str(job.id),
             "processed_count": 0,
             "total_found": 0,
-            "interval": f"Derniers {request.hours_back} heures" if request.hours_back else f"Derniers {request.days_back} jours"
+            "interval": interval
         }
     
-    # Traiter les emails avec l'orchestrateur
-    orchestrator = NLPOrchestrator(db)
-    processed_count = 0
-    errors = []
-    
-    for email in emails_to_process:
-        try:
-            await orchestrator.process_email_complete(email)
-            processed_count += 1
-        except Exception as e:
-            errors.append(f"Email {email.id}: {str(e)}")
+    if request.background:
+        NLPBatchRunner.start(job.id)
+        return {
+            "message": "Traitement lancé en arrière-plan",
+            "job_id": str(job.id),
+            "processed_count": 0,
+            "total_found": job.total_emails,
+            "interval": interval
+        }
     
+    job = await NLPBatchRunner.run(job.id) or job
     return {
         "message": f"Traitement terminé",
-        "processed_count": processed_count,
-        "total_found": len(emails_to_process),
-        "errors": errors,
-        "interval": f"Derniers {request.hours_back} heures" if request.hours_back else f"Derniers {request.days_back} jours"
+        "job_id": str(job.id),
+        "status": job.status,
+        "processed_count": job.processed_emails,
+        "failed_count": job.failed_emails,
+        "total_found": job.total_emails,
+        "errors": job.errors or [],
+        "interval": interval
     }
+
+@router.get("/batch-jobs")
+async def list_batch_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Derniers jobs de traitement en masse
+    """
+    jobs = (await db.execute(
+        select(NLPBatchJob).order_by(NLPBatchJob.created_at.desc()).limit(limit)
+    )).scalars().all()
+    return {"jobs": [job_progress(job) for job in jobs]}
+
+@router.get("/batch-jobs/{job_id}")
+async def get_batch_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Progression et débit d'un job de traitement en masse
+    """
+    job = await db.get(NLPBatchJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job_progress(job)
+
+@router.post("/batch-jobs/{job_id}/resume")
+async def resume_batch_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Reprendre un job échoué ou interrompu depuis son dernier point de reprise
+    """
+    job = await db.get(NLPBatchJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    if job.status == "COMPLETED":
+        raise HTTPException(status_code=409, detail="Batch job already completed")
+    if job.status in ("FAILED", "CANCELLED"):
+        job.status = "PENDING"
+        job.finished_at = None
+        await db.commit()
+    NLPBatchRunner.start(job.id)
+    return job_progress(job)
+
+@router.post("/batch-jobs/{job_id}/cancel")
+async def cancel_batch_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Annuler un job (le lot en cours se termine)
+    """
+    job = await db.get(NLPBatchJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    job = await NLPBatchRunner.cancel(db, job)
+    return job_progress(job)
@@ -10,6 +10,7 @@ from app.models.models import User
 from app.services.gmail_oauth_service import GmailOAuthService
 from app.api.v1.endpoints.auth import get_current_user
 from app.services.auth_service import verify_token, get_user_by_email
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -272,7 +273,6 @@ async def test_gmail_connection(
         from app.services.gmail_api_service import GmailAPIService
         
         oauth_service = GmailOAuthService(db)
-        gmail_service = GmailAPIService(db)
         
         # Vérifier et rafraîchir le token si nécessaire
         token_valid = await oauth_service.ensure_valid_token(current_user)
@@ -285,7 +285,8 @@ async def test_gmail_connection(
             }
         
         # Test simple: récupérer le profil Gmail
-        profile = await gmail_service.get_user_profile(current_user)
+        async with GmailAPIService(db) as gmail_service:
+            profile = await gmail_service.get_user_profile(current_user)
         
         return {
             "success": True,
@@ -311,17 +312,35 @@ async def test_gmail_connection(
 async def sync_emails_from_gmail(
     max_emails: int = Query(100, ge=1, le=500, description="Nombre maximum d'emails à synchroniser"),
     days_back: int = Query(30, ge=1, le=365, description="Nombre de jours dans le passé"),
+    full_sync: bool = Query(False, description="Ignorer l'historique Gmail et relister les derniers messages"),
+    background: bool = Query(False, description="Confier la synchronisation au planificateur et répondre immédiatement"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Synchronise les emails depuis Gmail
+
+    Avec `background=true`, la synchronisation (récupération, NLP, liaison)
+    est exécutée par le planificateur d'ingestion ; son avancement se suit
+    via GET /ingestion/status.
     """
+    if background:
+        from app.services.ingestion_scheduler import ingestion_scheduler
+        
+        if not ingestion_scheduler.running:
+            raise HTTPException(status_code=409, detail="Planificateur d'ingestion désactivé")
+        queued = await asyncio.to_thread(ingestion_scheduler.request_sync, [current_user.id])
+        if not queued:
+            raise HTTPException(status_code=400, detail="Gmail n'est pas connecté")
+        return {"success": True, "queued": True}
+    
     try:
         from app.services.gmail_api_service import GmailAPIService
         
-        gmail_service = GmailAPIService(db)
-        result = await gmail_service.sync_emails_from_gmail(current_user, max_emails, days_back)
+        async with GmailAPIService(db) as gmail_service:
+            result = await gmail_service.sync_emails_from_gmail(
+                current_user, max_emails, days_back, full_sync=full_sync
+            )
         
         return result
         
@@ -7,6 +7,13 @@ import os
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Par défaut : DATABASE_URL avec driver async
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    DB_PREPARE_THRESHOLD: Optional[int] = 5
     
     # Security
     JWT_SECRET: str
@@ -23,27 +30,83 @@ class Settings(BaseSettings):
     GMAIL_CLIENT_ID: str
     GMAIL_CLIENT_SECRET: str
     
+    # Gmail API sync
+    GMAIL_API_BASE_URL: str = "https://gmail.googleapis.com"
+    GMAIL_SYNC_CONCURRENCY: int = 4
+    GMAIL_BATCH_SIZE: int = 50
+    GMAIL_QUOTA_UNITS_PER_SECOND: int = 250
+    GMAIL_MAX_RETRIES: int = 3
+    GMAIL_TOKEN_REFRESH_MARGIN_SECONDS: int = 300
+    GMAIL_TOKEN_MIN_VALIDITY_SECONDS: int = 60
+    
+    # IMAP (ingestion historique, remplacée par Gmail OAuth)
+    IMAP_HOST: Optional[str] = None
+    IMAP_USER: Optional[str] = None
+    IMAP_PASSWORD: Optional[str] = None
+    IMAP_FOLDER: str = "INBOX"
+    IMAP_MAX_EMAILS: int = 100
+    IMAP_FETCH_BATCH_SIZE: int = 50
+    IMAP_MAX_BODY_BYTES: int = 262144  # Téléchargement partiel de chaque partie texte
     
     
     # Scheduler
     INGESTION_INTERVAL_MINUTES: int = 10
     REMINDER_CHECK_INTERVAL_HOURS: int = 24
+    INGESTION_SCHEDULER_ENABLED: bool = True
+    INGESTION_JITTER_RATIO: float = 0.1  # Intervalle de chaque utilisateur tiré dans ±10 %
+    INGESTION_POLL_SECONDS: int = 30
+    INGESTION_LEASE_SECONDS: int = 900
+    INGESTION_QUEUE_SIZE: int = 8  # Capacité de chaque file (récupération, NLP, liaison)
+    INGESTION_FETCH_WORKERS: int = 2
+    INGESTION_NLP_WORKERS: int = 1
+    INGESTION_LINK_WORKERS: int = 1
+    INGESTION_MAX_EMAILS: int = 100
+    INGESTION_DAYS_BACK: int = 30
     
     # Classification
     CLASSIFICATION_MODEL_PATH: str = "models/classification_model.pkl"
     CLASSIFICATION_RULES_PATH: str = "rules/"
+    # Modèle local (CLASSIFICATION_MODEL_PATH, entraîné par train_classifier.py) avant tout appel LLM
+    LOCAL_CLASSIFIER_ENABLED: bool = True
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.75
     
     # Mistral AI
     MISTRAL_API_KEY: str
+    MISTRAL_SERVER_URL: Optional[str] = None  # Par défaut : API Mistral publique
     MISTRAL_EXTRACTION_MODEL: str = "mistral-small-latest"
     MISTRAL_LARGE_MODEL: str = "mistral-large-latest"
     MISTRAL_EMBED_MODEL: str = "mistral-embed"
     MISTRAL_TEMPERATURE: float = 0.1
     MISTRAL_MAX_TOKENS: int = 1000
     
+    # Cache des réponses LLM (Mistral / Gemini)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_HOURS: int = 168
+    LLM_CACHE_PURGE_INTERVAL_MINUTES: int = 60  # Purge des entrées expirées par le planificateur d'ingestion
+    
+    # Résilience des appels LLM
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+    GEMINI_HTTP2: bool = True
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    LLM_HEDGE_DELAY_SECONDS: float = 3.0
+    
     # NLP Settings
     SIMILARITY_THRESHOLD: float = 0.7
     CLASSIFICATION_CONFIDENCE_THRESHOLD: float = 0.8
+    NLP_CONCURRENCY: int = 4
+    NLP_COMMIT_BATCH_SIZE: int = 20
+    NLP_MAX_DB_SESSIONS: Optional[int] = None  # Par défaut : un tiers du pool async (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    NLP_BATCH_CHUNK_SIZE: int = 200
+    NLP_BATCH_MAX_JOBS: int = 1
+    NLP_BATCH_STALE_SECONDS: int = 300
+    GMAIL_SYNC_INLINE_NLP_MAX_EMAILS: int = 20  # Au-delà, NLP post-synchronisation en job de fond
+    TRACKER_COMMIT_BATCH_SIZE: int = 50
+    
+    # Traçage des requêtes et métriques (/metrics)
+    SLOW_REQUEST_THRESHOLD_MS: int = 1000
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    N_PLUS_ONE_THRESHOLD: int = 10  # Même requête SQL répétée dans une requête HTTP
     
     @validator('ALLOWED_ORIGINS', pre=True)
     def parse_allowed_origins(cls, v):
@@ -1,16 +1,92 @@
+import asyncio
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# Options communes aux deux moteurs (pre_ping : connexions coupées détectées avant usage)
+ENGINE_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=True,
+    query_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+)
+
+
+def _async_database_url() -> str:
+    """
+    URL du moteur asynchrone : ASYNC_DATABASE_URL si fournie, sinon
+    DATABASE_URL avec un driver async (psycopg 3 gère sync et async)
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+psycopg")
+    return url.render_as_string(hide_password=False)
+
+
+def _statement_cache_args(url: str) -> dict:
+    """Cache de requêtes préparées côté serveur, selon le driver"""
+    driver = make_url(url).drivername
+    if driver == "postgresql+asyncpg":
+        return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if driver == "postgresql+psycopg":
+        # Prépare une requête après N exécutions (None : jamais, ex. derrière pgbouncer)
+        return {"prepare_threshold": settings.DB_PREPARE_THRESHOLD}
+    return {}
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args=_statement_cache_args(settings.DATABASE_URL),
+    **ENGINE_OPTIONS
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL = _async_database_url()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=_statement_cache_args(ASYNC_DATABASE_URL),
+    **ENGINE_OPTIONS
+)
+# expire_on_commit=False : les objets restent lisibles après commit sans I/O implicite
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
+_nlp_session_slots: Optional[asyncio.Semaphore] = None
+
+
+def nlp_session_slots() -> asyncio.Semaphore:
+    """
+    Sémaphore du processus bornant les sessions async longues des workers NLP
+
+    Un worker garde sa connexion pendant les appels LLM de son lot : sans
+    borne, quelques synchronisations simultanées (NLP_CONCURRENCY workers
+    chacune) épuiseraient le pool et les requêtes API expireraient.
+    """
+    global _nlp_session_slots
+    if _nlp_session_slots is None:
+        limit = settings.NLP_MAX_DB_SESSIONS or (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW) // 3
+        _nlp_session_slots = asyncio.Semaphore(max(1, limit))
+    return _nlp_session_slots
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
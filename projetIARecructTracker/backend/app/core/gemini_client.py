@@ -1,11 +1,16 @@
 """
 Client pour l'API Gemini (Google AI) - Fallback si Mistral échoue
 """
+import asyncio
 import os
+import time
 import httpx
 from typing import Dict, Any, Optional, List
 from loguru import logger
 from app.core.config import settings
+from app.core.llm_cache import llm_cache
+from app.core.resilience import CircuitOpenError, get_provider_monitor
+from app.core.tracing import span
 
 
 class GeminiClient:
@@ -13,20 +18,129 @@ class GeminiClient:
     
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        self.base_url = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
         self.model = os.getenv("GEMINI_MODEL", "gemini-pro")
         self.temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.1"))
         self.max_tokens = int(os.getenv("GEMINI_MAX_TOKENS", "1000"))
         
+        self.monitor = get_provider_monitor("gemini")
+        # Client HTTP partagé (pool de connexions, HTTP/2), créé à la demande
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         if self.api_key:
             logger.info("Gemini AI client initialized successfully")
         else:
             logger.warning("GEMINI_API_KEY not found in environment variables")
     
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Client httpx partagé par tous les appels du processus
+        
+        Les connexions étant liées à une boucle asyncio, un nouveau client est
+        créé si l'appel a lieu dans une autre boucle (scripts, asyncio.run).
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._http_loop is not loop:
+            options = dict(
+                timeout=httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+            try:
+                self._http = httpx.AsyncClient(http2=settings.GEMINI_HTTP2, **options)
+            except ImportError:
+                logger.warning("Package 'h2' not installed, Gemini client falls back to HTTP/1.1")
+                self._http = httpx.AsyncClient(**options)
+            self._http_loop = loop
+        return self._http
+    
+    async def aclose(self) -> None:
+        """Ferme le client HTTP partagé (arrêt de l'application)"""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+        self._http_loop = None
+    
     def is_available(self) -> bool:
         """Vérifier si le client Gemini est disponible"""
         return self.api_key is not None
     
+    async def _generate(self, prompt: str) -> Optional[str]:
+        """
+        Appel generateContent passant par le cache LLM
+        
+        Returns:
+            Texte de la première réponse candidate, ou None en cas d'erreur API
+        """
+        async def call() -> Optional[str]:
+            url = f"{self.base_url}/models/{self.model}:generateContent"
+            
+            payload = {
+                "contents": [{
+                    "parts": [{
+                        "text": prompt
+                    }]
+                }],
+                "generationConfig": {
+                    "temperature": self.temperature,
+                    "maxOutputTokens": self.max_tokens,
+                }
+            }
+            
+            # Circuit ouvert : échec immédiat plutôt qu'attendre le timeout
+            breaker = self.monitor.breaker
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                logger.warning(f"Gemini call skipped: {e}")
+                return None
+            
+            started = time.perf_counter()
+            try:
+                with span("llm.gemini.generate"):
+                    response = await self._get_http_client().post(
+                        url,
+                        headers={"Content-Type": "application/json"},
+                        json=payload,
+                        params={"key": self.api_key}
+                    )
+            except asyncio.CancelledError:
+                # Requête de secours abandonnée : ni succès ni échec
+                breaker.release()
+                raise
+            except Exception:
+                self.monitor.latency.observe(time.perf_counter() - started, "error")
+                breaker.record_failure()
+                raise
+            
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                self.monitor.latency.observe(elapsed, "error")
+                # Seules les erreurs côté fournisseur comptent pour le disjoncteur
+                if response.status_code == 429 or response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                logger.error(f"Gemini API error: {response.status_code} - {response.text}")
+                return None
+            
+            self.monitor.latency.observe(elapsed, "success")
+            breaker.record_success()
+            
+            result = response.json()
+            
+            # Extraire la réponse
+            if "candidates" in result and len(result["candidates"]) > 0:
+                return result["candidates"][0]["content"]["parts"][0]["text"]
+            
+            logger.error("No valid response from Gemini API")
+            return None
+        
+        return await llm_cache.get_or_call(
+            "gemini", self.model, prompt, call,
+            temperature=self.temperature, max_tokens=self.max_tokens
+        )
+    
     async def classify_text(
         self,
         text: str,
@@ -52,46 +166,10 @@ class GeminiClient:
             # Construire le prompt pour Gemini
             prompt = self._build_classification_prompt(text, categories, context)
             
-            # Appel API Gemini
-            url = f"{self.base_url}/models/{self.model}:generateContent"
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": prompt
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": self.temperature,
-                    "maxOutputTokens": self.max_tokens,
-                }
-            }
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    params={"key": self.api_key}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Gemini API error: {response.status_code} - {response.text}")
-                    return None
-                
-                result = response.json()
-                
-                # Extraire la réponse
-                if "candidates" in result and len(result["candidates"]) > 0:
-                    content = result["candidates"][0]["content"]["parts"][0]["text"]
-                    return self._parse_classification_response(content, categories)
-                
-                logger.error("No valid response from Gemini API")
+            content = await self._generate(prompt)
+            if content is None:
                 return None
+            return self._parse_classification_response(content, categories)
                 
         except httpx.TimeoutException:
             logger.error("Gemini API timeout")
@@ -195,38 +273,10 @@ Si une information n'est pas présente, mets null.
 Réponds UNIQUEMENT avec le JSON, sans texte avant ou après.
 """
             
-            url = f"{self.base_url}/models/{self.model}:generateContent"
-            
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": prompt
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": self.temperature,
-                    "maxOutputTokens": self.max_tokens,
-                }
-            }
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    params={"key": self.api_key}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Gemini API error: {response.status_code}")
-                    return None
-                
-                result = response.json()
-                
-                if "candidates" in result and len(result["candidates"]) > 0:
-                    content = result["candidates"][0]["content"]["parts"][0]["text"]
-                    return self._parse_json_response(content)
-                
+            content = await self._generate(prompt)
+            if content is None:
                 return None
+            return self._parse_json_response(content)
                 
         except Exception as e:
             logger.error(f"Error calling Gemini AI for extraction: {str(e)}")
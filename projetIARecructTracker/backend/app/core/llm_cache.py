@@ -0,0 +1,180 @@
+"""
+Cache des réponses LLM (Mistral / Gemini) avec coalescence des requêtes en vol
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+
+
+class _InFlightCall:
+    """Appel amont en cours pour une clé et nombre d'appelants qui l'attendent"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class LLMCache:
+    """
+    Cache persistant (table `llm_response_cache`) des réponses brutes des LLM
+
+    La clé est le hash de (fournisseur, modèle, paramètres, prompt) : un email
+    retraité (/nlp/reprocess, batch_process_emails) ne déclenche pas de nouvel
+    appel tant que l'entrée n'a pas expiré. Les appels concurrents pour une
+    même clé partagent un seul appel amont. Seules les réponses réussies sont
+    mises en cache ; une panne du cache n'empêche jamais l'appel au LLM.
+    """
+
+    def __init__(self, ttl_hours: Optional[int] = None, enabled: Optional[bool] = None):
+        self.ttl = timedelta(hours=ttl_hours if ttl_hours is not None else settings.LLM_CACHE_TTL_HOURS)
+        self.enabled = settings.LLM_CACHE_ENABLED if enabled is None else enabled
+        self._inflight: Dict[str, _InFlightCall] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, **params: Any) -> str:
+        payload = json.dumps(
+            {"provider": provider, "model": model, "params": params, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _load(self, key: str) -> Optional[Any]:
+        from app.models.models import LLMResponseCache
+
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(LLMResponseCache, key)
+            if entry is None or entry.expires_at <= datetime.now(timezone.utc):
+                return None
+            entry.hit_count = (entry.hit_count or 0) + 1
+            value = entry.response["value"]
+            await db.commit()
+            return value
+
+    async def _store(self, key: str, provider: str, model: str, value: Any) -> None:
+        from app.models.models import LLMResponseCache
+
+        now = datetime.now(timezone.utc)
+        values = {
+            "provider": provider,
+            "model": model,
+            "response": {"value": value},
+            "created_at": now,
+            "expires_at": now + self.ttl,
+            "hit_count": 0
+        }
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                pg_insert(LLMResponseCache)
+                .values(cache_key=key, **values)
+                .on_conflict_do_update(index_elements=["cache_key"], set_=values)
+            )
+            await db.commit()
+
+    async def get_or_call(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        call: Callable[[], Awaitable[Optional[Any]]],
+        **params: Any
+    ) -> Optional[Any]:
+        """
+        Retourne la réponse en cache ou exécute `call`
+
+        La lecture du cache, l'appel amont et l'écriture s'exécutent dans une
+        tâche propre, partagée par tous les appelants de la même clé : annuler
+        l'un d'eux (requête de secours perdante, client déconnecté) n'annule
+        pas les autres. La tâche n'est annulée que si plus personne ne l'attend.
+
+        Args:
+            provider: "mistral", "gemini"...
+            model: Modèle interrogé
+            prompt: Prompt complet envoyé au modèle
+            call: Coroutine d'appel amont ; None ou une exception = pas de mise en cache
+            **params: Paramètres de génération faisant partie de la clé (température...)
+        """
+        if not self.enabled:
+            return await call()
+
+        key = self.make_key(provider, model, prompt, **params)
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = _InFlightCall(asyncio.create_task(self._fetch(key, provider, model, call)))
+            self._inflight[key] = inflight
+            inflight.task.add_done_callback(lambda task: self._forget(key, inflight))
+        else:
+            self.stats["coalesced"] += 1
+
+        inflight.waiters += 1
+        try:
+            return await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.task.done():
+                inflight.task.cancel()
+
+    def _forget(self, key: str, inflight: "_InFlightCall") -> None:
+        if self._inflight.get(key) is inflight:
+            del self._inflight[key]
+        # Exception d'une tâche dont tous les appelants ont été annulés : déjà journalisée
+        if not inflight.task.cancelled():
+            inflight.task.exception()
+
+    async def _fetch(
+        self,
+        key: str,
+        provider: str,
+        model: str,
+        call: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """Lecture du cache puis, à défaut, appel amont et mise en cache"""
+        try:
+            cached = await self._load(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed ({provider}/{model}): {e}")
+            cached = None
+
+        if cached is not None:
+            self.stats["hits"] += 1
+            logger.debug(f"LLM cache hit ({provider}/{model})")
+            return cached
+
+        self.stats["misses"] += 1
+        value = await call()
+        if value is not None:
+            try:
+                await self._store(key, provider, model, value)
+            except Exception as e:
+                logger.warning(f"LLM cache write failed ({provider}/{model}): {e}")
+        return value
+
+    def purge_expired(self) -> int:
+        """Supprime les entrées expirées ; retourne le nombre de lignes supprimées"""
+        from app.models.models import LLMResponseCache
+
+        db = SessionLocal()
+        try:
+            deleted = db.query(LLMResponseCache).filter(
+                LLMResponseCache.expires_at <= datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+# Instance globale partagée par les clients LLM
+llm_cache = LLMCache()
@@ -1,7 +1,12 @@
 from app.core.config import settings
+from app.core.llm_cache import llm_cache
+from app.core.resilience import CircuitOpenError, get_provider_monitor
+from app.core.tracing import span
 from typing import Dict, Any, List, Optional
 from loguru import logger
+import asyncio
 import json
+import time
 
 
 class MistralAIClient:
@@ -11,7 +16,7 @@ class MistralAIClient:
         if settings.MISTRAL_API_KEY and settings.MISTRAL_API_KEY != "your-mistral-api-key":
             try:
                 from mistralai import Mistral
-                self.client = Mistral(api_key=settings.MISTRAL_API_KEY)
+                self.client = Mistral(api_key=settings.MISTRAL_API_KEY, server_url=settings.MISTRAL_SERVER_URL)
                 logger.info("Mistral AI client initialized successfully")
             except ImportError as e:
                 logger.error(f"Failed to import Mistral: {e}")
@@ -22,11 +27,49 @@ class MistralAIClient:
         else:
             logger.warning("Mistral AI API key not configured - using mock responses")
             self.client = None
+        self.monitor = get_provider_monitor("mistral")
     
     def is_available(self) -> bool:
         """Vérifier si le client Mistral est disponible"""
         return self.client is not None
     
+    async def _complete(self, prompt: str, model_name: str, temperature: float, max_tokens: int) -> str:
+        """
+        Appel chat.complete_async passant par le cache LLM
+        
+        Appel asynchrone natif du SDK : aucun thread du pool par défaut n'est
+        occupé pendant l'attente (il est partagé avec les étapes base de données
+        exécutées via asyncio.to_thread). Lève CircuitOpenError si le
+        disjoncteur Mistral est ouvert.
+        """
+        async def call() -> str:
+            breaker = self.monitor.breaker
+            breaker.before_call()
+            started = time.perf_counter()
+            try:
+                with span("llm.mistral.chat"):
+                    response = await self.client.chat.complete_async(
+                        model=model_name,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception:
+                self.monitor.latency.observe(time.perf_counter() - started, "error")
+                breaker.record_failure()
+                raise
+            self.monitor.latency.observe(time.perf_counter() - started, "success")
+            breaker.record_success()
+            return response.choices[0].message.content.strip()
+        
+        return await llm_cache.get_or_call(
+            "mistral", model_name, prompt, call,
+            temperature=temperature, max_tokens=max_tokens
+        )
+    
     async def extract_structured_data(
         self, 
         text: str, 
@@ -77,18 +120,10 @@ Texte à analyser:
 
 JSON:"""
 
-            from mistralai import Mistral
-            
-            # Dans les nouvelles versions de mistralai, on utilise des dictionnaires simples
-            response = self.client.chat.complete(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=settings.MISTRAL_TEMPERATURE,
-                max_tokens=settings.MISTRAL_MAX_TOKENS
+            content = await self._complete(
+                prompt, model_name, settings.MISTRAL_TEMPERATURE, settings.MISTRAL_MAX_TOKENS
             )
             
-            content = response.choices[0].message.content.strip()
-            
             # Nettoyer la réponse pour extraire le JSON
             if content.startswith('```json'):
                 content = content[7:]
@@ -105,6 +140,9 @@ JSON:"""
             logger.error(f"Failed to parse JSON from Mistral response: {e}")
             logger.error(f"Raw response: {content}")
             return None
+        except CircuitOpenError as e:
+            logger.warning(f"Mistral extraction skipped: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error in Mistral extraction: {e}")
             return None
@@ -156,16 +194,12 @@ Texte à classifier:
 
 JSON:"""
             
-            # Dans les nouvelles versions de mistralai, on utilise des dictionnaires simples
-            response = self.client.chat.complete(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
+            content = await self._complete(
+                prompt, model_name,
                 temperature=0.1,  # Plus déterministe pour la classification
                 max_tokens=200
             )
             
-            content = response.choices[0].message.content.strip()
-            
             # Nettoyer la réponse pour extraire le JSON
             if content.startswith('```json'):
                 content = content[7:]
@@ -193,13 +227,13 @@ JSON:"""
                 "confidence": 0.5,
                 "reasoning": "Failed to parse AI response"
             }
+        except CircuitOpenError as e:
+            logger.warning(f"Mistral classification skipped: {e}")
+            return None
         except Exception as e:
+            # None (et non un résultat par défaut) pour laisser la main au fallback Gemini
             logger.error(f"Error calling Mistral AI for classification: {e}")
-            return {
-                "category": categories[0] if categories else "unknown",
-                "confidence": 0.5,
-                "reasoning": f"Error: {str(e)}"
-            }
+            return None
     
     async def get_embeddings(self, texts: List[str]) -> Optional[List[List[float]]]:
         """
@@ -214,17 +248,32 @@ JSON:"""
         if not self.is_available():
             return None
             
+        breaker = self.monitor.breaker
         try:
-            response = self.client.embeddings(
-                model=settings.MISTRAL_EMBED_MODEL,
-                input=texts
-            )
-            
-            return [data.embedding for data in response.data]
-            
+            breaker.before_call()
+        except CircuitOpenError as e:
+            logger.warning(f"Mistral embeddings skipped: {e}")
+            return None
+        
+        started = time.perf_counter()
+        try:
+            with span("llm.mistral.embeddings"):
+                response = await self.client.embeddings.create_async(
+                    model=settings.MISTRAL_EMBED_MODEL,
+                    inputs=texts
+                )
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
         except Exception as e:
+            self.monitor.latency.observe(time.perf_counter() - started, "error")
+            breaker.record_failure()
             logger.error(f"Error getting embeddings from Mistral: {e}")
             return None
+        
+        self.monitor.latency.observe(time.perf_counter() - started, "success")
+        breaker.record_success()
+        return [data.embedding for data in sorted(response.data, key=lambda data: data.index or 0)]
 
 
 # Instance globale du client
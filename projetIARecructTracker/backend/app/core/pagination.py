@@ -0,0 +1,90 @@
+"""
+Pagination par curseur (keyset) et comptage estimé pour les listes
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+
+# En-têtes de réponse des listes paginées (le corps reste une liste JSON)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+PAGINATION_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_COUNT_ESTIMATED_HEADER]
+
+
+def encode_cursor(sort_value: datetime, row_id: UUID) -> str:
+    """Curseur opaque (base64 url-safe) à partir de la clé de tri et de l'id du dernier élément"""
+    payload = json.dumps({"t": sort_value.isoformat(), "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), UUID(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Curseur de pagination invalide: {cursor!r}") from e
+
+
+def apply_keyset(query: Query, sort_column, id_column, cursor: Optional[str]) -> Query:
+    """
+    Tri décroissant sur (sort_column, id) et reprise après le curseur
+
+    La comparaison de tuples suit exactement l'ordre de tri et s'appuie sur
+    l'index composite (user_id, sort_column, id) : le coût d'une page ne
+    dépend pas de sa position dans la liste, contrairement à OFFSET.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+
+def next_cursor(items: Sequence[Any], limit: int, sort_attr: str) -> Optional[str]:
+    """Curseur de la page suivante, ou None si la page est la dernière"""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, sort_attr), last.id)
+
+
+def estimate_count(db: Session, query: Query) -> int:
+    """
+    Nombre de lignes estimé par le planificateur PostgreSQL (EXPLAIN, sans exécution)
+
+    Quasi gratuit quelle que soit la volumétrie ; la précision dépend des
+    statistiques de la table (ANALYZE / autovacuum).
+    """
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    # Requête compilée pour le driver (paramètres liés), préfixée par EXPLAIN
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(db: Session, query: Query, mode: str) -> Optional[int]:
+    """Total selon le mode demandé : None ('none'), estimation ou COUNT(*) exact"""
+    if mode == "estimated":
+        return estimate_count(db, query)
+    if mode == "exact":
+        return query.order_by(None).count()
+    return None
+
+
+def set_pagination_headers(response, cursor: Optional[str], total: Optional[int], mode: str) -> None:
+    """Renseigne le curseur suivant et le total éventuel dans les en-têtes de la réponse"""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        response.headers[TOTAL_COUNT_ESTIMATED_HEADER] = "true" if mode == "estimated" else "false"
@@ -0,0 +1,175 @@
+"""
+Disjoncteurs et histogrammes de latence par fournisseur LLM
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from app.core.config import settings
+
+# Bornes supérieures des buckets de latence (secondes), à la Prometheus
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur du fournisseur est ouvert : l'appel n'est pas tenté"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur classique fermé / ouvert / semi-ouvert
+
+    Après `failure_threshold` échecs consécutifs, le circuit s'ouvre et les
+    appels échouent immédiatement pendant `reset_timeout` secondes au lieu
+    d'attendre le timeout du fournisseur. Un seul appel d'essai est ensuite
+    autorisé : son succès referme le circuit, son échec le rouvre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        """Vrai si un appel serait refusé maintenant"""
+        state = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight)
+
+    def before_call(self) -> None:
+        """Lève CircuitOpenError si l'appel ne doit pas être tenté"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed < self.reset_timeout:
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.name, 0.0)
+            # Semi-ouvert : un seul appel d'essai
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Libère l'appel d'essai sans compter d'issue (appel annulé)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+        }
+
+
+class LatencyHistogram:
+    """Histogramme cumulatif des latences d'appel, ventilé par issue (success, error...)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: List[float] = sorted(buckets)
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, outcome: str = "success") -> None:
+        with self._lock:
+            counts = self._counts.setdefault(outcome, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, seconds)] += 1
+            self._sums[outcome] = self._sums.get(outcome, 0.0) + seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for outcome, counts in self._counts.items():
+                cumulative, running = {}, 0
+                for bound, count in zip(self.buckets + [float("inf")], counts):
+                    running += count
+                    cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+                result[outcome] = {
+                    "count": running,
+                    "sum_seconds": round(self._sums[outcome], 6),
+                    "buckets": cumulative,
+                }
+            return result
+
+
+class ProviderMonitor:
+    """Disjoncteur et histogramme de latence d'un fournisseur"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_CIRCUIT_RESET_SECONDS,
+        )
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"circuit": self.breaker.snapshot(), "latency": self.latency.snapshot()}
+
+
+_monitors: Dict[str, ProviderMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_provider_monitor(name: str) -> ProviderMonitor:
+    with _monitors_lock:
+        monitor = _monitors.get(name)
+        if monitor is None:
+            monitor = _monitors[name] = ProviderMonitor(name)
+        return monitor
+
+
+def get_providers_snapshot(name: Optional[str] = None) -> Dict[str, Any]:
+    """État des disjoncteurs et histogrammes de latence, par fournisseur"""
+    with _monitors_lock:
+        monitors = dict(_monitors)
+    return {
+        provider: monitor.snapshot()
+        for provider, monitor in monitors.items()
+        if name is None or provider == name
+    }
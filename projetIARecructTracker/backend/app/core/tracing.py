@@ -0,0 +1,395 @@
+"""
+Traçage des requêtes HTTP et métriques Prometheus (/metrics)
+
+Chaque requête reçoit un identifiant (en-tête X-Request-ID, repris de la
+requête s'il est fourni) et une trace, portée par une ContextVar : elle suit
+la requête dans les tâches asyncio, les threads (asyncio.to_thread,
+endpoints synchrones) et les sessions SQLAlchemy async.
+
+La trace cumule :
+- les requêtes SQL (nombre, durée, occurrences de chaque requête), via les
+  événements cursor_execute des moteurs ;
+- les spans : appels LLM et étapes NLP, délimités par `span()` ou `@traced()`.
+
+En fin de requête, les métriques sont mises à jour et une requête lente
+(SLOW_REQUEST_THRESHOLD_MS) ou répétant une même requête SQL au moins
+N_PLUS_ONE_THRESHOLD fois (N+1) est journalisée avec sa ventilation.
+"""
+import asyncio
+import functools
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.llm_cache import llm_cache
+from app.core.resilience import DEFAULT_LATENCY_BUCKETS, get_providers_snapshot
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Bornes des buckets du nombre de requêtes SQL par requête HTTP
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Counter:
+    """Compteur Prometheus à étiquettes"""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Histogramme Prometheus (buckets cumulatifs) à étiquettes"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets: List[float] = sorted(buckets)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[label_values] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, counts in sorted(self._counts.items()):
+                running = 0
+                for bound, count in zip(self.buckets + [float("inf")], counts):
+                    running += count
+                    le = f'le="{_format_bound(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {running}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {self._sums[label_values]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {running}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("tracker_http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status"))
+HTTP_DURATION = Histogram("tracker_http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route"))
+HTTP_DB_QUERIES = Histogram(
+    "tracker_http_request_db_queries", "Requêtes SQL exécutées par requête HTTP", ("route",), QUERY_COUNT_BUCKETS
+)
+DB_QUERY_DURATION = Histogram("tracker_db_query_duration_seconds", "Durée des requêtes SQL", ("engine",))
+SPAN_DURATION = Histogram(
+    "tracker_span_duration_seconds", "Durée des étapes instrumentées (appels LLM, étapes NLP)", ("span",)
+)
+SLOW_REQUESTS = Counter("tracker_slow_requests_total", "Requêtes HTTP au-delà de SLOW_REQUEST_THRESHOLD_MS", ("route",))
+SLOW_QUERIES = Counter("tracker_slow_queries_total", "Requêtes SQL au-delà de SLOW_QUERY_THRESHOLD_MS", ("engine",))
+N_PLUS_ONE = Counter(
+    "tracker_n_plus_one_total", "Requêtes HTTP répétant une même requête SQL (N+1)", ("route",)
+)
+
+_METRICS = [
+    HTTP_REQUESTS, HTTP_DURATION, HTTP_DB_QUERIES, DB_QUERY_DURATION,
+    SPAN_DURATION, SLOW_REQUESTS, SLOW_QUERIES, N_PLUS_ONE,
+]
+
+
+class RequestTrace:
+    """Temps cumulés d'une requête HTTP : SQL et spans"""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.statements: Dict[str, int] = defaultdict(int)
+        self.spans: Dict[str, List[float]] = {}  # nom -> [appels, secondes]
+        self._lock = threading.Lock()
+
+    def add_query(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.query_count += 1
+            self.query_seconds += seconds
+            self.statements[statement] += 1
+
+    def add_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Requêtes SQL exécutées au moins `threshold` fois (N+1), les plus fréquentes d'abord"""
+        with self._lock:
+            repeated = [(sql, count) for sql, count in self.statements.items() if count >= threshold]
+        return sorted(repeated, key=lambda item: -item[1])
+
+    def describe(self, status: int, elapsed: float, repeated: List[Tuple[str, int]]) -> str:
+        parts = [
+            f"{self.method} {self.path} -> {status} en {elapsed * 1000:.0f} ms [{self.request_id}]",
+            f"SQL: {self.query_count} requête(s), {self.query_seconds * 1000:.0f} ms",
+        ]
+        if self.spans:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][1])
+            parts.append("spans: " + ", ".join(
+                f"{name} {count}x {seconds * 1000:.0f} ms" for name, (count, seconds) in spans
+            ))
+        for statement, count in repeated[:3]:
+            parts.append(f"N+1: {count}x {_WHITESPACE_RE.sub(' ', statement)[:200]}")
+        return " | ".join(parts)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Chronomètre un bloc : histogramme global et trace de la requête en cours"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_DURATION.observe(elapsed, name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, elapsed)
+
+
+def traced(name: str) -> Callable:
+    """Décorateur `span(name)` pour une fonction, synchrone ou coroutine"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- SQLAlchemy ---
+
+_engines: Dict[str, Any] = {}
+
+
+def instrument_engine(engine, label: str) -> None:
+    """
+    Chronomètre les requêtes SQL d'un moteur (pour un moteur async : son sync_engine)
+
+    Le début est noté sur le contexte d'exécution : une requête en échec
+    (sans after_cursor_execute) ne laisse rien derrière elle.
+    """
+    if label in _engines:
+        return
+    _engines[label] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._tracing_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_tracing_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        DB_QUERY_DURATION.observe(elapsed, label)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_query(statement, elapsed)
+        if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            SLOW_QUERIES.inc(label)
+            request = f" [{trace.request_id}]" if trace is not None else ""
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.0f} ms){request}: {_WHITESPACE_RE.sub(' ', statement)[:300]}"
+            )
+
+
+# --- Middleware ASGI ---
+
+class TracingMiddleware:
+    """
+    Identifiant, trace et métriques de chaque requête HTTP
+
+    Middleware ASGI pur (pas de BaseHTTPMiddleware) : la réponse n'est pas
+    mise en mémoire tampon et la ContextVar reste visible de l'endpoint.
+    Les métriques sont étiquetées par route déclarée (/emails/{email_id})
+    et non par chemin, pour borner leur cardinalité.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        trace = RequestTrace(request_id, scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())
+                ]
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _current_trace.reset(token)
+            _record_request(trace, _route_template(scope), status)
+
+
+def _route_template(scope) -> str:
+    """
+    Route déclarée de la requête, préfixes des routeurs compris
+
+    Selon la version de FastAPI, la route d'un routeur inclus porte le
+    chemin complet ou seulement son chemin relatif au préfixe ; les
+    préfixes étant statiques, ils sont repris du chemin de la requête.
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    depth = template.count("/")
+    if path.count("/") <= depth:
+        return template
+    return path.rsplit("/", depth)[0] + template
+
+
+def _record_request(trace: RequestTrace, route: str, status: int) -> None:
+    elapsed = time.perf_counter() - trace.started
+    HTTP_REQUESTS.inc(trace.method, route, str(status))
+    HTTP_DURATION.observe(elapsed, trace.method, route)
+    HTTP_DB_QUERIES.observe(trace.query_count, route)
+
+    repeated = trace.repeated_statements(settings.N_PLUS_ONE_THRESHOLD)
+    if repeated:
+        N_PLUS_ONE.inc(route)
+    slow = elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS
+    if slow:
+        SLOW_REQUESTS.inc(route)
+    if slow or repeated:
+        label = "Slow request" if slow else "N+1 queries"
+        logger.warning(f"{label}: {trace.describe(status, elapsed, repeated)}")
+
+
+# --- Exposition ---
+
+def _provider_lines() -> List[str]:
+    """Histogrammes et disjoncteurs des fournisseurs LLM (app.core.resilience), cache LLM"""
+    name = "tracker_llm_call_duration_seconds"
+    lines = [f"# HELP {name} Durée des appels aux fournisseurs LLM", f"# TYPE {name} histogram"]
+    providers = get_providers_snapshot()
+    for provider, snapshot in sorted(providers.items()):
+        for outcome, data in sorted(snapshot["latency"].items()):
+            labels = ("provider", "outcome")
+            for bound, count in data["buckets"].items():
+                le = f'le="{bound if bound == "+Inf" else repr(float(bound))}"'
+                lines.append(f"{name}_bucket{_labels(labels, (provider, outcome), le)} {count}")
+            lines.append(f"{name}_sum{_labels(labels, (provider, outcome))} {data['sum_seconds']:.6f}")
+            lines.append(f"{name}_count{_labels(labels, (provider, outcome))} {data['count']}")
+
+    name = "tracker_llm_circuit_open"
+    lines += [f"# HELP {name} Disjoncteur du fournisseur LLM ouvert (1) ou fermé (0)", f"# TYPE {name} gauge"]
+    for provider, snapshot in sorted(providers.items()):
+        is_open = 0 if snapshot["circuit"]["state"] == "closed" else 1
+        lines.append(f"{name}{_labels(('provider',), (provider,))} {is_open}")
+
+    name = "tracker_llm_cache_events_total"
+    lines += [f"# HELP {name} Consultations du cache LLM par issue", f"# TYPE {name} counter"]
+    for result, count in sorted(llm_cache.stats.items()):
+        lines.append(f"{name}{_labels(('result',), (result,))} {count}")
+    return lines
+
+
+def _pool_lines() -> List[str]:
+    name = "tracker_db_pool_connections"
+    lines = [f"# HELP {name} Connexions des pools SQLAlchemy par état", f"# TYPE {name} gauge"]
+    for label, engine in sorted(_engines.items()):
+        pool = engine.pool
+        for state, value in (("checked_out", pool.checkedout()), ("idle", pool.checkedin())):
+            lines.append(f"{name}{_labels(('engine', 'state'), (label, state))} {value}")
+    return lines
+
+
+def render_metrics() -> str:
+    """Toutes les métriques au format texte Prometheus (version 0.0.4)"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.extend(_provider_lines())
+    lines.extend(_pool_lines())
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
+from app.core.database import async_engine, engine
+from app.core.pagination import PAGINATION_HEADERS
+from app.core.tracing import REQUEST_ID_HEADER, TracingMiddleware, instrument_engine, render_metrics
 from app.api.v1.api import api_router
+from app.core.gemini_client import gemini_client
+from app.nlp.batch_jobs import NLPBatchRunner
+from app.services.ingestion_scheduler import ingestion_scheduler
 
 app = FastAPI(
     title="AI Recruit Tracker",
@@ -16,15 +23,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=True,
+    # Pagination par curseur : en-têtes lisibles par le frontend
+    expose_headers=PAGINATION_HEADERS + [REQUEST_ID_HEADER],
 )
 
+# Traçage : ajouté en dernier, il englobe toute la requête (CORS compris)
+app.add_middleware(TracingMiddleware)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+@app.on_event("startup")
+async def resume_batch_jobs():
+    await NLPBatchRunner.resume_interrupted_jobs()
+
+@app.on_event("startup")
+async def start_ingestion_scheduler():
+    if settings.INGESTION_SCHEDULER_ENABLED:
+        ingestion_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    await ingestion_scheduler.stop()
+    await NLPBatchRunner.shutdown()
+    await gemini_client.aclose()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "AI Recruit Tracker API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "Welcome to AI Recruit Tracker API"}
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, Text, TIMESTAMP, ARRAY, UUID, ForeignKey, CheckConstraint, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, TIMESTAMP, ARRAY, UUID, ForeignKey, CheckConstraint, Boolean, Float, Index, Integer, LargeBinary, BigInteger, DDL, event
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
 from app.core.database import Base
+from app.models.stats_counters import install_stats_counters
 import uuid
 
 
@@ -21,6 +22,12 @@ class User(Base):
     gmail_connected = Column(Boolean, default=False)  # Statut de connexion Gmail
     gmail_email = Column(String(255))  # Email Gmail connecté
     gmail_scopes = Column(Text)  # Scopes OAuth accordés
+    gmail_history_id = Column(String(32))  # Dernier historyId synchronisé (sync incrémentale)
+    
+    # Ingestion planifiée (IngestionScheduler)
+    next_ingestion_at = Column(TIMESTAMP(timezone=True))  # Prochaine synchronisation (NULL : dès que possible)
+    ingestion_locked_until = Column(TIMESTAMP(timezone=True))  # Bail du processus qui synchronise l'utilisateur
+    last_ingestion_at = Column(TIMESTAMP(timezone=True))
     
     # Relations
     applications = relationship("Application", back_populates="user", cascade="all, delete-orphan")
@@ -77,9 +84,29 @@ class Application(Base):
             priority.in_(['LOW', 'MEDIUM', 'HIGH']),
             name='priority_check'
         ),
+        # Liste paginée par curseur : WHERE user_id = ? AND (updated_at, id) < (?, ?)
+        Index('ix_applications_user_updated_id', 'user_id', 'updated_at', 'id'),
+        # Recherche ILIKE '%q%' (extension pg_trgm, créée avant la table)
+        Index('ix_applications_job_title_trgm', 'job_title',
+              postgresql_using='gin', postgresql_ops={'job_title': 'gin_trgm_ops'}),
+        Index('ix_applications_company_name_trgm', 'company_name',
+              postgresql_using='gin', postgresql_ops={'company_name': 'gin_trgm_ops'}),
+        Index('ix_applications_notes_trgm', 'notes',
+              postgresql_using='gin', postgresql_ops={'notes': 'gin_trgm_ops'}),
+        # Actions en retard du tableau de bord (seuls les statuts concernés sont indexés)
+        Index('ix_applications_overdue', 'user_id', 'next_action_at',
+              postgresql_where=status.in_(['APPLIED', 'ACKNOWLEDGED', 'SCREENING'])),
     )
 
 
+# Les index trigrammes nécessitent pg_trgm : créée avec la table par create_all
+event.listen(
+    Application.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
 class Email(Base):
     __tablename__ = "emails"
     
@@ -95,9 +122,10 @@ class Email(Base):
     cc = Column(ARRAY(Text))
     bcc = Column(ARRAY(Text))
     sent_at = Column(TIMESTAMP(timezone=True))
-    raw_headers = Column(Text)
-    raw_body = Column(Text)
-    html_body = Column(Text)  # Corps HTML de l'email
+    # Corps volumineux : chargés à la première lecture (ou undefer() dans la requête)
+    raw_headers = deferred(Column(Text))
+    raw_body = deferred(Column(Text))
+    html_body = deferred(Column(Text))  # Corps HTML de l'email
     snippet = Column(Text)
     thread_id = Column(Text)  # Thread Gmail
     is_sent = Column(String(10), default="false")  # Email envoyé ou reçu
@@ -109,6 +137,46 @@ class Email(Base):
     # Relationship with user and application
     user = relationship("User", back_populates="emails")
     application = relationship("Application", back_populates="emails")
+    
+    __table_args__ = (
+        # Garantit l'unicité d'un message Gmail par utilisateur (INSERT ... ON CONFLICT DO NOTHING)
+        Index('uq_emails_user_gmail_message', 'user_id', 'gmail_message_id', unique=True),
+        # Parcours par lots (keyset) des traitements NLP en masse
+        Index('ix_emails_created_at_id', 'created_at', 'id'),
+        # Liste paginée par curseur des emails d'un utilisateur
+        Index('ix_emails_user_created_id', 'user_id', 'created_at', 'id'),
+        # Message déjà lié d'un même fil (traitement NLP des réponses)
+        Index('ix_emails_user_thread', 'user_id', 'thread_id'),
+    )
+
+
+EMAIL_BODY_COLUMNS = ("raw_headers", "raw_body", "html_body")
+
+
+def set_email_body_compression(target, connection, **kw) -> None:
+    """
+    Compression lz4 des corps d'emails (après create_all, idempotent)
+
+    PostgreSQL stocke déjà hors ligne et compresse (TOAST) les valeurs
+    volumineuses ; lz4 (PostgreSQL 14+ compilé avec lz4, dont l'image
+    officielle) compresse et décompresse bien plus vite que pglz. Seules les
+    valeurs écrites ensuite sont concernées.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    lz4_available = connection.exec_driver_sql(
+        "SELECT 'lz4' = ANY(enumvals) FROM pg_settings WHERE name = 'default_toast_compression'"
+    ).scalar()
+    if not lz4_available:
+        return
+    # Colonnes pas encore en lz4 : pas d'ALTER TABLE (ni de verrou) inutile
+    pending = connection.exec_driver_sql(
+        "SELECT attname FROM pg_attribute WHERE attrelid = 'emails'::regclass "
+        "AND attname = ANY(%(columns)s) AND attcompression IS DISTINCT FROM 'l'",
+        {"columns": list(EMAIL_BODY_COLUMNS)}
+    ).scalars().all()
+    for column in pending:
+        connection.exec_driver_sql(f"ALTER TABLE emails ALTER COLUMN {column} SET COMPRESSION lz4")
 
 
 class ApplicationEvent(Base):
@@ -122,3 +190,101 @@ class ApplicationEvent(Base):
     
     # Relationship with application
     application = relationship("Application", back_populates="events")
+
+
+class ApplicationEmbedding(Base):
+    """Embedding d'une candidature, recalculé seulement quand son texte change"""
+    __tablename__ = "application_embeddings"
+    
+    application_id = Column(PGUUID(as_uuid=True), ForeignKey('applications.id', ondelete='CASCADE'), primary_key=True)
+    model = Column(Text, nullable=False)
+    text_hash = Column(String(64), nullable=False)  # sha256(modèle + texte embarqué)
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 little-endian
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now(), onupdate=func.now())
+
+
+class LLMResponseCache(Base):
+    """Réponses brutes des LLM, indexées par (fournisseur, modèle, hash du prompt)"""
+    __tablename__ = "llm_response_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256(fournisseur + modèle + paramètres + prompt)
+    provider = Column(Text, nullable=False)
+    model = Column(Text, nullable=False)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    hit_count = Column(Integer, nullable=False, default=0)
+
+
+class NLPBatchJob(Base):
+    """Traitement NLP en masse, exécuté par lots avec point de reprise"""
+    __tablename__ = "nlp_batch_jobs"
+    
+    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status = Column(Text, nullable=False, default="PENDING")  # PENDING, RUNNING, COMPLETED, FAILED, CANCELLED
+    # Emails de cet utilisateur uniquement (NULL : tous les utilisateurs)
+    user_id = Column(PGUUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    start_date = Column(TIMESTAMP(timezone=True), nullable=False)  # Emails créés depuis cette date
+    force_reprocess = Column(Boolean, nullable=False, default=False)
+    chunk_size = Column(Integer, nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    total_emails = Column(Integer, nullable=False, default=0)  # Estimation à la création
+    processed_emails = Column(Integer, nullable=False, default=0)
+    failed_emails = Column(Integer, nullable=False, default=0)
+    # Point de reprise : dernier (created_at, id) traité
+    last_email_created_at = Column(TIMESTAMP(timezone=True))
+    last_email_id = Column(PGUUID(as_uuid=True))
+    processing_seconds = Column(Float, nullable=False, default=0.0)
+    errors = Column(JSONB)  # Derniers messages d'erreur
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    started_at = Column(TIMESTAMP(timezone=True))
+    heartbeat_at = Column(TIMESTAMP(timezone=True))
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+
+class ImapSyncState(Base):
+    """Point de reprise de l'ingestion IMAP d'un dossier (UID incrémental)"""
+    __tablename__ = "imap_sync_states"
+    
+    account = Column(Text, primary_key=True)  # utilisateur@serveur
+    folder = Column(Text, primary_key=True)
+    uid_validity = Column(BigInteger, nullable=False)  # Change si le serveur renumérote le dossier
+    last_uid = Column(BigInteger, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now(), onupdate=func.now())
+
+
+class StatsCounter(Base):
+    """
+    Compteur statistique d'un utilisateur, maintenu par triggers (voir app.models.stats_counters)
+
+    Pas de clé étrangère vers users : les suppressions en cascade d'un
+    utilisateur décrémentent ses compteurs pendant la suppression elle-même.
+    """
+    __tablename__ = "stats_counters"
+    
+    user_id = Column(PGUUID(as_uuid=True), primary_key=True)
+    metric = Column(Text, primary_key=True)  # emails, email_classification, applications, application_status
+    key = Column(Text, primary_key=True)  # total/classified/linked, type d'email ou statut
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class StatsCounterDelta(Base):
+    """
+    Variation d'un compteur pas encore reportée dans stats_counters
+
+    Table en ajout seul, alimentée par les triggers : voir app.models.stats_counters.
+    """
+    __tablename__ = "stats_counter_deltas"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(PGUUID(as_uuid=True), nullable=False, index=True)
+    metric = Column(Text, nullable=False)
+    key = Column(Text, nullable=False)
+    delta = Column(BigInteger, nullable=False)
+
+
+# Après la création des tables : triggers des compteurs (et recalcul initial),
+# compression des corps d'emails
+event.listen(Base.metadata, "after_create", install_stats_counters)
+event.listen(Base.metadata, "after_create", set_email_body_compression)
@@ -0,0 +1,152 @@
+"""
+Compteurs statistiques par utilisateur (table `stats_counters`)
+
+Les compteurs sont maintenus par des triggers PostgreSQL de niveau
+instruction (tables de transition) sur `emails` et `applications` : toute
+écriture, ORM, Core ou en masse, ajoute ses deltas agrégés dans
+`stats_counter_deltas`, dans la même transaction et avec une seule requête
+par instruction.
+
+La table des deltas ne reçoit que des INSERT : les transactions concurrentes
+(workers NLP d'un même utilisateur) ne se disputent aucun verrou de ligne, là
+où un upsert direct des compteurs les faisait s'interbloquer. Les deltas sont
+reportés périodiquement dans `stats_counters` par une instruction unique
+(`fold_statement`), qui verrouille les compteurs dans un ordre fixe ; les
+lectures additionnent compteurs et deltas pas encore reportés.
+
+Chaque ligne source contribue aux clés (metric, key) renvoyées par une
+fonction SQL : emails/total, emails/classified, emails/linked,
+email_classification/<type>, applications/total, application_status/<statut>.
+"""
+
+# Par table source : colonnes utiles et clés de compteurs d'une ligne `r`
+_COUNTER_SOURCES = {
+    "emails": ("user_id, classification, application_id", "email_stat_keys(r.classification, r.application_id)"),
+    "applications": ("user_id, status", "application_stat_keys(r.status)"),
+}
+
+_KEY_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION email_stat_keys(text, uuid)
+    RETURNS TABLE (metric text, key text) LANGUAGE sql IMMUTABLE AS $$
+        SELECT 'emails', 'total'
+        UNION ALL SELECT 'emails', 'classified' WHERE $1 IS NOT NULL
+        UNION ALL SELECT 'emails', 'linked' WHERE $2 IS NOT NULL
+        UNION ALL SELECT 'email_classification', $1 WHERE $1 IS NOT NULL
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION application_stat_keys(text)
+    RETURNS TABLE (metric text, key text) LANGUAGE sql IMMUTABLE AS $$
+        SELECT 'applications', 'total'
+        UNION ALL SELECT 'application_status', $1
+    $$
+    """,
+]
+
+_UPSERT = """
+        INSERT INTO stats_counters (user_id, metric, key, value)
+        SELECT r.user_id, k.metric, k.key, sum(r.delta)
+        FROM ({rows}) r CROSS JOIN LATERAL {keys} k
+        GROUP BY 1, 2, 3
+        HAVING sum(r.delta) <> 0
+        ON CONFLICT (user_id, metric, key)
+        DO UPDATE SET value = stats_counters.value + EXCLUDED.value;
+"""
+
+_APPEND_DELTAS = """
+        INSERT INTO stats_counter_deltas (user_id, metric, key, delta)
+        SELECT r.user_id, k.metric, k.key, sum(r.delta)
+        FROM ({rows}) r CROSS JOIN LATERAL {keys} k
+        GROUP BY 1, 2, 3
+        HAVING sum(r.delta) <> 0;
+"""
+
+# Deux reports concurrents : le second attend les lignes supprimées par le
+# premier puis les ignore ; les compteurs sont verrouillés dans l'ordre de la clé
+_FOLD = """
+    WITH moved AS (
+        DELETE FROM stats_counter_deltas RETURNING user_id, metric, key, delta
+    )
+    INSERT INTO stats_counters (user_id, metric, key, value)
+    SELECT user_id, metric, key, sum(delta)
+    FROM moved
+    GROUP BY 1, 2, 3
+    HAVING sum(delta) <> 0
+    ORDER BY 1, 2, 3
+    ON CONFLICT (user_id, metric, key)
+    DO UPDATE SET value = stats_counters.value + EXCLUDED.value
+"""
+
+_TRIGGER_FUNCTION = """
+    CREATE OR REPLACE FUNCTION {table}_stats_counters() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN{insert}
+        ELSIF TG_OP = 'DELETE' THEN{delete}
+        ELSE{update}
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+# Les tables de transition imposent un trigger par événement
+_TRIGGER_EVENTS = {
+    "ins": ("INSERT", "NEW TABLE AS new_rows"),
+    "upd": ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    "del": ("DELETE", "OLD TABLE AS old_rows"),
+}
+
+
+def _aggregate(template: str, table: str, *sources) -> str:
+    """Deltas agrégés par clé de compteur ; `sources` : couples (relation, +1 ou -1)"""
+    columns, keys = _COUNTER_SOURCES[table]
+    rows = " UNION ALL ".join(f"SELECT {columns}, {sign} AS delta FROM {name}" for name, sign in sources)
+    return template.format(rows=rows, keys=keys)
+
+
+def fold_statement() -> str:
+    """Report des deltas en attente dans stats_counters (transaction courte)"""
+    return _FOLD.strip()
+
+
+def install_statements() -> list:
+    """DDL des fonctions et triggers (idempotent)"""
+    statements = [sql.strip() for sql in _KEY_FUNCTIONS]
+    for table in _COUNTER_SOURCES:
+        statements.append(_TRIGGER_FUNCTION.format(
+            table=table,
+            insert=_aggregate(_APPEND_DELTAS, table, ("new_rows", 1)),
+            delete=_aggregate(_APPEND_DELTAS, table, ("old_rows", -1)),
+            update=_aggregate(_APPEND_DELTAS, table, ("new_rows", 1), ("old_rows", -1)),
+        ).strip())
+        for suffix, (event, referencing) in _TRIGGER_EVENTS.items():
+            name = f"{table}_stats_{suffix}"
+            statements.append(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+            statements.append(
+                f"CREATE TRIGGER {name} AFTER {event} ON {table} "
+                f"REFERENCING {referencing} FOR EACH STATEMENT "
+                f"EXECUTE FUNCTION {table}_stats_counters()"
+            )
+    return statements
+
+
+def rebuild_statements() -> list:
+    """Recalcul complet des compteurs depuis les tables sources"""
+    statements = ["DELETE FROM stats_counters", "DELETE FROM stats_counter_deltas"]
+    for table in _COUNTER_SOURCES:
+        statements.append(_aggregate(_UPSERT, table, (table, 1)).strip().rstrip(";"))
+    return statements
+
+
+def install_stats_counters(target, connection, **kw) -> None:
+    """
+    Installe les triggers puis recalcule les compteurs (après create_all)
+
+    Les CREATE TRIGGER verrouillent les tables sources jusqu'à la fin de la
+    transaction : aucune écriture concurrente ne peut échapper au recalcul.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in install_statements() + rebuild_statements():
+        connection.exec_driver_sql(statement)
@@ -0,0 +1,277 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import asyncio
+import time
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import Email, NLPBatchJob
+from app.nlp.nlp_orchestrator import NLPOrchestrator
+
+ACTIVE_STATUSES = ("PENDING", "RUNNING")
+MAX_STORED_ERRORS = 50
+
+
+def job_progress(job: NLPBatchJob) -> Dict[str, Any]:
+    """Représentation d'un job pour l'API (progression, débit, ETA)"""
+    done = job.processed_emails + job.failed_emails
+    throughput = done / job.processing_seconds if job.processing_seconds else None
+    remaining = max(job.total_emails - done, 0)
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "total_emails": job.total_emails,
+        "processed_count": job.processed_emails,
+        "failed_count": job.failed_emails,
+        "progress": round(done / job.total_emails, 4) if job.total_emails else (1.0 if job.status == "COMPLETED" else 0.0),
+        "emails_per_second": round(throughput, 2) if throughput else None,
+        "eta_seconds": round(remaining / throughput, 1) if throughput and job.status == "RUNNING" else None,
+        "chunk_size": job.chunk_size,
+        "concurrency": job.concurrency,
+        "checkpoint": {
+            "created_at": job.last_email_created_at.isoformat() if job.last_email_created_at else None,
+            "email_id": str(job.last_email_id) if job.last_email_id else None,
+        },
+        "errors": job.errors or [],
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class NLPBatchRunner:
+    """
+    Moteur de traitement NLP en masse
+
+    Les emails sont parcourus par lots de `chunk_size` dans l'ordre
+    (created_at, id) : chaque lot est une requête keyset courte, si bien que
+    ni la mémoire ni la durée des transactions ne dépendent de la taille de
+    la boîte mail. Après chaque lot, la progression et le point de reprise
+    sont enregistrés dans `nlp_batch_jobs` : un job interrompu (erreur,
+    redémarrage) reprend là où il s'était arrêté. Le nombre de jobs simultanés
+    est borné par NLP_BATCH_MAX_JOBS, la concurrence intra-lot par le job.
+    """
+
+    _tasks: Dict[str, asyncio.Task] = {}
+    _slots: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def _get_slots(cls) -> asyncio.Semaphore:
+        if cls._slots is None:
+            cls._slots = asyncio.Semaphore(max(1, settings.NLP_BATCH_MAX_JOBS))
+        return cls._slots
+
+    @staticmethod
+    def _email_filters(job: NLPBatchJob) -> List[Any]:
+        filters = [Email.created_at >= job.start_date]
+        if job.user_id is not None:
+            filters.append(Email.user_id == job.user_id)
+        # Sans retraitement forcé, seuls les emails jamais classifiés sont traités
+        if not job.force_reprocess:
+            filters.append(Email.classification.is_(None))
+        return filters
+
+    @classmethod
+    async def create_job(
+        cls,
+        db: AsyncSession,
+        start_date: datetime,
+        force_reprocess: bool = False,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        user_id: Optional[UUID] = None
+    ) -> NLPBatchJob:
+        """Crée un job (PENDING) et estime le nombre d'emails à traiter (d'un utilisateur, ou de tous)"""
+        job = NLPBatchJob(
+            status="PENDING",
+            user_id=user_id,
+            start_date=start_date,
+            force_reprocess=force_reprocess,
+            chunk_size=max(1, chunk_size or settings.NLP_BATCH_CHUNK_SIZE),
+            concurrency=max(1, concurrency or settings.NLP_CONCURRENCY),
+            processed_emails=0,
+            failed_emails=0,
+            processing_seconds=0.0,
+            errors=[],
+            created_at=datetime.now(timezone.utc),
+        )
+        job.total_emails = (await db.execute(
+            select(func.count(Email.id)).where(*cls._email_filters(job))
+        )).scalar_one()
+        db.add(job)
+        await db.commit()
+        return job
+
+    @classmethod
+    async def schedule(cls, start_date: datetime, user_id: UUID) -> Optional[str]:
+        """
+        Crée et lance en arrière-plan le job des emails non classifiés de
+        `user_id` créés depuis `start_date` ; None s'il n'y a rien à traiter
+        """
+        async with AsyncSessionLocal() as db:
+            job = await cls.create_job(db, start_date, user_id=user_id)
+        if not job.total_emails:
+            await cls.run(job.id)  # Rien à traiter : job clos immédiatement
+            return None
+        cls.start(job.id)
+        return str(job.id)
+
+    @classmethod
+    def start(cls, job_id: UUID) -> asyncio.Task:
+        """Lance le job en tâche de fond (une seule tâche par job et par processus)"""
+        key = str(job_id)
+        task = cls._tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(cls.run(job_id))
+            cls._tasks[key] = task
+            task.add_done_callback(lambda _: cls._tasks.pop(key, None))
+        return task
+
+    @classmethod
+    async def _claim(cls, job_id: UUID) -> bool:
+        """
+        Passe le job en RUNNING s'il est en attente, ou s'il était en cours
+        mais que son heartbeat est trop ancien (processus arrêté)
+        """
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=settings.NLP_BATCH_STALE_SECONDS)
+        async with AsyncSessionLocal() as db:
+            claimed = (await db.execute(
+                update(NLPBatchJob)
+                .where(
+                    NLPBatchJob.id == job_id,
+                    or_(
+                        NLPBatchJob.status == "PENDING",
+                        and_(
+                            NLPBatchJob.status == "RUNNING",
+                            or_(NLPBatchJob.heartbeat_at.is_(None), NLPBatchJob.heartbeat_at < stale_before)
+                        )
+                    )
+                )
+                .values(
+                    status="RUNNING",
+                    started_at=func.coalesce(NLPBatchJob.started_at, now),
+                    heartbeat_at=now
+                )
+                .returning(NLPBatchJob.id)
+            )).scalar_one_or_none()
+            await db.commit()
+        return claimed is not None
+
+    @classmethod
+    async def run(cls, job_id: UUID) -> Optional[NLPBatchJob]:
+        """Exécute (ou reprend) un job jusqu'à son terme ; retourne son état final"""
+        async with cls._get_slots():
+            if not await cls._claim(job_id):
+                logger.info(f"NLP batch job {job_id} not claimable (finished or running elsewhere)")
+                return None
+            logger.info(f"NLP batch job {job_id} started")
+
+            try:
+                while True:
+                    async with AsyncSessionLocal() as db:
+                        job = await db.get(NLPBatchJob, job_id)
+                        if job is None or job.status != "RUNNING":
+                            # Annulé entre deux lots
+                            return job
+
+                        query = select(Email.id, Email.created_at).where(*cls._email_filters(job))
+                        if job.last_email_created_at is not None:
+                            query = query.where(
+                                tuple_(Email.created_at, Email.id)
+                                > tuple_(job.last_email_created_at, job.last_email_id)
+                            )
+                        rows = (await db.execute(
+                            query.order_by(Email.created_at, Email.id).limit(job.chunk_size)
+                        )).all()
+
+                        if not rows:
+                            job.status = "COMPLETED"
+                            job.finished_at = datetime.now(timezone.utc)
+                            await db.commit()
+                            logger.info(f"NLP batch job {job_id} completed: "
+                                        f"{job.processed_emails} processed, {job.failed_emails} failed")
+                            return job
+                        concurrency = job.concurrency
+
+                    started = time.perf_counter()
+                    stats = await NLPOrchestrator.process_emails_concurrently(
+                        [row.id for row in rows], concurrency=concurrency
+                    )
+                    elapsed = time.perf_counter() - started
+
+                    # Point de reprise et progression, validés après chaque lot
+                    async with AsyncSessionLocal() as db:
+                        job = await db.get(NLPBatchJob, job_id)
+                        job.processed_emails += stats["processed"]
+                        job.failed_emails += stats["failed"]
+                        job.processing_seconds += elapsed
+                        job.last_email_created_at = rows[-1].created_at
+                        job.last_email_id = rows[-1].id
+                        job.heartbeat_at = datetime.now(timezone.utc)
+                        if stats["errors"]:
+                            job.errors = ((job.errors or []) + stats["errors"])[-MAX_STORED_ERRORS:]
+                        await db.commit()
+
+            except asyncio.CancelledError:
+                # Arrêt du processus : le job sera repris au prochain démarrage
+                await cls._release(job_id)
+                raise
+            except Exception as e:
+                logger.error(f"NLP batch job {job_id} failed: {e}")
+                async with AsyncSessionLocal() as db:
+                    job = await db.get(NLPBatchJob, job_id)
+                    if job is not None:
+                        job.status = "FAILED"
+                        job.finished_at = datetime.now(timezone.utc)
+                        job.errors = ((job.errors or []) + [f"Job: {e}"])[-MAX_STORED_ERRORS:]
+                        await db.commit()
+                    return job
+
+    @classmethod
+    async def _release(cls, job_id: UUID) -> None:
+        """Remet un job interrompu en attente pour qu'il soit repris immédiatement"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(NLPBatchJob)
+                .where(NLPBatchJob.id == job_id, NLPBatchJob.status == "RUNNING")
+                .values(status="PENDING")
+            )
+            await db.commit()
+
+    @classmethod
+    async def cancel(cls, db: AsyncSession, job: NLPBatchJob) -> NLPBatchJob:
+        """Annule un job : le lot en cours se termine, les suivants ne sont pas lancés"""
+        if job.status in ACTIVE_STATUSES:
+            job.status = "CANCELLED"
+            job.finished_at = datetime.now(timezone.utc)
+            await db.commit()
+        return job
+
+    @classmethod
+    async def resume_interrupted_jobs(cls) -> int:
+        """Relance les jobs en attente ou interrompus (appelé au démarrage de l'API)"""
+        async with AsyncSessionLocal() as db:
+            job_ids = (await db.execute(
+                select(NLPBatchJob.id)
+                .where(NLPBatchJob.status.in_(ACTIVE_STATUSES))
+                .order_by(NLPBatchJob.created_at)
+            )).scalars().all()
+        for job_id in job_ids:
+            cls.start(job_id)
+        if job_ids:
+            logger.info(f"Resuming {len(job_ids)} NLP batch job(s)")
+        return len(job_ids)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Interrompt les jobs de ce processus en conservant leur point de reprise"""
+        tasks = list(cls._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
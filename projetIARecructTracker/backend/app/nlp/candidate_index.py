@@ -0,0 +1,270 @@
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import re
+import threading
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import Application
+
+# Mots vides ignorés dans les intitulés de poste (mêmes que le matching par règles)
+STOP_WORDS = frozenset({
+    'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'et', 'ou', 'pour', 'dans',
+    'the', 'a', 'an', 'and', 'or', 'for', 'in', 'at', 'to', 'of', 'with'
+})
+
+_KEYWORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+_NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9]')
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrammes d'un texte (vide si le texte fait moins de 3 caractères)"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def extract_keywords(text: str) -> List[str]:
+    """Mots-clés d'un texte (3 lettres minimum, sans mots vides)"""
+    return [w for w in _KEYWORD_RE.findall(text.lower()) if w not in STOP_WORDS]
+
+
+def clean_company(name: str) -> str:
+    """Nom d'entreprise réduit à ses caractères alphanumériques (comparaison aux domaines)"""
+    return _NON_ALNUM_RE.sub('', name).lower()
+
+
+@dataclass(frozen=True)
+class CharProfile:
+    """Caractères d'un texte, pour majorer SequenceMatcher.ratio() sans l'exécuter"""
+
+    chars: Counter
+    length: int
+
+    @classmethod
+    def of(cls, text: str) -> "CharProfile":
+        return cls(Counter(text), len(text))
+
+    def ratio_bound(self, other: "CharProfile") -> float:
+        """
+        Majorant de SequenceMatcher(None, a, b).ratio() (équivalent de quick_ratio) :
+        les blocs communs ne peuvent pas apparier plus de caractères que les
+        deux textes n'en ont en commun
+        """
+        total = self.length + other.length
+        if not total:
+            return 1.0
+        return 2.0 * sum((self.chars & other.chars).values()) / total
+
+
+@dataclass
+class ApplicationCandidateIndex:
+    """
+    Index en mémoire des candidatures d'un utilisateur
+
+    - trigrammes du nom d'entreprise (texte brut et version alphanumérique)
+    - index inversé des mots-clés de l'intitulé de poste
+    - caractères du nom d'entreprise et de l'intitulé (majorant de similarité)
+
+    Il ne sert qu'à écarter les candidatures qui ne peuvent pas atteindre le
+    seuil du scoring : l'ensemble retenu contient toujours toutes celles qui
+    l'atteignent, le scoring détaillé restant fait sur ces candidates (le
+    matching sémantique, lui, n'est pas restreint).
+    """
+
+    fingerprint: Tuple = ()
+    statuses: Dict[str, str] = field(default_factory=dict)
+    company_trigrams: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    text_postings: Dict[str, Set[str]] = field(default_factory=dict)
+    clean_postings: Dict[str, Set[str]] = field(default_factory=dict)
+    keyword_postings: Dict[str, Set[str]] = field(default_factory=dict)
+    company_profiles: Dict[str, CharProfile] = field(default_factory=dict)
+    title_profiles: Dict[str, Optional[CharProfile]] = field(default_factory=dict)
+    # Candidatures trop courtes pour être indexées : toujours candidates
+    unindexed: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple], fingerprint: Tuple = ()) -> "ApplicationCandidateIndex":
+        index = cls(fingerprint=fingerprint)
+        for app_id, company_name, job_title, status in rows:
+            app_id = str(app_id)
+            index.statuses[app_id] = status
+            company_lower = (company_name or "").lower()
+            company_grams = frozenset(trigrams(company_lower))
+            clean_grams = trigrams(clean_company(company_lower))
+            if not company_grams or not clean_grams:
+                index.unindexed.add(app_id)
+            index.company_trigrams[app_id] = company_grams
+            for gram in company_grams:
+                index.text_postings.setdefault(gram, set()).add(app_id)
+            for gram in clean_grams:
+                index.clean_postings.setdefault(gram, set()).add(app_id)
+            for keyword in set(extract_keywords(job_title or "")):
+                index.keyword_postings.setdefault(keyword, set()).add(app_id)
+            index.company_profiles[app_id] = CharProfile.of(company_lower)
+            index.title_profiles[app_id] = CharProfile.of(job_title.lower()) if job_title else None
+        return index
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def applications(self, statuses: Optional[Iterable[str]] = None) -> Set[str]:
+        """Toutes les candidatures indexées (filtrées par statut)"""
+        return self._filter_status(set(self.statuses), statuses)
+
+    def _filter_status(self, app_ids: Set[str], statuses: Optional[Iterable[str]]) -> Set[str]:
+        if statuses is None:
+            return app_ids
+        allowed = set(statuses)
+        return {app_id for app_id in app_ids if self.statuses.get(app_id) in allowed}
+
+    def email_candidates(
+        self,
+        email_text: str,
+        sender_domain: str = "",
+        statuses: Optional[Iterable[str]] = None
+    ) -> Set[str]:
+        """
+        Candidatures pouvant correspondre à un email
+
+        Retient une candidature si tous les trigrammes de son nom d'entreprise
+        sont dans le texte (condition nécessaire de `company in text`), si elle
+        partage un trigramme avec le domaine de l'expéditeur, ou si un mot-clé
+        de son intitulé de poste apparaît dans l'email. Sans aucune de ces
+        correspondances, le score par règles ne dépasse pas 0.2 (localisation
+        et candidature récente).
+        """
+        email_text = email_text.lower()
+        candidates = set(self.unindexed)
+
+        # Nom d'entreprise présent dans le texte
+        hits: Dict[str, int] = {}
+        for gram in trigrams(email_text):
+            for app_id in self.text_postings.get(gram, ()):
+                hits[app_id] = hits.get(app_id, 0) + 1
+        candidates.update(
+            app_id for app_id, count in hits.items()
+            if count == len(self.company_trigrams[app_id])
+        )
+
+        # Domaine de l'expéditeur proche du nom d'entreprise
+        if sender_domain:
+            domain_grams = trigrams(clean_company(sender_domain.split('.')[0]))
+            if not domain_grams:
+                # Domaine trop court (acronyme, vide) : impossible à filtrer par trigrammes
+                return self._filter_status(set(self.statuses), statuses)
+            for gram in domain_grams:
+                candidates.update(self.clean_postings.get(gram, ()))
+
+        # Mots-clés de l'intitulé de poste
+        for keyword in set(extract_keywords(email_text)):
+            candidates.update(self.keyword_postings.get(keyword, ()))
+
+        return self._filter_status(candidates, statuses)
+
+    def company_candidates(
+        self,
+        company_name: str,
+        job_title: Optional[str] = None,
+        min_score: float = 0.6,
+        company_weight: float = 0.7,
+        statuses: Optional[Iterable[str]] = None
+    ) -> Set[str]:
+        """
+        Candidatures dont le score entreprise / poste peut dépasser `min_score`
+
+        Le score majoré est celui du suivi intelligent : similarité
+        SequenceMatcher des noms d'entreprise en minuscules, pondérée avec
+        celle des intitulés de poste quand les deux en ont un. Aucun nom ne
+        partageant de trigramme n'est écarté pour autant ("Loreal" /
+        "L'Oréal") : seul le majorant décide.
+        """
+        company = CharProfile.of(company_name.lower())
+        title = CharProfile.of(job_title.lower()) if job_title else None
+        candidates = set()
+        for app_id, app_company in self.company_profiles.items():
+            bound = company.ratio_bound(app_company)
+            app_title = self.title_profiles[app_id]
+            if title is not None and app_title is not None:
+                bound = bound * company_weight + title.ratio_bound(app_title) * (1 - company_weight)
+            if bound > min_score:
+                candidates.add(app_id)
+        return self._filter_status(candidates, statuses)
+
+
+class CandidateIndexCache:
+    """
+    Cache des index par utilisateur
+
+    Chaque accès compare une empreinte (nombre de candidatures, dernière
+    création/modification) calculée par une requête agrégée : toute écriture
+    sur les candidatures, quel que soit le service ou le processus qui l'a
+    faite, invalide l'index de l'utilisateur.
+    """
+
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, ApplicationCandidateIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint_query(user_id):
+        return select(
+            func.count(Application.id),
+            func.max(Application.updated_at),
+            func.max(Application.created_at)
+        ).where(Application.user_id == user_id)
+
+    @staticmethod
+    def _rows_query(user_id):
+        return select(
+            Application.id, Application.company_name, Application.job_title, Application.status
+        ).where(Application.user_id == user_id)
+
+    def _cached(self, key: str, fingerprint: Tuple) -> Optional[ApplicationCandidateIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and index.fingerprint == fingerprint:
+                self._indexes.move_to_end(key)
+                return index
+        return None
+
+    def _store(self, key: str, rows, fingerprint: Tuple) -> ApplicationCandidateIndex:
+        index = ApplicationCandidateIndex.build(rows, fingerprint)
+        logger.debug(f"Candidate index rebuilt for user {key}: {len(index)} applications")
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def get(self, db: Session, user_id) -> ApplicationCandidateIndex:
+        """Index de l'utilisateur (session synchrone)"""
+        key = str(user_id)
+        fingerprint = tuple(db.execute(self._fingerprint_query(user_id)).one())
+        index = self._cached(key, fingerprint)
+        if index is None:
+            index = self._store(key, db.execute(self._rows_query(user_id)).all(), fingerprint)
+        return index
+
+    async def aget(self, db: AsyncSession, user_id) -> ApplicationCandidateIndex:
+        """Index de l'utilisateur (session asynchrone)"""
+        key = str(user_id)
+        fingerprint = tuple((await db.execute(self._fingerprint_query(user_id))).one())
+        index = self._cached(key, fingerprint)
+        if index is None:
+            index = self._store(key, (await db.execute(self._rows_query(user_id))).all(), fingerprint)
+        return index
+
+    def invalidate(self, user_id=None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(str(user_id), None)
+
+
+candidate_index_cache = CandidateIndexCache()
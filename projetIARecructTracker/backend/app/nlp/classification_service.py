@@ -4,8 +4,11 @@ from enum import Enum
 from app.core.mistral_client import mistral_client
 from app.core.gemini_client import gemini_client
 from app.core.config import settings
+from app.core.tracing import span, traced
+from app.nlp.local_classifier import get_local_classifier
+from app.nlp.pattern_engine import compile_patterns
 from loguru import logger
-import re
+import asyncio
 import yaml
 import os
 
@@ -26,7 +29,7 @@ class ClassificationResult(BaseModel):
     confidence: float = Field(ge=0.0, le=1.0)
     reasoning: Optional[str] = None
     keywords_matched: List[str] = Field(default_factory=list)
-    method_used: str = "rules"  # "rules" ou "mistral"
+    method_used: str = "rules"  # "rules", "local_model", "mistral" ou "gemini"
 
 
 class EmailClassificationService:
@@ -100,6 +103,14 @@ class EmailClassificationService:
             r'@(careers|recrutement|rh|hr|talent)[\.-]',
             r'careers@|recrutement@|rh@|hr@'
         ]
+        
+        # ⚡ Compilation unique des règles : préfiltre littéral puis recherche motif par motif
+        self._exclusion_matcher = compile_patterns(self.exclusion_patterns)
+        self._indicator_matcher = compile_patterns(self.recruitment_indicators)
+        self._rule_matchers = {
+            email_type: compile_patterns(patterns)
+            for email_type, patterns in self.rules.items()
+        }
     
     def _load_classification_rules(self) -> Dict[str, List[str]]:
         """Charger les règles de classification depuis les fichiers YAML"""
@@ -174,6 +185,7 @@ class EmailClassificationService:
         
         return rules
     
+    @traced("nlp.classification")
     async def classify_email(
         self, 
         subject: str, 
@@ -194,49 +206,84 @@ class EmailClassificationService:
         # Combiner sujet, corps et expéditeur pour l'analyse
         full_text = f"{sender_email} {subject} {body}".lower()
         
-        # 🚨 ÉTAPE 1: Filtre d'exclusion (newsletters, marketing, etc.)
-        if self._is_excluded_email(full_text):
-            return ClassificationResult(
-                email_type=EmailType.OTHER,
-                confidence=0.95,
-                reasoning="Excluded: Newsletter, notification, marketing or non-recruitment email",
-                method_used="exclusion_filter"
-            )
+        # Étapes 1 à 3 : filtres et règles (expressions régulières)
+        with span("nlp.classification.rules"):
+            # 🚨 ÉTAPE 1: Filtre d'exclusion (newsletters, marketing, etc.)
+            if self._is_excluded_email(full_text):
+                return ClassificationResult(
+                    email_type=EmailType.OTHER,
+                    confidence=0.95,
+                    reasoning="Excluded: Newsletter, notification, marketing or non-recruitment email",
+                    method_used="exclusion_filter"
+                )
         
-        # 🎯 ÉTAPE 2: Vérifier qu'il y a des indicateurs de recrutement
-        if not self._has_recruitment_indicators(full_text):
-            return ClassificationResult(
-                email_type=EmailType.OTHER,
-                confidence=0.85,
-                reasoning="No clear recruitment indicators found (no mention of job, candidature, CV, etc.)",
-                method_used="recruitment_filter"
-            )
+            # 🎯 ÉTAPE 2: Vérifier qu'il y a des indicateurs de recrutement
+            if not self._has_recruitment_indicators(full_text):
+                return ClassificationResult(
+                    email_type=EmailType.OTHER,
+                    confidence=0.85,
+                    reasoning="No clear recruitment indicators found (no mention of job, candidature, CV, etc.)",
+                    method_used="recruitment_filter"
+                )
         
-        # ✅ ÉTAPE 3: Classification avec règles
-        rules_result = self._classify_with_rules(full_text)
+            # ✅ ÉTAPE 3: Classification avec règles
+            rules_result = self._classify_with_rules(full_text)
         
-        # 🤖 ÉTAPE 4: Si confiance faible, utiliser IA (Mistral puis Gemini en fallback)
         # ⚠️ Seuil abaissé à 0.6 pour éviter trop d'appels IA (quota limité)
         if rules_result.confidence < 0.6:
+            # 🧠 ÉTAPE 4: Modèle local entraîné sur les emails déjà étiquetés
+            local_result = self._classify_with_local_model(subject, body, sender_email)
+            if local_result and local_result.confidence >= settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+                return local_result
+            
+            # 🤖 ÉTAPE 5: Modèle local incertain ou absent : IA (Mistral puis Gemini en fallback)
             logger.info(f"Rules confidence {rules_result.confidence} below threshold, trying AI classification")
+            best_result = rules_result
+            if local_result and local_result.confidence > best_result.confidence:
+                best_result = local_result
             
-            # Essayer d'abord Mistral
             ai_result = await self._classify_with_ai(subject, body, sender_email)
             
-            if ai_result and ai_result.confidence > rules_result.confidence:
+            if ai_result and ai_result.confidence > best_result.confidence:
                 return ai_result
+            return best_result
         
         return rules_result
     
+    @traced("nlp.classification.local_model")
+    def _classify_with_local_model(
+        self,
+        subject: str,
+        body: str,
+        sender_email: str = ""
+    ) -> Optional[ClassificationResult]:
+        """Classification par le modèle local (None s'il est désactivé ou non entraîné)"""
+        if not settings.LOCAL_CLASSIFIER_ENABLED:
+            return None
+        model = get_local_classifier(settings.CLASSIFICATION_MODEL_PATH)
+        if model is None:
+            return None
+        try:
+            label, probability = model.predict(subject, body, sender_email)
+            return ClassificationResult(
+                email_type=EmailType(label),
+                confidence=round(probability, 4),
+                reasoning=f"Local model prediction (p={probability:.2f})",
+                method_used="local_model"
+            )
+        except Exception as e:
+            logger.warning(f"Local classifier prediction failed: {e}")
+            return None
+    
     def _is_excluded_email(self, text: str) -> bool:
         """
         Vérifier si l'email doit être exclu (newsletter, notification, marketing, etc.)
         Retourne True si l'email doit être REJETÉ
         """
-        for pattern in self.exclusion_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                logger.debug(f"Exclusion pattern matched: {pattern}")
-                return True
+        pattern = self._exclusion_matcher.search(text)
+        if pattern:
+            logger.debug(f"Exclusion pattern matched: {pattern}")
+            return True
         return False
     
     def _has_recruitment_indicators(self, text: str) -> bool:
@@ -244,14 +291,13 @@ class EmailClassificationService:
         Vérifier qu'il y a au moins un indicateur clair de recrutement
         Retourne True si l'email semble être lié au recrutement
         """
-        for pattern in self.recruitment_indicators:
-            if re.search(pattern, text, re.IGNORECASE):
-                logger.debug(f"Recruitment indicator found: {pattern}")
-                return True
+        pattern = self._indicator_matcher.search(text)
+        if pattern:
+            logger.debug(f"Recruitment indicator found: {pattern}")
+            return True
         
         logger.debug("No recruitment indicators found")
         return False
-        return False
     
     def _classify_with_rules(self, text: str) -> ClassificationResult:
         """
@@ -276,11 +322,8 @@ class EmailClassificationService:
         
         # Collecter tous les matches
         all_matches = {}
-        for email_type, patterns in self.rules.items():
-            matches = []
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    matches.append(pattern)
+        for email_type, matcher in self._rule_matchers.items():
+            matches = matcher.matching_patterns(text)
             
             if matches:
                 confidence = min(len(matches) * 0.3 + 0.4, 1.0)
@@ -329,6 +372,7 @@ class EmailClassificationService:
             method_used="rules"
         )
     
+    @traced("nlp.classification.ai")
     async def _classify_with_ai(
         self, 
         subject: str, 
@@ -337,30 +381,62 @@ class EmailClassificationService:
     ) -> Optional[ClassificationResult]:
         """
         Classification avec IA : Mistral en priorité, Gemini en fallback
+        
+        Requête de secours (hedging) : si Mistral n'a pas répondu après
+        LLM_HEDGE_DELAY_SECONDS, Gemini est interrogé en parallèle et la
+        première réponse valide l'emporte. Un fournisseur dont le disjoncteur
+        est ouvert est ignoré directement.
         """
-        # Essayer d'abord Mistral
-        if mistral_client.is_available():
-            logger.info("Trying Mistral AI for classification")
-            mistral_result = await self._classify_with_mistral(subject, body, sender_email)
-            if mistral_result:
-                logger.info(f"Mistral classification successful: {mistral_result.email_type.value} (confidence: {mistral_result.confidence})")
-                return mistral_result
-            else:
-                logger.warning("Mistral AI failed or returned no result, trying Gemini fallback")
+        use_mistral = mistral_client.is_available() and not mistral_client.monitor.breaker.is_open()
+        use_gemini = gemini_client.is_available() and not gemini_client.monitor.breaker.is_open()
         
-        # Fallback sur Gemini si Mistral échoue ou n'est pas disponible
-        if gemini_client.is_available():
+        if not use_mistral and not use_gemini:
+            logger.warning("No AI classification available (both Mistral and Gemini failed or unavailable)")
+            return None
+        
+        if not use_mistral:
             logger.info("Trying Gemini AI for classification (fallback)")
-            gemini_result = await self._classify_with_gemini(subject, body, sender_email)
-            if gemini_result:
-                logger.info(f"Gemini classification successful: {gemini_result.email_type.value} (confidence: {gemini_result.confidence})")
-                return gemini_result
-            else:
-                logger.warning("Gemini AI also failed")
+            return self._log_ai_result("Gemini", await self._classify_with_gemini(subject, body, sender_email))
+        
+        logger.info("Trying Mistral AI for classification")
+        mistral_task = asyncio.create_task(self._classify_with_mistral(subject, body, sender_email))
+        if not use_gemini:
+            return self._log_ai_result("Mistral", await mistral_task)
+        
+        done, _ = await asyncio.wait({mistral_task}, timeout=settings.LLM_HEDGE_DELAY_SECONDS)
+        if done:
+            mistral_result = mistral_task.result()
+            if mistral_result:
+                return self._log_ai_result("Mistral", mistral_result)
+            logger.warning("Mistral AI failed or returned no result, trying Gemini fallback")
+            return self._log_ai_result("Gemini", await self._classify_with_gemini(subject, body, sender_email))
+        
+        # Mistral est lent : lancer Gemini en parallèle, garder la première réponse valide
+        logger.info(f"Mistral slower than {settings.LLM_HEDGE_DELAY_SECONDS}s, hedging with Gemini")
+        gemini_task = asyncio.create_task(self._classify_with_gemini(subject, body, sender_email))
+        pending = {mistral_task, gemini_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result:
+                        provider = "Mistral" if task is mistral_task else "Gemini"
+                        return self._log_ai_result(provider, result)
+        finally:
+            for task in pending:
+                task.cancel()
         
         logger.warning("No AI classification available (both Mistral and Gemini failed or unavailable)")
         return None
     
+    def _log_ai_result(self, provider: str, result: Optional[ClassificationResult]) -> Optional[ClassificationResult]:
+        if result:
+            logger.info(f"{provider} classification successful: {result.email_type.value} (confidence: {result.confidence})")
+        else:
+            logger.warning(f"{provider} AI classification failed")
+        return result
+    
     async def _classify_with_mistral(
         self, 
         subject: str, 
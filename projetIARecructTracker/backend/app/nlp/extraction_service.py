@@ -2,6 +2,7 @@ from typing import Dict, Any, Optional, List
 from pydantic import BaseModel, Field
 from datetime import datetime
 from app.core.mistral_client import mistral_client
+from app.core.tracing import traced
 from loguru import logger
 import re
 
@@ -137,6 +138,7 @@ Tu es un assistant IA spécialisé dans l'extraction d'informations structurées
 ⚠️ SOIS PRÉCIS: extrais exactement ce qui est écrit, pas d'interprétation.
 """
     
+    @traced("nlp.extraction")
     async def extract_entities(
         self, 
         email_subject: str, 
@@ -170,6 +172,7 @@ Tu es un assistant IA spécialisé dans l'extraction d'informations structurées
         
         return simple_extraction
     
+    @traced("nlp.extraction.rules")
     def _extract_with_rules(
         self, 
         subject: str, 
@@ -248,6 +251,7 @@ Tu es un assistant IA spécialisé dans l'extraction d'informations structurées
         
         return extracted
     
+    @traced("nlp.extraction.ai")
     async def _extract_with_mistral(self, text: str) -> Optional[Dict[str, Any]]:
         """
         Extraction avec Mistral AI en mode JSON structuré
@@ -0,0 +1,206 @@
+"""
+Classifieur local d'emails (TF-IDF mots + n-grammes de caractères, régression logistique)
+
+Entraîné sur les emails déjà étiquetés (colonne `classification`), il est
+servi dans le processus : une prédiction coûte de l'ordre de la centaine de
+microsecondes, contre plusieurs secondes pour un appel LLM.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import threading
+
+from loguru import logger
+
+# Longueur de corps prise en compte (entraînement et prédiction)
+MAX_BODY_CHARS = 2000
+MODEL_FORMAT_VERSION = 1
+
+
+def email_text(subject: str, body: str, sender: str = "") -> str:
+    """Texte soumis au modèle, construit à l'identique à l'entraînement et à la prédiction"""
+    return f"{sender or ''} {subject or ''} {(body or '')[:MAX_BODY_CHARS]}".lower()
+
+
+def build_pipeline():
+    """Pipeline scikit-learn : union de TF-IDF mots/caractères puis classifieur linéaire"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import FeatureUnion, Pipeline
+
+    features = FeatureUnion([
+        ("words", TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=50000, sublinear_tf=True)),
+        # Robuste aux fautes, flexions et mots collés ("entretien", "entretiens", "entretien:")
+        ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), min_df=2, max_features=100000, sublinear_tf=True)),
+    ])
+    return Pipeline([
+        ("features", features),
+        ("classifier", LogisticRegression(max_iter=2000, C=5.0, class_weight="balanced")),
+    ])
+
+
+class _LinearScorer:
+    """
+    Évaluation directe du pipeline entraîné pour un email unique
+
+    `predict_proba` de scikit-learn coûte ~2 ms par appel unitaire (validation,
+    matrices creuses, FeatureUnion) ; ici chaque terme du vocabulaire pointe
+    vers sa colonne de coefficients et le calcul TF-IDF (tf sous-linéaire,
+    normalisation L2 par vectoriseur) puis softmax est refait avec numpy.
+    Le résultat est identique à celui du pipeline.
+    """
+
+    def __init__(self, pipeline):
+        import numpy as np
+
+        classifier = pipeline.named_steps["classifier"]
+        self.classes = [str(label) for label in classifier.classes_]
+        self.intercept = np.asarray(classifier.intercept_, dtype=float)
+        # Une ligne de coefficients par terme : lecture contiguë des termes présents
+        coef = np.ascontiguousarray(np.asarray(classifier.coef_, dtype=float).T)
+        self.vectorizers = []
+        offset = 0
+        for _, vectorizer in pipeline.named_steps["features"].transformer_list:
+            if not vectorizer.sublinear_tf or vectorizer.norm != "l2" or not vectorizer.use_idf:
+                raise ValueError("unsupported vectorizer settings")
+            size = len(vectorizer.vocabulary_)
+            self.vectorizers.append((
+                vectorizer.build_analyzer(),
+                vectorizer.vocabulary_,
+                np.asarray(vectorizer.idf_, dtype=float),
+                coef[offset:offset + size],
+            ))
+            offset += size
+        if offset != coef.shape[0]:
+            raise ValueError("feature count mismatch")
+
+    def predict_proba(self, text: str):
+        import numpy as np
+
+        scores = self.intercept.copy()
+        for analyzer, vocabulary, idf, coef in self.vectorizers:
+            counts: Dict[int, int] = {}
+            for term in analyzer(text):
+                column = vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            if not counts:
+                continue
+            columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            values = (1.0 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))) * idf[columns]
+            scores += (values / np.sqrt(values @ values)) @ coef[columns]
+        if len(self.classes) == 2:
+            # Régression logistique binaire : une seule ligne de coefficients
+            positive = 1.0 / (1.0 + np.exp(-scores[0]))
+            return np.array([1.0 - positive, positive])
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+
+class LocalEmailClassifier:
+    """Modèle entraîné et ses métadonnées (labels, date, métriques d'évaluation)"""
+
+    def __init__(self, pipeline, metadata: Optional[Dict[str, Any]] = None):
+        self.pipeline = pipeline
+        self.metadata = metadata or {}
+        self.labels: List[str] = [str(label) for label in pipeline.classes_]
+        try:
+            self._scorer: Optional[_LinearScorer] = _LinearScorer(pipeline)
+        except Exception as e:
+            logger.warning(f"Local classifier fast path unavailable, using scikit-learn pipeline: {e}")
+            self._scorer = None
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str]) -> "LocalEmailClassifier":
+        """Entraîne un nouveau modèle sur des textes déjà construits par `email_text`"""
+        pipeline = build_pipeline()
+        pipeline.fit(list(texts), list(labels))
+        counts: Dict[str, int] = {}
+        for label in labels:
+            counts[label] = counts.get(label, 0) + 1
+        return cls(pipeline, {
+            "format_version": MODEL_FORMAT_VERSION,
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+            "samples": len(texts),
+            "label_counts": counts,
+        })
+
+    def predict_text(self, text: str) -> Tuple[str, float]:
+        """Label le plus probable et sa probabilité pour un texte construit par `email_text`"""
+        if self._scorer is not None:
+            probabilities = self._scorer.predict_proba(text)
+        else:
+            probabilities = self.pipeline.predict_proba([text])[0]
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def predict(self, subject: str, body: str, sender: str = "") -> Tuple[str, float]:
+        """Label le plus probable et sa probabilité"""
+        return self.predict_text(email_text(subject, body, sender))
+
+    def predict_texts(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """Prédictions en lot (évaluation)"""
+        probabilities = self.pipeline.predict_proba(list(texts))
+        best = probabilities.argmax(axis=1)
+        return [
+            (self.labels[index], float(row[index]))
+            for index, row in zip(best, probabilities)
+        ]
+
+    def save(self, path: str) -> None:
+        """Écrit le modèle de façon atomique (les processus en cours rechargent le nouveau fichier)"""
+        import joblib
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        joblib.dump({"pipeline": self.pipeline, "metadata": self.metadata}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LocalEmailClassifier"]:
+        """Charge un modèle ; None s'il est absent ou illisible"""
+        if not os.path.exists(path):
+            return None
+        try:
+            import joblib
+
+            data = joblib.load(path)
+            metadata = data.get("metadata", {})
+            if metadata.get("format_version") != MODEL_FORMAT_VERSION:
+                logger.warning(f"Ignoring local classifier {path}: unsupported format {metadata.get('format_version')}")
+                return None
+            return cls(data["pipeline"], metadata)
+        except Exception as e:
+            logger.warning(f"Failed to load local classifier {path}: {e}")
+            return None
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, Optional[LocalEmailClassifier]]] = {}
+
+
+def get_local_classifier(path: str) -> Optional[LocalEmailClassifier]:
+    """
+    Modèle partagé par le processus, rechargé si le fichier a été remplacé
+
+    Un réentraînement (CLI) est donc pris en compte sans redémarrer l'API.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is None or cached[0] != mtime:
+            model = LocalEmailClassifier.load(path)
+            if model is not None:
+                logger.info(f"Local classifier loaded from {path} ({model.metadata.get('samples')} samples, "
+                            f"trained {model.metadata.get('trained_at')})")
+            cached = (mtime, model)
+            _cache[path] = cached
+    return cached[1]
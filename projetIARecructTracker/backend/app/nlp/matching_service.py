@@ -2,16 +2,39 @@ from typing import List, Tuple, Optional, Dict, Any
 from pydantic import BaseModel
 from app.core.mistral_client import mistral_client
 from app.core.config import settings
-from app.models.models import Application, Email
-from sqlalchemy.orm import Session
+from app.core.tracing import traced
+from app.models.models import Application, ApplicationEmbedding, Email
+from app.nlp.candidate_index import candidate_index_cache, extract_keywords
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
+import hashlib
+import numpy as np
 import re
 from datetime import datetime, timedelta, timezone
 
 def cosine_similarity_simple(a, b):
-    """Simple cosine similarity calculation"""
-    # Mock implementation for now
-    return [[0.75]]  # Return mock similarity score
+    """
+    Similarité cosinus entre chaque ligne de `a` et chaque ligne de `b`
+
+    Returns:
+        Matrice numpy (len(a), len(b))
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    a_norm = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b_norm = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a_norm @ b_norm.T
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, triés par score décroissant"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=int)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
 
 
 class MatchingResult(BaseModel):
@@ -28,10 +51,14 @@ class MatchingResult(BaseModel):
 class EmailMatchingService:
     """Service de rapprochement sémantique email ↔ candidature"""
     
-    def __init__(self, db: Session):
+    ACTIVE_STATUSES = ('APPLIED', 'ACKNOWLEDGED', 'SCREENING', 'INTERVIEW')
+    
+    def __init__(self, db: AsyncSession, semantic_top_k: int = 10):
         self.db = db
         self.similarity_threshold = settings.SIMILARITY_THRESHOLD
+        self.semantic_top_k = semantic_top_k
     
+    @traced("nlp.matching")
     async def find_matching_applications(
         self, 
         email_subject: str,
@@ -53,35 +80,60 @@ class EmailMatchingService:
         Returns:
             Liste des candidatures correspondantes triées par score
         """
-        # Récupérer uniquement les candidatures actives de l'utilisateur
-        applications = self.db.query(Application).filter(
-            Application.user_id == user_id,
-            Application.status.in_(['APPLIED', 'ACKNOWLEDGED', 'SCREENING', 'INTERVIEW'])
-        ).all()
+        sender_domain = sender_domain or (sender_email.split('@')[-1] if '@' in sender_email else "")
         
-        if not applications:
+        # Pré-filtrer les candidatures actives de l'utilisateur via l'index
+        # (entreprise / domaine / mots-clés du poste) avant le scoring par règles.
+        # Le matching sémantique ne dépend pas de ces mots : il porte sur toutes
+        # les candidatures actives, dont les embeddings sont en cache.
+        index = await candidate_index_cache.aget(self.db, user_id)
+        candidate_ids = index.email_candidates(
+            f"{email_subject} {email_body}",
+            sender_domain,
+            statuses=self.ACTIVE_STATUSES
+        )
+        semantic_enabled = mistral_client.is_available()
+        scope_ids = index.applications(self.ACTIVE_STATUSES) if semantic_enabled else candidate_ids
+        if not scope_ids:
             return []
         
-        results = []
+        applications = (await self.db.execute(
+            select(Application).where(
+                Application.user_id == user_id,
+                Application.id.in_(scope_ids),
+                Application.status.in_(self.ACTIVE_STATUSES)
+            )
+        )).scalars().all()
+        logger.debug(f"Matching email: {len(candidate_ids)} rule candidate(s), "
+                     f"{len(applications)}/{len(index)} applications loaded")
         
-        for app in applications:
-            # Matching par règles simples d'abord
-            rule_match = self._match_with_rules(
+        if not applications:
+            return []
+        
+        # Matching par règles sur les candidates du pré-filtre
+        rule_matches = {
+            str(app.id): self._match_with_rules(
                 app, email_subject, email_body, sender_email, sender_domain
             )
-            
-            # Si le matching par règles est faible, essayer le matching sémantique
-            if rule_match.confidence < 0.7:
-                semantic_match = await self._match_with_embeddings(
-                    app, email_subject, email_body
-                )
-                
-                if semantic_match and semantic_match.similarity_score > rule_match.similarity_score:
-                    semantic_match.semantic_match = True
-                    results.append(semantic_match)
-                else:
-                    results.append(rule_match)
-            else:
+            for app in applications
+            if str(app.id) in candidate_ids
+        }
+        
+        # Matching sémantique pour les candidatures sans correspondance forte par règles
+        # (un seul embedding de l'email, comparé à toutes les candidatures)
+        weak_apps = [
+            app for app in applications
+            if str(app.id) not in rule_matches or rule_matches[str(app.id)].confidence < 0.7
+        ]
+        semantic_matches = await self._match_with_embeddings(weak_apps, email_subject, email_body)
+        
+        results = []
+        for app in applications:
+            rule_match = rule_matches.get(str(app.id))
+            semantic_match = semantic_matches.get(str(app.id))
+            if semantic_match and (rule_match is None or semantic_match.similarity_score > rule_match.similarity_score):
+                results.append(semantic_match)
+            elif rule_match:
                 results.append(rule_match)
         
         # Trier par score de similarité décroissant
@@ -90,6 +142,7 @@ class EmailMatchingService:
         # Filtrer par seuil minimum
         return [r for r in results if r.similarity_score >= self.similarity_threshold]
     
+    @traced("nlp.matching.rules")
     def _match_with_rules(
         self,
         application: Application,
@@ -163,49 +216,114 @@ class EmailMatchingService:
             job_title_match=job_title_match
         )
     
+    @traced("nlp.matching.embeddings")
     async def _match_with_embeddings(
         self,
-        application: Application,
+        applications: List[Application],
         email_subject: str,
         email_body: str
-    ) -> Optional[MatchingResult]:
+    ) -> Dict[str, MatchingResult]:
         """
         Matching sémantique avec Mistral Embed
+        
+        Les embeddings des candidatures sont lus depuis `application_embeddings`
+        (recalculés seulement si leur texte a changé) ; seul l'email est
+        vectorisé, puis toutes les candidatures sont scorées en une opération
+        matricielle et seules les `semantic_top_k` meilleures sont retenues.
+        
+        Returns:
+            Dictionnaire {application_id: MatchingResult}
         """
-        if not mistral_client.is_available():
-            return None
+        if not applications or not mistral_client.is_available():
+            return {}
         
         try:
-            # Créer les textes à comparer
-            app_text = f"{application.company_name} {application.job_title} {application.location or ''}"
             email_text = f"{email_subject} {email_body[:500]}"  # Limiter la taille
             
-            # Obtenir les embeddings
-            embeddings = await mistral_client.get_embeddings([app_text, email_text])
-            
-            if not embeddings or len(embeddings) != 2:
-                return None
-            
-            # Calculer la similarité cosine
-            similarity = cosine_similarity_simple([embeddings[0]], [embeddings[1]])[0][0]
-            
-            # Convertir en score plus lisible
-            score = float(similarity)
-            confidence = score if score > 0.5 else score * 0.8  # Pénaliser les scores faibles
+            app_vectors, email_vector = await self._get_embeddings(applications, email_text)
+            if email_vector is None or not app_vectors:
+                return {}
             
-            reasons = [f"Semantic similarity: {score:.3f}"]
+            embedded_apps = [app for app in applications if str(app.id) in app_vectors]
+            matrix = np.vstack([app_vectors[str(app.id)] for app in embedded_apps])
+            similarities = cosine_similarity_simple(matrix, [email_vector])[:, 0]
             
-            return MatchingResult(
-                application_id=str(application.id),
-                similarity_score=score,
-                confidence=confidence,
-                matching_reasons=reasons,
-                semantic_match=True
-            )
+            results = {}
+            for index in top_k_indices(similarities, self.semantic_top_k):
+                application = embedded_apps[index]
+                # Convertir en score plus lisible
+                score = float(similarities[index])
+                confidence = score if score > 0.5 else score * 0.8  # Pénaliser les scores faibles
+                
+                results[str(application.id)] = MatchingResult(
+                    application_id=str(application.id),
+                    similarity_score=score,
+                    confidence=confidence,
+                    matching_reasons=[f"Semantic similarity: {score:.3f}"],
+                    semantic_match=True
+                )
+            return results
             
         except Exception as e:
             logger.error(f"Error in semantic matching: {e}")
-            return None
+            return {}
+    
+    def _application_text(self, application: Application) -> str:
+        return f"{application.company_name} {application.job_title} {application.location or ''}"
+    
+    def _text_hash(self, text: str) -> str:
+        return hashlib.sha256(f"{settings.MISTRAL_EMBED_MODEL}\n{text}".encode("utf-8")).hexdigest()
+    
+    async def _get_embeddings(
+        self,
+        applications: List[Application],
+        email_text: str
+    ) -> Tuple[Dict[str, np.ndarray], Optional[np.ndarray]]:
+        """
+        Retourne les embeddings des candidatures (cache en base) et celui de l'email
+        
+        Les candidatures sans embedding à jour sont vectorisées dans le même
+        appel que l'email, puis enregistrées (sans commit : la transaction de
+        l'appelant les valide).
+        """
+        hashes = {str(app.id): self._text_hash(self._application_text(app)) for app in applications}
+        stored = (await self.db.execute(
+            select(ApplicationEmbedding).where(
+                ApplicationEmbedding.application_id.in_([app.id for app in applications])
+            )
+        )).scalars().all()
+        
+        vectors: Dict[str, np.ndarray] = {}
+        for row in stored:
+            app_id = str(row.application_id)
+            if row.text_hash == hashes.get(app_id):
+                vectors[app_id] = np.frombuffer(row.vector, dtype="<f4")
+        
+        missing = [app for app in applications if str(app.id) not in vectors]
+        texts = [self._application_text(app) for app in missing] + [email_text]
+        embeddings = await mistral_client.get_embeddings(texts)
+        if not embeddings or len(embeddings) != len(texts):
+            return vectors, None
+        
+        for app, embedding in zip(missing, embeddings):
+            vector = np.asarray(embedding, dtype="<f4")
+            vectors[str(app.id)] = vector
+            values = {
+                "model": settings.MISTRAL_EMBED_MODEL,
+                "text_hash": hashes[str(app.id)],
+                "dimensions": int(vector.shape[0]),
+                "vector": vector.tobytes(),
+                "updated_at": datetime.now(timezone.utc)
+            }
+            await self.db.execute(
+                pg_insert(ApplicationEmbedding)
+                .values(application_id=app.id, **values)
+                .on_conflict_do_update(index_elements=["application_id"], set_=values)
+            )
+        if missing:
+            logger.debug(f"Computed {len(missing)} application embeddings ({len(applications) - len(missing)} cached)")
+        
+        return vectors, np.asarray(embeddings[-1], dtype=np.float32)
     
     def _company_domain_match(self, company_name: str, domain: str) -> bool:
         """
@@ -240,19 +358,8 @@ class EmailMatchingService:
         """
         Extraire les mots-clés pertinents d'un texte
         """
-        # Mots vides à ignorer
-        stop_words = {
-            'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'et', 'ou', 'pour', 'dans',
-            'the', 'a', 'an', 'and', 'or', 'for', 'in', 'at', 'to', 'of', 'with'
-        }
-        
-        # Extraire les mots (minimum 3 caractères)
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-        
-        # Filtrer les mots vides
-        keywords = [w for w in words if w not in stop_words]
-        
-        return keywords
+        # Mots de 3 caractères minimum, sans mots vides (partagé avec l'index de candidatures)
+        return extract_keywords(text)
     
     async def auto_link_email(
         self, 
@@ -262,6 +369,9 @@ class EmailMatchingService:
         """
         Lier automatiquement un email à une candidature si la confiance est élevée
         
+        Seul l'attribut `application_id` de l'email est modifié : la session
+        qui porte l'email (sync ou async) est validée par l'appelant.
+        
         Args:
             email: Email à traiter
             min_confidence: Seuil minimum de confiance pour le linking automatique
@@ -284,7 +394,6 @@ class EmailMatchingService:
             
             # Lier l'email à l'application
             email.application_id = best_match.application_id
-            self.db.commit()
             
             logger.info(f"Auto-linked email {email.id} to application {best_match.application_id} "
                        f"with confidence {best_match.confidence}")
@@ -1,9 +1,19 @@
 from typing import Dict, Any, List, Optional
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from uuid import UUID
+import asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, nlp_session_slots
+from app.core.tracing import traced
 from app.nlp.extraction_service import EmailExtractionService, ExtractedEntity
-from app.nlp.classification_service import EmailClassificationService, ClassificationResult
+from app.nlp.classification_service import EmailClassificationService, ClassificationResult, EmailType
 from app.nlp.matching_service import EmailMatchingService, MatchingResult
+from app.nlp.thread_context import extract_reply_delta, linked_thread_message_query, normalize_subject
 from app.models.models import Email, Application
+from app.services.stats_service import StatsService
 from loguru import logger
 import re
 
@@ -11,21 +21,32 @@ import re
 class NLPOrchestrator:
     """
     Service orchestrateur pour tous les traitements NLP d'emails
+    
+    Travaille sur une AsyncSession : les requêtes SQL, comme les appels LLM,
+    rendent la main à la boucle asyncio au lieu de la bloquer. Les emails
+    traités sont donc chargés avec undefer(Email.raw_body) : une AsyncSession
+    ne peut pas charger une colonne différée à sa lecture.
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.extraction_service = EmailExtractionService()
         self.classification_service = EmailClassificationService()
         self.matching_service = EmailMatchingService(db)
     
+    @traced("nlp.process_email")
     async def process_email_complete(
         self, 
-        email: Email
+        email: Email,
+        commit: bool = True
     ) -> Dict[str, Any]:
         """
         Traitement NLP complet d'un email
         
+        Args:
+            email: Email à traiter
+            commit: Valider la transaction à la fin (False pour un traitement par lot)
+        
         Returns:
             Dictionnaire avec tous les résultats du traitement
         """
@@ -43,13 +64,22 @@ class NLPOrchestrator:
         }
         
         try:
-            # 1. Extraction d'entités
+            # 0. Fil déjà lié à une candidature : seul le nouveau contenu est analysé
+            if email.thread_id:
+                thread_row = (await self.db.execute(linked_thread_message_query(email))).first()
+                if thread_row is not None:
+                    await self._process_thread_reply(email, thread_row, results)
+                    if commit:
+                        await self.db.commit()
+                    return results
+            
+            # 1-2. Extraction d'entités et classification (indépendantes, en parallèle)
             logger.info(f"Starting NLP processing for email {email.id}")
-            extraction = await self.extraction_service.extract_entities(subject, body, sender)
+            extraction, classification = await asyncio.gather(
+                self.extraction_service.extract_entities(subject, body, sender),
+                self.classification_service.classify_email(subject, body, sender)
+            )
             results["extraction"] = extraction.model_dump()
-            
-            # 2. Classification
-            classification = await self.classification_service.classify_email(subject, body, sender)
             results["classification"] = classification.model_dump()
             
             # Mettre à jour l'email avec la classification
@@ -67,7 +97,8 @@ class NLPOrchestrator:
             )
             results["actions_taken"] = actions
             
-            self.db.commit()
+            if commit:
+                await self.db.commit()
             logger.info(f"Successfully processed email {email.id} with NLP")
             
         except Exception as e:
@@ -77,6 +108,182 @@ class NLPOrchestrator:
         
         return results
     
+    async def _process_thread_reply(self, email: Email, thread_row, results: Dict[str, Any]) -> None:
+        """
+        Message d'un fil dont un message précédent est déjà lié à une candidature
+        
+        Le lien et les entités (entreprise, poste, lieu) sont hérités de la
+        candidature : ni extraction ni matching. Seule la partie nouvelle du
+        message est classifiée (le sujet seulement s'il a changé), pour
+        détecter un changement de statut.
+        """
+        application = await self.db.get(Application, thread_row.application_id)
+        if application is None:
+            raise ValueError(f"Thread application {thread_row.application_id} not found")
+        
+        extraction = ExtractedEntity(
+            company_name=application.company_name,
+            job_title=application.job_title,
+            location=application.location,
+            confidence=1.0
+        )
+        subject = email.subject if normalize_subject(email.subject) != normalize_subject(thread_row.subject) else ""
+        delta = extract_reply_delta(email.raw_body or email.snippet)
+        
+        if subject or delta:
+            classification = await self.classification_service.classify_email(subject, delta, email.sender or "")
+        else:
+            # Réponse sans contenu nouveau (citation seule) : aucun signal de statut
+            classification = ClassificationResult(
+                email_type=EmailType.OTHER,
+                confidence=0.5,
+                reasoning="Thread reply without new content",
+                method_used="thread_delta"
+            )
+        
+        email.classification = classification.email_type.value
+        actions = []
+        if email.application_id != application.id:
+            email.application_id = application.id
+            actions.append(f"Inherited application {application.id} from thread {email.thread_id}")
+        actions.extend(await self._take_automatic_actions(email, extraction, classification, []))
+        
+        results["extraction"] = extraction.model_dump()
+        results["classification"] = classification.model_dump()
+        results["matching"] = []
+        results["actions_taken"] = actions
+        results["thread_inherited"] = True
+        logger.info(f"Processed thread reply {email.id} (thread {email.thread_id}): "
+                    f"{classification.email_type.value} on {len(delta)} new chars")
+    
+    @classmethod
+    async def process_emails_concurrently(
+        cls,
+        email_ids: List[UUID],
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Traitement NLP d'un ensemble d'emails avec une concurrence bornée
+        
+        Les emails sont regroupés par fil de discussion puis par domaine
+        d'expéditeur, et triés par date : un même groupe est traité
+        séquentiellement par un seul worker, afin qu'une candidature créée pour
+        un premier email soit retrouvée (ou héritée, dans un fil) par les suivants. Chaque
+        worker dispose de sa propre session et valide tous les `batch_size`
+        emails ; chaque email est isolé dans un SAVEPOINT. Le nombre de workers
+        actifs dans le processus est borné par NLP_MAX_DB_SESSIONS.
+        
+        Returns:
+            Statistiques du traitement (traités, échecs, premiers messages d'erreur)
+        """
+        concurrency = max(1, concurrency or settings.NLP_CONCURRENCY)
+        batch_size = max(1, batch_size or settings.NLP_COMMIT_BATCH_SIZE)
+        stats = {"total": len(email_ids), "processed": 0, "failed": 0, "errors": []}
+        if not email_ids:
+            return stats
+        
+        # Regrouper les emails par fil, sinon par domaine d'expéditeur (ordre chronologique)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Email.id, Email.sender, Email.user_id, Email.thread_id)
+                .where(Email.id.in_(email_ids))
+                .order_by(func.coalesce(Email.sent_at, Email.created_at), Email.id)
+            )).all()
+        groups: Dict[str, List[UUID]] = defaultdict(list)
+        thread_groups: Dict[tuple, str] = {}
+        for email_id, sender, user_id, thread_id in rows:
+            domain = (sender or "").split("@")[-1].strip(" >").lower()
+            key = domain or str(email_id)
+            if thread_id:
+                # Les réponses d'un fil (autre expéditeur compris) suivent son premier message
+                key = thread_groups.setdefault((user_id, thread_id), key)
+            groups[key].append(email_id)
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        for group in groups.values():
+            queue.put_nowait(group)
+        
+        def record_failure(email_id: UUID, error: Any) -> None:
+            stats["failed"] += 1
+            if len(stats["errors"]) < 20:
+                stats["errors"].append(f"Email {email_id}: {error}")
+            logger.error(f"NLP batch processing failed for email {email_id}: {error}")
+        
+        async def worker() -> None:
+            # Sessions NLP bornées pour tout le processus (voir nlp_session_slots)
+            async with nlp_session_slots():
+                await run_worker()
+        
+        async def run_worker() -> None:
+            session = AsyncSessionLocal()
+            orchestrator = cls(session)
+            # Emails traités depuis le dernier commit : comptés une fois le commit réussi
+            uncommitted: List[UUID] = []
+            
+            async def commit_pending() -> None:
+                try:
+                    await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    for email_id in uncommitted:
+                        record_failure(email_id, f"commit: {e}")
+                else:
+                    stats["processed"] += len(uncommitted)
+                finally:
+                    uncommitted.clear()
+            
+            try:
+                while not queue.empty():
+                    group = queue.get_nowait()
+                    for email_id in group:
+                        email = await session.get(Email, email_id, options=[undefer(Email.raw_body)])
+                        if not email:
+                            continue
+                        savepoint = await session.begin_nested()
+                        updates_applications = False
+                        try:
+                            result = await orchestrator.process_email_complete(email, commit=False)
+                            if result.get("processing_success"):
+                                updates_applications = any(isinstance(obj, Application) for obj in session.dirty)
+                                await savepoint.commit()
+                        except Exception as e:
+                            result = {"processing_success": False, "error": str(e)}
+                        if result.get("processing_success"):
+                            uncommitted.append(email_id)
+                        else:
+                            # Écritures partielles de l'email (classification, candidature) annulées
+                            if savepoint.is_active:
+                                await savepoint.rollback()
+                            record_failure(email_id, result.get("error"))
+                        
+                        # Une candidature modifiée reste verrouillée jusqu'au commit : validé
+                        # aussitôt, le verrou n'est pas gardé pendant les appels LLM des
+                        # emails suivants (interblocage avec un autre worker sinon)
+                        if updates_applications or len(uncommitted) >= batch_size:
+                            await commit_pending()
+                if uncommitted:
+                    await commit_pending()
+            except Exception as e:
+                logger.error(f"NLP worker error: {e}")
+                await session.rollback()
+                for email_id in uncommitted:
+                    record_failure(email_id, f"worker: {e}")
+            finally:
+                await session.close()
+        
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(groups)))))
+        
+        # Compteurs statistiques : report des deltas écrits par les workers
+        try:
+            async with AsyncSessionLocal() as db:
+                await StatsService.afold_deltas(db)
+        except Exception as e:
+            logger.warning(f"Stats counters fold failed: {e}")
+        logger.info(f"Concurrent NLP processing done: {stats['processed']} processed, {stats['failed']} failed")
+        return stats
+    
+    @traced("nlp.actions")
     async def _take_automatic_actions(
         self,
         email: Email,
@@ -184,9 +391,9 @@ class NLPOrchestrator:
         from datetime import datetime, timezone
         
         try:
-            application = self.db.query(Application).filter(
-                Application.id == app_id
-            ).first()
+            application = (await self.db.execute(
+                select(Application).where(Application.id == app_id)
+            )).scalar_one_or_none()
             
             if not application:
                 return False
@@ -249,7 +456,7 @@ class NLPOrchestrator:
             )
             
             self.db.add(application)
-            self.db.flush()  # Pour obtenir l'ID
+            await self.db.flush()  # Pour obtenir l'ID
             
             # Lier l'email à cette candidature
             email.application_id = application.id
@@ -285,7 +492,9 @@ class NLPOrchestrator:
         """
         Retraiter un email avec les services NLP (utile pour améliorer les résultats)
         """
-        email = self.db.query(Email).filter(Email.id == email_id).first()
+        email = (await self.db.execute(
+            select(Email).options(undefer(Email.raw_body)).where(Email.id == email_id)
+        )).scalar_one_or_none()
         if not email:
             return {"error": "Email not found"}
         
@@ -0,0 +1,131 @@
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+import re
+
+try:  # Python >= 3.11
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+def _best_factors(candidates: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Choisit l'ensemble de littéraux le plus sélectif (littéraux les plus longs)"""
+    candidates = [c for c in candidates if c and all(c)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def _required_literals(parsed) -> Optional[FrozenSet[str]]:
+    """
+    Calcule un ensemble de littéraux dont au moins un apparaît dans toute
+    correspondance de la séquence `parsed` (None si aucun n'est garanti)
+    """
+    candidates: List[FrozenSet[str]] = []
+    run = ""
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            run += chr(arg)
+            continue
+        if run:
+            candidates.append(frozenset([run]))
+            run = ""
+
+        if op is sre_constants.SUBPATTERN:
+            candidates.append(_required_literals(arg[-1]))
+        elif op is sre_constants.BRANCH:
+            branches = [_required_literals(branch) for branch in arg[1]]
+            if all(branches):
+                candidates.append(frozenset().union(*branches))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            min_repeat, _, item = arg
+            if min_repeat >= 1:
+                candidates.append(_required_literals(item))
+        # AT (\b, ^), ANY, IN, lookarounds... : aucune contrainte littérale exploitable
+    if run:
+        candidates.append(frozenset([run]))
+    return _best_factors(candidates)
+
+
+def extract_required_literals(pattern: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Littéraux requis d'un motif, en minuscules si le motif ignore la casse"""
+    try:
+        literals = _required_literals(sre_parse.parse(pattern, flags))
+    except Exception:
+        return None
+    if literals and flags & re.IGNORECASE:
+        literals = frozenset(literal.lower() for literal in literals)
+    return literals
+
+
+class CompiledPatternSet:
+    """
+    Ensemble de regex compilé une seule fois, avec préfiltre par littéraux
+
+    À la manière de Hyperscan, chaque motif est décomposé en littéraux dont
+    au moins un doit figurer dans le texte pour qu'il puisse correspondre
+    (`\\b(commande|livraison)\\b` → {"commande", "livraison"}). Les recherches
+    de sous-chaînes, très rapides, écartent la plupart des motifs ; seule la
+    regex des motifs restants est exécutée. Les résultats sont identiques à
+    une boucle `re.search` sur tous les motifs.
+    """
+
+    def __init__(self, patterns: Iterable[str], flags: int = re.IGNORECASE):
+        self.patterns: List[str] = list(patterns)
+        self._ignore_case = bool(flags & re.IGNORECASE)
+        self._compiled = [re.compile(pattern, flags) for pattern in self.patterns]
+        self._literals = [extract_required_literals(pattern, flags) for pattern in self.patterns]
+        self._all_literals = sorted(set().union(*(l for l in self._literals if l)))
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _candidates(self, text: str) -> List[int]:
+        """Indices des motifs dont un littéral requis est présent dans le texte"""
+        haystack = text.lower() if self._ignore_case else text
+        present = {literal for literal in self._all_literals if literal in haystack}
+        return [
+            index for index, literals in enumerate(self._literals)
+            if literals is None or not literals.isdisjoint(present)
+        ]
+
+    def first_match(self, text: str) -> Optional["re.Match[str]"]:
+        """
+        Correspondance du premier motif (dans l'ordre de la liste) présent dans le texte
+
+        Équivaut à `re.search` motif par motif jusqu'au premier succès ; le motif
+        retenu est accessible via `match.re.pattern`.
+        """
+        for index in self._candidates(text):
+            match = self._compiled[index].search(text)
+            if match:
+                return match
+        return None
+
+    def search(self, text: str) -> Optional[str]:
+        """Retourne le premier motif (dans l'ordre de la liste) présent dans le texte"""
+        match = self.first_match(text)
+        return match.re.pattern if match else None
+
+    def matching_patterns(self, text: str) -> List[str]:
+        """Retourne tous les motifs présents dans le texte (doublons compris)"""
+        return [
+            self.patterns[index]
+            for index in self._candidates(text)
+            if self._compiled[index].search(text)
+        ]
+
+
+@lru_cache(maxsize=64)
+def _compile_cached(patterns: Tuple[str, ...], flags: int) -> CompiledPatternSet:
+    return CompiledPatternSet(patterns, flags)
+
+
+def compile_patterns(patterns: Iterable[str], flags: int = re.IGNORECASE) -> CompiledPatternSet:
+    """
+    Compile un ensemble de motifs, en partageant le résultat entre les instances
+    de services qui utilisent les mêmes listes
+    """
+    return _compile_cached(tuple(patterns), flags)
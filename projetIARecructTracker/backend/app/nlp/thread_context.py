@@ -0,0 +1,70 @@
+"""
+Contexte de fil de discussion (Email.thread_id) pour le traitement NLP
+
+Dans un fil déjà lié à une candidature, un nouveau message hérite du lien et
+des entités (entreprise, poste) : seule la partie nouvelle du message (hors
+citation des messages précédents) est classifiée pour détecter un changement
+de statut.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from app.models.models import Email
+
+# Préfixes de réponse / transfert (FR, EN, DE...) répétés en tête de sujet
+_SUBJECT_PREFIX_RE = re.compile(r'^\s*((re|fw|fwd|tr|aw|wg|réf|ref)\s*(\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+
+# Début de la citation d'un message précédent : tout ce qui suit est ignoré
+_QUOTE_HEADER_RE = re.compile(
+    r'^\s*('
+    r'on\b.{0,200}\bwrote\s*:'
+    r'|le\b.{0,200}\ba [ée]crit\s*:'
+    r'|-{2,}\s*(original message|message d.origine|forwarded message|message transf[ée]r[ée])\s*-{2,}'
+    r'|(from|de)\s*:.*@.*'
+    r'|_{10,}'
+    r')\s*$',
+    re.IGNORECASE
+)
+
+
+def normalize_subject(subject: Optional[str]) -> str:
+    """Sujet sans préfixes Re:/Fwd:/TR:, en minuscules et espaces normalisés"""
+    cleaned = _SUBJECT_PREFIX_RE.sub('', subject or '')
+    return re.sub(r'\s+', ' ', cleaned).strip().lower()
+
+
+def extract_reply_delta(body: Optional[str]) -> str:
+    """
+    Partie nouvelle d'un message de fil : texte avant la première citation,
+    sans les lignes citées ("> ...")
+    """
+    lines = []
+    for line in (body or '').splitlines():
+        if _QUOTE_HEADER_RE.match(line):
+            break
+        if line.lstrip().startswith('>'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def linked_thread_message_query(email: Email):
+    """
+    Dernier message du même fil (même utilisateur) déjà lié à une candidature
+
+    Retourne une requête (application_id, subject) exécutable par une session
+    synchrone comme asynchrone ; index ix_emails_user_thread.
+    """
+    return (
+        select(Email.application_id, Email.subject)
+        .where(
+            Email.user_id == email.user_id,
+            Email.thread_id == email.thread_id,
+            Email.id != email.id,
+            Email.application_id.is_not(None),
+        )
+        .order_by(func.coalesce(Email.sent_at, Email.created_at).desc())
+        .limit(1)
+    )
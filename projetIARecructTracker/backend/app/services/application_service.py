@@ -1,8 +1,10 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from typing import List, Optional
 from uuid import UUID
+from app.core.pagination import apply_keyset, count_rows
 from app.models.models import Application, ApplicationEvent
+from app.services.stats_service import StatsService
 from app.models.schemas import (
     ApplicationCreate, ApplicationUpdate, ApplicationStatus,
     ApplicationEventCreate, EventType
@@ -14,47 +16,78 @@ class ApplicationService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_applications(
-        self, 
+    def _filtered_query(
+        self,
         user_id: UUID,
-        skip: int = 0, 
-        limit: int = 50, 
         status: Optional[str] = None,
         company: Optional[str] = None,
         search_query: Optional[str] = None
-    ) -> List[Application]:
-        """
-        Récupérer les candidatures avec filtres optionnels pour un utilisateur spécifique
-        """
-        from loguru import logger
-        logger.info(f"🔎 ApplicationService.get_applications - user_id: {user_id}, skip: {skip}, limit: {limit}")
-        
+    ):
         query = self.db.query(Application).filter(Application.user_id == user_id)
-        
-        # Compter le total avant filtres
-        total_for_user = query.count()
-        logger.info(f"📊 Total applications for user {user_id}: {total_for_user}")
-        
+
         if status:
             query = query.filter(Application.status == status)
-        
+
+        # ILIKE '%...%' servi par les index GIN trigrammes (pg_trgm)
         if company:
             query = query.filter(Application.company_name.ilike(f"%{company}%"))
-            
+
         if search_query:
             query = query.filter(
                 (Application.job_title.ilike(f"%{search_query}%")) |
                 (Application.company_name.ilike(f"%{search_query}%")) |
                 (Application.notes.ilike(f"%{search_query}%"))
             )
+        return query
+
+    def get_applications(
+        self, 
+        user_id: UUID,
+        skip: int = 0, 
+        limit: int = 50, 
+        status: Optional[str] = None,
+        company: Optional[str] = None,
+        search_query: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> List[Application]:
+        """
+        Récupérer les candidatures avec filtres optionnels pour un utilisateur spécifique
+
+        Tri par (updated_at, id) décroissant. Avec `cursor` (voir
+        app.core.pagination), la page est lue par keyset et `skip` est ignoré.
+        Lève ValueError si le curseur est invalide.
+        """
+        from loguru import logger
+        logger.info(f"🔎 ApplicationService.get_applications - user_id: {user_id}, skip: {skip}, limit: {limit}, cursor: {bool(cursor)}")
         
-        results = query.order_by(Application.updated_at.desc()).offset(skip).limit(limit).all()
+        query = self._filtered_query(user_id, status, company, search_query)
+        query = apply_keyset(query, Application.updated_at, Application.id, cursor)
+        if not cursor and skip:
+            query = query.offset(skip)
+
+        results = query.limit(limit).all()
         logger.info(f"✅ Returning {len(results)} applications")
         return results
 
-    def create_application(self, application: ApplicationCreate, user_id: UUID) -> Application:
+    def count_applications(
+        self,
+        user_id: UUID,
+        status: Optional[str] = None,
+        company: Optional[str] = None,
+        search_query: Optional[str] = None,
+        mode: str = "estimated"
+    ) -> Optional[int]:
         """
-        Créer une nouvelle candidature pour un utilisateur spécifique
+        Nombre de candidatures correspondant aux filtres
+
+        mode : "estimated" (plan PostgreSQL, coût constant), "exact" (COUNT) ou "none"
+        """
+        query = self._filtered_query(user_id, status, company, search_query)
+        return count_rows(self.db, query, mode)
+
+    def build_application(self, application: ApplicationCreate, user_id: UUID) -> Application:
+        """
+        Construit une candidature sans l'ajouter à la session (ni commit)
         """
         # Définir la prochaine action par défaut (7 jours après la candidature)
         next_action_at = application.next_action_at or (datetime.utcnow() + timedelta(days=7))
@@ -82,6 +115,13 @@ class ApplicationService:
             applied_date=application.applied_date,
             priority=application.priority
         )
+        return db_application
+
+    def create_application(self, application: ApplicationCreate, user_id: UUID) -> Application:
+        """
+        Créer une nouvelle candidature pour un utilisateur spécifique
+        """
+        db_application = self.build_application(application, user_id)
         
         self.db.add(db_application)
         self.db.commit()
@@ -185,31 +225,41 @@ class ApplicationService:
             for event in events
         ]
 
-    def get_applications_summary(self):
+    def get_applications_summary(self, user_id: UUID):
         """
-        Récupérer un résumé statistique des candidatures
+        Récupérer un résumé statistique des candidatures d'un utilisateur
+
+        Total et répartition par statut viennent des compteurs matérialisés
+        (stats_counters) ; les actions en retard dépendent de l'heure courante
+        et sont comptées via l'index partiel ix_applications_overdue.
         """
-        # Comptage par statut
-        status_counts = self.db.query(
-            Application.status,
-            func.count(Application.id).label('count')
-        ).group_by(Application.status).all()
-        
-        # Total des candidatures
-        total = self.db.query(func.count(Application.id)).scalar()
+        counters = StatsService.get_counters(self.db, user_id)
         
         # Candidatures avec prochaine action en retard
         overdue_count = self.db.query(func.count(Application.id))\
+            .filter(Application.user_id == user_id)\
             .filter(Application.next_action_at < datetime.utcnow())\
             .filter(Application.status.in_(['APPLIED', 'ACKNOWLEDGED', 'SCREENING']))\
             .scalar()
         
         return {
-            "total": total,
-            "status_breakdown": {status: count for status, count in status_counts},
+            "total": counters.get("applications", {}).get("total", 0),
+            "status_breakdown": counters.get("application_status", {}),
             "overdue_actions": overdue_count
         }
 
+    @staticmethod
+    def event_values(application_id: UUID, event_type: EventType, payload: dict) -> dict:
+        """Valeurs d'un événement pour une insertion groupée (insert_events)"""
+        return {"application_id": application_id, "event_type": event_type.value, "payload": payload}
+
+    def insert_events(self, events: List[dict]) -> None:
+        """
+        Insère des événements en une seule requête multi-lignes (sans commit)
+        """
+        if events:
+            self.db.execute(insert(ApplicationEvent), events)
+
     def _create_event(self, application_id: UUID, event_type: EventType, payload: dict):
         """
         Créer un événement pour une candidature
@@ -0,0 +1,82 @@
+"""
+Service d'insertion en masse des emails (déduplication et INSERT groupés)
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Email
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmailBulkService:
+    """
+    Déduplication et insertion des emails par lots
+
+    Remplace le couple SELECT + add/flush par message : une requête IN par
+    tranche d'identifiants, puis un INSERT ... ON CONFLICT DO NOTHING multi-lignes
+    (insertmanyvalues de SQLAlchemy) dans la transaction de l'appelant.
+    """
+
+    # Taille des tranches pour les clauses IN et les INSERT multi-lignes
+    CHUNK_SIZE = 500
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _chunks(self, values: List[Any]) -> Iterable[List[Any]]:
+        for start in range(0, len(values), self.CHUNK_SIZE):
+            yield values[start:start + self.CHUNK_SIZE]
+
+    def find_existing_gmail_ids(self, user_id: UUID, gmail_message_ids: Iterable[str]) -> Set[str]:
+        """Retourne les IDs Gmail déjà présents en base pour l'utilisateur"""
+        ids = list(dict.fromkeys(i for i in gmail_message_ids if i))
+        existing: Set[str] = set()
+        for chunk in self._chunks(ids):
+            rows = self.db.query(Email.gmail_message_id).filter(
+                Email.user_id == user_id,
+                Email.gmail_message_id.in_(chunk)
+            ).all()
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def find_existing_external_ids(self, external_ids: Iterable[str], user_id: Optional[UUID] = None) -> Set[str]:
+        """Retourne les Message-Id (external_id) déjà présents en base"""
+        ids = list(dict.fromkeys(i for i in external_ids if i))
+        existing: Set[str] = set()
+        for chunk in self._chunks(ids):
+            query = self.db.query(Email.external_id).filter(Email.external_id.in_(chunk))
+            if user_id is not None:
+                query = query.filter(Email.user_id == user_id)
+            existing.update(row[0] for row in query.all())
+        return existing
+
+    def insert_emails(self, rows: List[Dict[str, Any]]) -> List[UUID]:
+        """
+        Insère les emails en lots, en ignorant les doublons (user_id, gmail_message_id)
+
+        Les lignes doivent toutes avoir les mêmes clés. Aucun commit n'est fait :
+        l'appelant garde la maîtrise de la transaction.
+
+        Returns:
+            IDs des emails réellement insérés
+        """
+        if not rows:
+            return []
+
+        for row in rows:
+            row.setdefault("id", uuid.uuid4())
+
+        stmt = pg_insert(Email).on_conflict_do_nothing().returning(Email.id)
+        inserted: List[UUID] = []
+        for chunk in self._chunks(rows):
+            inserted.extend(self.db.execute(stmt, chunk).scalars().all())
+
+        if len(inserted) < len(rows):
+            logger.debug(f"{len(rows) - len(inserted)} emails déjà présents ignorés à l'insertion")
+        return inserted
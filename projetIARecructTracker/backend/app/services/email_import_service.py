@@ -0,0 +1,258 @@
+"""
+Import en masse d'emails : fichiers .eml, archives mbox et zip de .eml / mbox
+"""
+import email.header
+import email.utils
+import hashlib
+import re
+import zipfile
+from datetime import datetime, timezone
+from email.message import Message
+from email.parser import BytesParser
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+from uuid import UUID
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.nlp.batch_jobs import NLPBatchRunner
+from app.services.email_bulk_service import EmailBulkService
+
+logger = logging.getLogger(__name__)
+
+ZIP_MAGIC = b"PK\x03\x04"
+MBOX_MAGIC = b"From "
+# Ligne "From " échappée dans le corps (formats mboxo / mboxrd)
+_ESCAPED_FROM_RE = re.compile(rb"^>+From ")
+
+
+def _decode_header(value: Optional[str]) -> str:
+    """En-tête décodé (mots encodés RFC 2047), sans lever d'exception"""
+    if not value:
+        return ""
+    try:
+        return str(email.header.make_header(email.header.decode_header(str(value)))).strip()
+    except Exception:
+        return str(value).strip()
+
+
+def _decode_payload(part: Message) -> str:
+    """Corps d'une partie décodé selon son charset déclaré (UTF-8 par défaut)"""
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return ""
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+class EmailImportService:
+    """
+    Moteur d'import d'emails en masse
+
+    Les fichiers ne sont jamais lus entièrement en mémoire : un mbox est
+    découpé message par message au fil de la lecture, un zip est parcouru
+    membre par membre, chaque message est analysé par BytesParser. Les corps sont décodés selon le charset de chaque
+    partie. Les messages sont dédupliqués et insérés par lots
+    (EmailBulkService) avec un commit par lot ; le traitement NLP n'est pas
+    fait pendant l'import mais confié à un job NLPBatchRunner.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.bulk_service = EmailBulkService(db)
+        self.batch_size = EmailBulkService.CHUNK_SIZE
+
+    # --- Lecture des fichiers ---
+
+    @staticmethod
+    def detect_format(filename: str, stream: BinaryIO) -> str:
+        """Format d'un fichier importé : zip, mbox ou eml (signature puis extension)"""
+        head = stream.read(len(ZIP_MAGIC))
+        stream.seek(0)
+        if head.startswith(ZIP_MAGIC):
+            return "zip"
+        if head.startswith(MBOX_MAGIC) or (filename or "").lower().endswith((".mbox", ".mbx")):
+            return "mbox"
+        return "eml"
+
+    @staticmethod
+    def iter_mbox(stream: BinaryIO) -> Iterator[Message]:
+        """
+        Messages d'une archive mbox, analysés au fil de la lecture
+
+        Seul le message courant est gardé en mémoire ; il est transmis d'un
+        bloc à BytesParser (bien plus rapide que d'alimenter le parseur ligne
+        à ligne).
+        """
+        parser = BytesParser()
+        lines: Optional[List[bytes]] = None
+        after_blank = True
+        for line in stream:
+            # Séparateur : "From " en début de fichier ou après une ligne vide
+            # (tolère les exports qui n'échappent pas les "From " du corps)
+            if after_blank and line.startswith(MBOX_MAGIC):
+                if lines is not None:
+                    yield parser.parsebytes(b"".join(lines))
+                lines = []
+                continue
+            after_blank = not line.strip()
+            if lines is None:
+                # Contenu avant le premier séparateur : ignoré
+                continue
+            if line[:1] == b">" and _ESCAPED_FROM_RE.match(line):
+                line = line[1:]
+            lines.append(line)
+        if lines is not None:
+            yield parser.parsebytes(b"".join(lines))
+
+    def iter_messages(self, filename: str, stream: BinaryIO) -> Iterator[Message]:
+        """Messages contenus dans un fichier importé, quel que soit son format"""
+        file_format = self.detect_format(filename, stream)
+        if file_format == "mbox":
+            yield from self.iter_mbox(stream)
+        elif file_format == "zip":
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    name = info.filename.lower()
+                    if info.is_dir() or name.startswith("__macosx/"):
+                        continue
+                    if name.endswith(".eml"):
+                        with archive.open(info) as member:
+                            yield BytesParser().parse(member)
+                    elif name.endswith((".mbox", ".mbx")):
+                        with archive.open(info) as member:
+                            yield from self.iter_mbox(member)
+        else:
+            yield BytesParser().parse(stream)
+
+    # --- Conversion en lignes de la table emails ---
+
+    @staticmethod
+    def _extract_bodies(msg: Message) -> Dict[str, str]:
+        """Premières parties text/plain et text/html hors pièces jointes"""
+        bodies: Dict[str, str] = {}
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            if part.get_content_disposition() == "attachment":
+                continue
+            content_type = part.get_content_type()
+            if content_type in ("text/plain", "text/html") and content_type not in bodies:
+                bodies[content_type] = _decode_payload(part)
+        return bodies
+
+    @staticmethod
+    def _external_id(msg: Message, body: str) -> str:
+        """Message-ID, ou empreinte stable du message s'il n'en a pas (réimport idempotent)"""
+        message_id = (msg.get("Message-ID") or "").strip()
+        if message_id:
+            return message_id
+        fingerprint = "\n".join([
+            str(msg.get("Date", "")), str(msg.get("From", "")), str(msg.get("Subject", "")), body[:1000]
+        ])
+        return f"<{hashlib.sha1(fingerprint.encode('utf-8', 'replace')).hexdigest()}@import>"
+
+    def message_to_row(self, msg: Message, user_id: UUID) -> Dict[str, Any]:
+        """Ligne prête pour EmailBulkService.insert_emails"""
+        bodies = self._extract_bodies(msg)
+        body = bodies.get("text/plain", "")
+        clean_body = re.sub(r"\s+", " ", body).strip()
+
+        sent_at = None
+        if msg.get("Date"):
+            try:
+                sent_at = email.utils.parsedate_to_datetime(str(msg["Date"]))
+            except (TypeError, ValueError):
+                sent_at = None
+
+        def addresses(header: str) -> List[str]:
+            values = [_decode_header(value) for value in msg.get_all(header, [])]
+            return [address for _, address in email.utils.getaddresses(values) if address]
+
+        recipients = addresses("To")
+        return {
+            "user_id": user_id,
+            "external_id": self._external_id(msg, body),
+            "subject": _decode_header(msg.get("Subject")),
+            "sender": _decode_header(msg.get("From")),
+            "recipient": recipients[0] if recipients else None,
+            "recipients": recipients,
+            "cc": addresses("Cc"),
+            "bcc": addresses("Bcc"),
+            "sent_at": sent_at,
+            "raw_headers": str(msg.items()),
+            "raw_body": body,
+            "html_body": bodies.get("text/html") or None,
+            "snippet": clean_body[:200] + ("..." if len(clean_body) > 200 else ""),
+            "is_sent": "false",
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    # --- Import ---
+
+    def _flush(self, rows: List[Dict[str, Any]], user_id: UUID, stats: Dict[str, Any]) -> None:
+        """Déduplique (base et lot) puis insère un lot, validé par un commit"""
+        existing = self.bulk_service.find_existing_external_ids(
+            (row["external_id"] for row in rows), user_id=user_id
+        )
+        new_rows = []
+        for row in rows:
+            if row["external_id"] in existing:
+                continue
+            existing.add(row["external_id"])
+            new_rows.append(row)
+        inserted = self.bulk_service.insert_emails(new_rows)
+        self.db.commit()
+        stats["imported"] += len(inserted)
+        stats["already_exists"] += len(rows) - len(inserted)
+        rows.clear()
+
+    def import_file(self, filename: str, stream: BinaryIO, user_id: UUID) -> Dict[str, Any]:
+        """Importe un fichier (.eml, mbox ou zip) ; retourne le bilan du fichier"""
+        stats: Dict[str, Any] = {
+            "filename": filename,
+            "format": None,
+            "messages": 0,
+            "imported": 0,
+            "already_exists": 0,
+            "errors": 0,
+        }
+        rows: List[Dict[str, Any]] = []
+        try:
+            stats["format"] = self.detect_format(filename, stream)
+            for msg in self.iter_messages(filename, stream):
+                stats["messages"] += 1
+                try:
+                    rows.append(self.message_to_row(msg, user_id))
+                except Exception as e:
+                    stats["errors"] += 1
+                    logger.warning(f"Skipping unreadable message #{stats['messages']} in {filename}: {e}")
+                if len(rows) >= self.batch_size:
+                    self._flush(rows, user_id, stats)
+            if rows:
+                self._flush(rows, user_id, stats)
+            stats["status"] = "imported"
+        except Exception as e:
+            # Les lots déjà validés restent en base ; un nouvel import les ignorera
+            self.db.rollback()
+            logger.error(f"Import of {filename} failed: {e}")
+            stats["status"] = "error"
+            stats["error"] = str(e)
+        return stats
+
+    def import_files(self, files: List[Any], user_id: UUID) -> List[Dict[str, Any]]:
+        """Importe des fichiers téléversés (UploadFile) les uns après les autres"""
+        return [self.import_file(file.filename, file.file, user_id) for file in files]
+
+    @staticmethod
+    async def schedule_nlp(imported_since: datetime, user_id: UUID) -> Optional[str]:
+        """
+        Lance en arrière-plan le traitement NLP des emails importés
+
+        Le job traite les emails non classifiés de `user_id` créés depuis
+        `imported_since` ; sa progression se suit via GET /nlp/batch-jobs/{job_id}.
+        """
+        return await NLPBatchRunner.schedule(imported_since, user_id)
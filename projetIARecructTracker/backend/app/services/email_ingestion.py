@@ -1,15 +1,22 @@
 import imaplib
 import email
 import email.header
-from typing import List, Dict, Any, Optional
+import email.utils
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timezone, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from app.models.models import Email
+from app.models.models import ImapSyncState
+from app.services.email_bulk_service import EmailBulkService
+from app.services.imap_structure import TextPart, decode_text_part, find_text_parts, parse_fetch_response, uid_set
 from app.core.config import settings
 from loguru import logger
 import uuid
 import re
 
+# En-têtes récupérés avec le BODYSTRUCTURE (le reste de l'en-tête n'est pas téléchargé)
+HEADER_FIELDS = "SUBJECT FROM TO CC BCC DATE MESSAGE-ID"
+
 
 class EmailIngestionService:
     """
@@ -26,6 +33,7 @@ class EmailIngestionService:
         self.imap_host = settings.IMAP_HOST
         self.imap_user = settings.IMAP_USER
         self.imap_password = settings.IMAP_PASSWORD
+        self.last_save_error: Optional[str] = None
         
     def connect_imap(self) -> Optional[imaplib.IMAP4_SSL]:
         """Se connecter au serveur IMAP"""
@@ -53,8 +61,8 @@ class EmailIngestionService:
             logger.warning(f"Failed to decode header: {e}")
             return header or ""
     
-    def extract_email_content(self, msg: email.message.Message) -> Dict[str, Any]:
-        """Extraire le contenu d'un email"""
+    def extract_headers(self, msg: email.message.Message) -> Dict[str, Any]:
+        """Extraire les en-têtes principaux d'un email"""
         content = {
             'subject': '',
             'sender': '',
@@ -92,6 +100,19 @@ class EmailIngestionService:
             bcc_header = self.decode_header(msg['Bcc'])
             content['bcc'] = [addr.strip() for addr in bcc_header.split(',')]
         
+        return content
+    
+    def make_snippet(self, content: Dict[str, Any]) -> None:
+        """Créer un snippet (résumé) à partir du corps texte"""
+        if content['body']:
+            # Nettoyer le texte et créer un résumé
+            clean_body = re.sub(r'\s+', ' ', content['body']).strip()
+            content['snippet'] = clean_body[:200] + ('...' if len(clean_body) > 200 else '')
+    
+    def extract_email_content(self, msg: email.message.Message) -> Dict[str, Any]:
+        """Extraire le contenu d'un email complet (RFC822)"""
+        content = self.extract_headers(msg)
+        
         # Corps du message
         if msg.is_multipart():
             for part in msg.walk():
@@ -126,12 +147,7 @@ class EmailIngestionService:
             except Exception as e:
                 logger.warning(f"Failed to decode simple message: {e}")
         
-        # Créer un snippet (résumé)
-        if content['body']:
-            # Nettoyer le texte et créer un résumé
-            clean_body = re.sub(r'\s+', ' ', content['body']).strip()
-            content['snippet'] = clean_body[:200] + ('...' if len(clean_body) > 200 else '')
-        
+        self.make_snippet(content)
         return content
     
     def is_recruitment_email(self, subject: str, body: str, sender: str) -> bool:
@@ -155,53 +171,148 @@ class EmailIngestionService:
         
         return False
     
-    def fetch_recent_emails(self, days_back: int = 30, folder: str = 'INBOX') -> List[Dict[str, Any]]:
-        """Récupérer les emails récents depuis IMAP"""
+    @property
+    def account(self) -> str:
+        return f"{self.imap_user}@{self.imap_host}"
+    
+    def _load_sync_state(self, folder: str) -> Optional[ImapSyncState]:
+        return self.db.get(ImapSyncState, (self.account, folder))
+    
+    def _save_sync_state(self, checkpoint: Dict[str, Any]) -> None:
+        """Mémoriser le dernier UID traité (après l'enregistrement des emails)"""
+        values = {"uid_validity": checkpoint["uid_validity"], "last_uid": checkpoint["last_uid"],
+                  "updated_at": datetime.now(timezone.utc)}
+        self.db.execute(
+            pg_insert(ImapSyncState)
+            .values(account=self.account, folder=checkpoint["folder"], **values)
+            .on_conflict_do_update(index_elements=["account", "folder"], set_=values)
+        )
+        self.db.commit()
+    
+    def _search_uids(self, mail: imaplib.IMAP4, criteria: str) -> List[int]:
+        typ, data = mail.uid('SEARCH', None, criteria)
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f"UID SEARCH {criteria} failed")
+        return sorted(int(uid) for uid in (data[0] or b'').split())
+    
+    def _fetch_messages(self, mail: imaplib.IMAP4, uids: List[int], uid_validity: int) -> List[Dict[str, Any]]:
+        """
+        Récupère un lot de messages en deux UID FETCH groupés
+
+        1. BODYSTRUCTURE et en-têtes utiles de tous les messages du lot
+        2. uniquement les parties text/plain et text/html (tronquées à
+           IMAP_MAX_BODY_BYTES), jamais les pièces jointes
+        """
+        typ, data = mail.uid('FETCH', uid_set(uids), f'(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])')
+        if typ != 'OK':
+            raise imaplib.IMAP4.error("UID FETCH BODYSTRUCTURE failed")
+        metadata = parse_fetch_response(data)
+        
+        # Messages regroupés par sections à télécharger (un FETCH par forme de message)
+        text_parts: Dict[int, Dict[str, TextPart]] = {}
+        groups: Dict[tuple, List[int]] = {}
+        for uid, fields in metadata.items():
+            parts = find_text_parts(fields.get('BODYSTRUCTURE') or [])
+            text_parts[uid] = parts
+            sections = tuple(sorted(part.section for part in parts.values()))
+            if sections:
+                groups.setdefault(sections, []).append(uid)
+        
+        bodies: Dict[int, Dict[str, Any]] = {}
+        max_bytes = settings.IMAP_MAX_BODY_BYTES
+        for sections, group_uids in groups.items():
+            items = " ".join(f"BODY.PEEK[{section}]<0.{max_bytes}>" for section in sections)
+            typ, data = mail.uid('FETCH', uid_set(group_uids), f'(UID {items})')
+            if typ != 'OK':
+                logger.warning(f"UID FETCH of text parts failed for {len(group_uids)} messages")
+                continue
+            bodies.update(parse_fetch_response(data))
+        
+        messages = []
+        for uid, fields in metadata.items():
+            header_bytes = next((value for key, value in fields.items() if key.startswith('BODY[HEADER')), b'')
+            # En-têtes 8 bits bruts (RFC 6532) : UTF-8, les mots encodés RFC 2047 restent décodés ensuite
+            header_msg = email.message_from_string((header_bytes or b'').decode('utf-8', errors='replace'))
+            content = self.extract_headers(header_msg)
+            
+            body_fields = bodies.get(uid, {})
+            for subtype, part in text_parts[uid].items():
+                raw = next((value for key, value in body_fields.items() if key.startswith(f'BODY[{part.section}]')), None)
+                if not raw:
+                    continue
+                text = decode_text_part(raw, part)
+                content['body' if subtype == 'plain' else 'html_body'] = text
+            self.make_snippet(content)
+            
+            content['message_id'] = header_msg.get('Message-ID') or f'imap-{uid_validity}-{uid}'
+            content['date'] = header_msg.get('Date', '')
+            content['uid'] = uid
+            messages.append(content)
+        return messages
+    
+    def fetch_new_emails(
+        self,
+        days_back: int = 30,
+        folder: str = 'INBOX',
+        incremental: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Récupérer les emails de recrutement depuis IMAP
+        
+        En mode incrémental, seuls les UID supérieurs au dernier UID mémorisé
+        sont demandés, tant que l'UIDVALIDITY du dossier n'a pas changé ;
+        sinon les messages des `days_back` derniers jours sont listés.
+        
+        Returns:
+            (emails de recrutement, point de reprise à enregistrer après sauvegarde)
+        """
         mail = self.connect_imap()
         if not mail:
-            return []
+            return [], None
         
         try:
-            # Sélectionner le dossier
-            mail.select(folder)
-            
-            # Calculer la date de début
-            since_date = (datetime.now() - timedelta(days=days_back)).strftime('%d-%b-%Y')
-            
-            # Rechercher les emails depuis cette date
-            search_criteria = f'SINCE {since_date}'
-            typ, msgnums = mail.search(None, search_criteria)
-            
+            # Lecture seule : les messages ne sont pas marqués comme lus
+            typ, _ = mail.select(folder, readonly=True)
             if typ != 'OK':
-                logger.error("Failed to search emails")
-                return []
+                logger.error(f"Failed to select folder {folder}")
+                return [], None
+            _, validity = mail.response('UIDVALIDITY')
+            uid_validity = int(validity[0]) if validity and validity[0] else 0
             
-            email_list = []
-            msgnums = msgnums[0].split()
+            state = self._load_sync_state(folder) if incremental else None
+            if state is not None and state.uid_validity == uid_validity:
+                # "n:*" renvoie toujours le dernier message, même si son UID est < n
+                uids = [uid for uid in self._search_uids(mail, f'UID {state.last_uid + 1}:*') if uid > state.last_uid]
+                # Les plus anciens d'abord : le reste sera repris au passage suivant
+                uids = uids[:settings.IMAP_MAX_EMAILS]
+            else:
+                if state is not None:
+                    logger.warning(f"UIDVALIDITY changed for {folder}, full resync over {days_back} days")
+                since_date = (datetime.now() - timedelta(days=days_back)).strftime('%d-%b-%Y')
+                # Limiter aux plus récents pour éviter la surcharge
+                uids = self._search_uids(mail, f'SINCE {since_date}')[-settings.IMAP_MAX_EMAILS:]
             
-            logger.info(f"Found {len(msgnums)} emails in the last {days_back} days")
+            logger.info(f"Found {len(uids)} emails to fetch in {folder}")
             
-            # Traiter les emails (limiter à 100 pour éviter la surcharge)
-            for num in msgnums[-100:]:  # Prendre les 100 plus récents
+            email_list = []
+            # Dernier UID récupéré sans trou : le point de reprise ne le dépasse pas
+            last_fetched_uid = None
+            batch_size = max(1, settings.IMAP_FETCH_BATCH_SIZE)
+            for start in range(0, len(uids), batch_size):
+                batch = uids[start:start + batch_size]
                 try:
-                    typ, msg_data = mail.fetch(num, '(RFC822)')
-                    if typ != 'OK':
-                        continue
-                    
-                    email_message = email.message_from_bytes(msg_data[0][1])
-                    
-                    # Extraire le contenu
-                    content = self.extract_email_content(email_message)
-                    
-                    # Ajouter des métadonnées
-                    content['message_id'] = email_message.get('Message-ID', f'imap-{num.decode()}')
-                    content['date'] = email_message.get('Date', '')
-                    
+                    messages = self._fetch_messages(mail, batch, uid_validity)
+                except Exception as e:
+                    # Les lots suivants seront repris au passage suivant avec celui-ci
+                    logger.warning(f"Failed to fetch UIDs {uid_set(batch)}, stopping at UID {batch[0]}: {e}")
+                    break
+                last_fetched_uid = batch[-1]
+                
+                for content in messages:
                     # Parser la date
                     try:
                         if content['date']:
-                            parsed_date = email.utils.parsedate_to_datetime(content['date'])
-                            content['sent_at'] = parsed_date
+                            content['sent_at'] = email.utils.parsedate_to_datetime(content['date'])
                         else:
                             content['sent_at'] = datetime.now(timezone.utc)
                     except Exception as e:
@@ -216,17 +327,19 @@ class EmailIngestionService:
                     ):
                         email_list.append(content)
                         logger.info(f"Found recruitment email: {content['subject']}")
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to process email {num}: {e}")
-                    continue
             
             logger.info(f"Extracted {len(email_list)} recruitment emails")
-            return email_list
+            # Échec dès le premier lot : le point de reprise actuel est conservé
+            checkpoint = None
+            if last_fetched_uid is not None:
+                checkpoint = {"folder": folder, "uid_validity": uid_validity, "last_uid": last_fetched_uid}
+            elif not uids and (state is None or state.uid_validity != uid_validity):
+                checkpoint = {"folder": folder, "uid_validity": uid_validity, "last_uid": 0}
+            return email_list, checkpoint
             
         except Exception as e:
             logger.error(f"Error fetching emails: {e}")
-            return []
+            return [], None
         finally:
             try:
                 mail.close()
@@ -234,49 +347,49 @@ class EmailIngestionService:
             except:
                 pass
     
-    def save_emails_to_db(self, emails: List[Dict[str, Any]]) -> int:
-        """Sauvegarder les emails en base de données"""
-        saved_count = 0
+    def fetch_recent_emails(self, days_back: int = 30, folder: str = 'INBOX') -> List[Dict[str, Any]]:
+        """Récupérer les emails récents depuis IMAP (sans point de reprise)"""
+        emails, _ = self.fetch_new_emails(days_back, folder, incremental=False)
+        return emails
+    
+    def save_emails_to_db(self, emails: List[Dict[str, Any]], user_id: Optional[uuid.UUID] = None) -> int:
+        """Sauvegarder les emails en base de données (déduplication et insertion groupées)"""
+        bulk_service = EmailBulkService(self.db)
+        existing_ids = bulk_service.find_existing_external_ids(
+            (email_data['message_id'] for email_data in emails), user_id=user_id
+        )
         
+        rows = []
+        seen_ids = set(existing_ids)
         for email_data in emails:
-            try:
-                # Vérifier si l'email existe déjà
-                existing = self.db.query(Email).filter(
-                    Email.external_id == email_data['message_id']
-                ).first()
-                
-                if existing:
-                    logger.debug(f"Email already exists: {email_data['subject']}")
-                    continue
-                
-                # Créer un nouvel email
-                new_email = Email(
-                    id=uuid.uuid4(),
-                    external_id=email_data['message_id'],
-                    subject=email_data['subject'],
-                    sender=email_data['sender'],
-                    recipients=email_data['recipients'] or [],
-                    cc=email_data['cc'] or [],
-                    bcc=email_data['bcc'] or [],
-                    sent_at=email_data['sent_at'],
-                    raw_body=email_data['body'],
-                    snippet=email_data['snippet'],
-                    created_at=datetime.now(timezone.utc)
-                )
-                
-                self.db.add(new_email)
-                saved_count += 1
-                logger.info(f"Saved email: {email_data['subject']}")
-                
-            except Exception as e:
-                logger.error(f"Failed to save email: {e}")
+            message_id = email_data['message_id']
+            if message_id in seen_ids:
+                logger.debug(f"Email already exists: {email_data['subject']}")
                 continue
+            seen_ids.add(message_id)
+            
+            rows.append({
+                'user_id': user_id,
+                'external_id': message_id,
+                'subject': email_data['subject'],
+                'sender': email_data['sender'],
+                'recipients': email_data['recipients'] or [],
+                'cc': email_data['cc'] or [],
+                'bcc': email_data['bcc'] or [],
+                'sent_at': email_data['sent_at'],
+                'raw_body': email_data['body'],
+                'snippet': email_data['snippet'],
+                'created_at': datetime.now(timezone.utc)
+            })
         
+        self.last_save_error = None
         try:
+            saved_count = len(bulk_service.insert_emails(rows))
             self.db.commit()
             logger.info(f"Successfully saved {saved_count} emails to database")
         except Exception as e:
-            logger.error(f"Failed to commit emails: {e}")
+            logger.error(f"Failed to save emails: {e}")
+            self.last_save_error = str(e)
             self.db.rollback()
             saved_count = 0
         
@@ -286,10 +399,12 @@ class EmailIngestionService:
         """Ingérer les emails depuis IMAP"""
         logger.info(f"Starting email ingestion for last {days_back} days")
         
-        # Récupérer les emails
-        emails = self.fetch_recent_emails(days_back)
+        # Récupérer les nouveaux emails (UID incrémental)
+        emails, checkpoint = self.fetch_new_emails(days_back, settings.IMAP_FOLDER)
         
         if not emails:
+            if checkpoint:
+                self._save_sync_state(checkpoint)
             return {
                 "success": True,
                 "message": "No new recruitment emails found",
@@ -297,8 +412,10 @@ class EmailIngestionService:
                 "emails_saved": 0
             }
         
-        # Sauvegarder en base
+        # Sauvegarder en base, puis avancer le point de reprise
         saved_count = self.save_emails_to_db(emails)
+        if checkpoint and self.last_save_error is None:
+            self._save_sync_state(checkpoint)
         
         return {
             "success": True,
@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from typing import List, Optional
 from uuid import UUID
 from app.models.models import Email, ApplicationEvent
@@ -6,36 +6,66 @@ from app.models.schemas import EmailCreate
 from app.nlp.extraction_service import EmailExtractionService
 from app.nlp.classification_service import EmailClassificationService
 from app.nlp.matching_service import EmailMatchingService
+from app.core.database import AsyncSessionLocal
+from app.core.pagination import apply_keyset, count_rows
+from app.services.email_import_service import EmailImportService
 from fastapi import UploadFile
 from loguru import logger
-import email
-from email.parser import Parser
 from datetime import datetime
 
+# Colonnes du schéma de réponse Email : listes et détail ne chargent rien d'autre
+EMAIL_RESPONSE_COLUMNS = (
+    Email.id, Email.application_id, Email.external_id, Email.subject, Email.sender,
+    Email.recipients, Email.cc, Email.bcc, Email.sent_at, Email.snippet,
+    Email.language, Email.classification, Email.created_at,
+)
+
 
 class EmailService:
     def __init__(self, db: Session):
         self.db = db
         self.extraction_service = EmailExtractionService()
         self.classification_service = EmailClassificationService()
-        self.matching_service = EmailMatchingService(db)
 
-    def get_emails(self, user_id: UUID, skip: int = 0, limit: int = 50, unlinked_only: bool = False) -> List[Email]:
-        """
-        Récupérer les emails de l'utilisateur avec option de filtrage
-        """
+    def _user_emails_query(self, user_id: UUID, unlinked_only: bool = False):
         query = self.db.query(Email).filter(Email.user_id == user_id)
         
         if unlinked_only:
             query = query.filter(Email.application_id.is_(None))
-        
-        return query.order_by(Email.created_at.desc()).offset(skip).limit(limit).all()
+        return query
+
+    def get_emails(
+        self,
+        user_id: UUID,
+        skip: int = 0,
+        limit: int = 50,
+        unlinked_only: bool = False,
+        cursor: Optional[str] = None
+    ) -> List[Email]:
+        """
+        Récupérer les emails de l'utilisateur avec option de filtrage
+
+        Tri par (created_at, id) décroissant ; avec `cursor`, pagination
+        keyset et `skip` ignoré. Seules les colonnes du schéma de réponse sont
+        chargées. Lève ValueError si le curseur est invalide.
+        """
+        query = apply_keyset(
+            self._user_emails_query(user_id, unlinked_only).options(load_only(*EMAIL_RESPONSE_COLUMNS)),
+            Email.created_at, Email.id, cursor
+        )
+        if not cursor and skip:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+
+    def count_emails(self, user_id: UUID, unlinked_only: bool = False, mode: str = "estimated") -> Optional[int]:
+        """Nombre d'emails de l'utilisateur (estimé, exact ou non calculé)"""
+        return count_rows(self.db, self._user_emails_query(user_id, unlinked_only), mode)
 
     def get_email(self, email_id: UUID, user_id: UUID) -> Email:
         """
         Récupérer un email spécifique appartenant à l'utilisateur
         """
-        return self.db.query(Email).filter(
+        return self.db.query(Email).options(load_only(*EMAIL_RESPONSE_COLUMNS)).filter(
             Email.id == email_id,
             Email.user_id == user_id
         ).first()
@@ -76,7 +106,10 @@ class EmailService:
             email.classification = classification.email_type.value
             
             # 3. Matching automatique avec candidatures existantes
-            matched_app_id = await self.matching_service.auto_link_email(email)
+            # (session async dédiée : les requêtes ne bloquent pas la boucle)
+            async with AsyncSessionLocal() as matching_db:
+                matched_app_id = await EmailMatchingService(matching_db).auto_link_email(email)
+                await matching_db.commit()  # Embeddings de candidatures calculés
             
             if matched_app_id and suggested_status:
                 # Mettre à jour le statut de la candidature si nécessaire
@@ -164,81 +197,10 @@ class EmailService:
         self.db.commit()
         return True
 
-    async def import_email_files(self, files: List[UploadFile], user_id: UUID) -> List[dict]:
+    def import_email_files(self, files: List[UploadFile], user_id: UUID) -> List[dict]:
         """
-        Importer des emails depuis des fichiers .eml pour un utilisateur spécifique
-        """
-        results = []
-        parser = Parser()
-        
-        for file in files:
-            try:
-                content = file.file.read().decode('utf-8')
-                msg = parser.parsestr(content)
-                
-                # Extraire les informations de l'email
-                email_data = EmailCreate(
-                    user_id=user_id,  # Associer à l'utilisateur
-                    external_id=msg.get('Message-ID'),
-                    subject=msg.get('Subject'),
-                    sender=msg.get('From'),
-                    recipients=[msg.get('To')] if msg.get('To') else [],
-                    cc=[msg.get('Cc')] if msg.get('Cc') else [],
-                    raw_headers=str(msg.items()),
-                    raw_body=self._extract_body(msg),
-                    snippet=self._extract_snippet(msg)
-                )
-                
-                # Vérifier si l'email n'existe pas déjà pour cet utilisateur
-                existing = self.db.query(Email).filter(
-                    Email.external_id == email_data.external_id,
-                    Email.user_id == user_id
-                ).first()
-                
-                if not existing:
-                    created_email = await self.create_email(email_data)
-                    results.append({
-                        "filename": file.filename,
-                        "status": "imported",
-                        "email_id": str(created_email.id)
-                    })
-                else:
-                    results.append({
-                        "filename": file.filename,
-                        "status": "already_exists",
-                        "email_id": str(existing.id)
-                    })
-                    
-            except Exception as e:
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "error": str(e)
-                })
-        
-        return results
+        Importer des emails depuis des fichiers .eml, .mbox ou .zip pour un utilisateur spécifique
 
-    def _extract_body(self, msg) -> str:
-        """
-        Extraire le corps de l'email
+        Insertion en masse sans traitement NLP (voir EmailImportService.schedule_nlp)
         """
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    return part.get_payload(decode=True).decode('utf-8', errors='ignore')
-        else:
-            return msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-        return ""
-
-    def _extract_snippet(self, msg) -> str:
-        """
-        Extraire un extrait de l'email (première ligne ou 200 premiers caractères)
-        """
-        body = self._extract_body(msg)
-        if body:
-            # Prendre les 200 premiers caractères ou la première ligne
-            snippet = body.strip()[:200]
-            if len(body) > 200:
-                snippet += "..."
-            return snippet
-        return ""
+        return EmailImportService(self.db).import_files(files, user_id)
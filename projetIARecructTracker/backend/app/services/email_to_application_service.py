@@ -1,11 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from sqlalchemy import func
 from typing import List, Optional
+from uuid import UUID
 from app.models.models import Email, Application
 from app.models.schemas import (
     ApplicationCreate, ApplicationStatus, EmailClassification, ApplicationUpdate
 )
 from app.services.application_service import ApplicationService
+from app.nlp.thread_context import linked_thread_message_query
 import re
 import logging
 import unicodedata
@@ -22,12 +24,18 @@ class EmailToApplicationService:
         self.db = db
         self.application_service = ApplicationService(db)
 
-    def process_classified_emails(self) -> dict:
+    def process_classified_emails(self, user_id: Optional[UUID] = None) -> dict:
         """
         Traite tous les emails classifiés qui n'ont pas encore de candidature associée
+
+        Args:
+            user_id: Limiter le traitement aux emails d'un utilisateur
         """
         # Récupérer les emails classifiés qui n'ont pas d'application_id
-        emails_to_process = self.db.query(Email).filter(
+        query = self.db.query(Email).options(undefer(Email.raw_body))
+        if user_id is not None:
+            query = query.filter(Email.user_id == user_id)
+        emails_to_process = query.filter(
             Email.application_id.is_(None),
             Email.classification.in_([
                 EmailClassification.ACK.value,
@@ -67,6 +75,15 @@ class EmailToApplicationService:
         """
         Crée une nouvelle candidature ou lie à une existante basé sur l'email
         """
+        # Fil de discussion déjà lié : même candidature, sans nouvelle extraction
+        if email.thread_id:
+            thread_row = self.db.execute(linked_thread_message_query(email)).first()
+            if thread_row is not None:
+                application = self.db.get(Application, thread_row.application_id)
+                if application:
+                    logger.info(f"Email {email.id} lié via son fil {email.thread_id} à la candidature {application.id}")
+                    return application
+        
         if not self._is_recruitment_email(email):
             logger.info(f"Email {email.id} ignoré: contenu non lié au recrutement.")
             return None
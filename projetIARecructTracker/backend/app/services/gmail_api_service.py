@@ -1,29 +1,231 @@
 """
 Service pour interagir avec l'API Gmail en utilisant OAuth 2.0
 """
+import asyncio
 import httpx
-from typing import List, Dict, Any, Optional
+import re
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
 import base64
 import email
 import json
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.models.models import User, Email
 from app.services.gmail_oauth_service import GmailOAuthService
+from app.services.email_bulk_service import EmailBulkService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Coût en unités de quota de chaque méthode de l'API Gmail
+# https://developers.google.com/gmail/api/reference/quota
+GMAIL_QUOTA_UNITS = {
+    "users.getProfile": 1,
+    "labels.list": 1,
+    "messages.list": 5,
+    "messages.get": 5,
+    "history.list": 2,
+}
+
+# Paramètres utilisés pour récupérer un message (scope gmail.metadata)
+MESSAGE_METADATA_PARAMS = {
+    "format": "metadata",
+    "metadataHeaders": ["From", "To", "Subject", "Date"],
+}
+
+# Messages exclus de la synchronisation (comme includeSpamTrash=False du listing)
+IGNORED_LABELS = {"SPAM", "TRASH"}
+
+# Codes HTTP pour lesquels Gmail recommande un nouvel essai avec backoff
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _parse_batch_response(content_type: str, body: str) -> Dict[int, Tuple[int, Any]]:
+    """
+    Parse la réponse multipart/mixed de l'endpoint batch Gmail
+
+    Returns:
+        Dictionnaire {index de la requête: (code HTTP, corps JSON décodé)}
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ValueError("Réponse batch Gmail sans boundary")
+
+    results: Dict[int, Tuple[int, Any]] = {}
+    for part in body.split(f"--{match.group(1)}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+
+        # Chaque partie: en-têtes MIME, ligne vide, réponse HTTP (statut, en-têtes, ligne vide, corps)
+        sections = re.split(r"\r?\n\r?\n", part, maxsplit=2)
+        if len(sections) < 2:
+            continue
+        content_id = re.search(r"Content-ID:\s*<response-item-(\d+)>", sections[0], re.IGNORECASE)
+        status_line = re.match(r"HTTP/[\d.]+\s+(\d{3})", sections[1])
+        if not content_id or not status_line:
+            continue
+
+        payload: Any = None
+        if len(sections) == 3 and sections[2].strip():
+            try:
+                payload = json.loads(sections[2])
+            except ValueError:
+                payload = None
+        results[int(content_id.group(1))] = (int(status_line.group(1)), payload)
+    return results
+
+
+class GmailHistoryExpiredError(Exception):
+    """L'historyId mémorisé n'est plus disponible côté Gmail (HTTP 404)"""
+
+    def __init__(self, history_id: str):
+        super().__init__(f"historyId {history_id} expiré")
+        self.history_id = history_id
+
+
+class GmailMessageNotFoundError(Exception):
+    """Le message n'existe plus côté Gmail (HTTP 404, supprimé depuis son listing)"""
+
+    def __init__(self, message_id: str):
+        super().__init__(f"Message Gmail {message_id} introuvable")
+        self.message_id = message_id
+
+
+class GmailQuotaLimiter:
+    """
+    Seau à jetons limitant la consommation d'unités de quota Gmail par seconde
+    """
+
+    def __init__(self, units_per_second: int):
+        self.rate = float(units_per_second)
+        self.capacity = float(units_per_second)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.consumed_units = 0
+
+    async def acquire(self, units: int) -> None:
+        """Attend que `units` unités soient disponibles puis les consomme"""
+        needed = min(float(units), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= needed:
+                    self._tokens -= needed
+                    self.consumed_units += units
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
 
 class GmailAPIService:
     """
     Service pour interagir avec l'API Gmail
+
+    Un seul client HTTP (pool de connexions keep-alive) est partagé par tous
+    les appels du service : l'utiliser comme context manager asynchrone
+    (`async with GmailAPIService(db) as service`) ou appeler `aclose()`.
     """
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        max_concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
         self.db = db
         self.oauth_service = GmailOAuthService(db)
-        self.base_url = "https://gmail.googleapis.com/gmail/v1"
+        api_root = settings.GMAIL_API_BASE_URL.rstrip("/")
+        self.base_url = f"{api_root}/gmail/v1"
+        self.batch_url = f"{api_root}/batch/gmail/v1"
+        self.max_concurrency = max_concurrency or settings.GMAIL_SYNC_CONCURRENCY
+        # Gmail limite un batch à 100 requêtes et recommande de ne pas dépasser 50
+        self.batch_size = max(1, min(batch_size or settings.GMAIL_BATCH_SIZE, 100))
+        self.max_retries = settings.GMAIL_MAX_RETRIES
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._quota_limiters: Dict[Any, GmailQuotaLimiter] = {}
+
+    async def __aenter__(self) -> "GmailAPIService":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Ferme le client HTTP partagé"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Retourne le client HTTP du service, créé au premier appel"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency * 2,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    def _get_quota_limiter(self, user: User) -> GmailQuotaLimiter:
+        """Un limiteur de quota par utilisateur (le quota Gmail est par utilisateur)"""
+        limiter = self._quota_limiters.get(user.id)
+        if limiter is None:
+            limiter = GmailQuotaLimiter(settings.GMAIL_QUOTA_UNITS_PER_SECOND)
+            self._quota_limiters[user.id] = limiter
+        return limiter
+
+    def get_quota_usage(self, user: User) -> int:
+        """Unités de quota consommées par ce service pour l'utilisateur"""
+        limiter = self._quota_limiters.get(user.id)
+        return limiter.consumed_units if limiter else 0
+
+    async def _request(
+        self,
+        user: User,
+        method: str,
+        url: str,
+        quota_units: int,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Envoie une requête à l'API Gmail en respectant le quota et en
+        réessayant avec backoff exponentiel sur les erreurs 429/5xx
+        """
+        # Token lu dans le cache du processus (et rafraîchi à l'approche de son expiration)
+        access_token = await self.oauth_service.get_access_token(user)
+        if not access_token:
+            raise Exception("Token Gmail non valide")
+        request_headers = {"Authorization": f"Bearer {access_token}"}
+        if headers:
+            request_headers.update(headers)
+
+        client = self._get_client()
+        limiter = self._get_quota_limiter(user)
+        attempt = 0
+        while True:
+            await limiter.acquire(quota_units)
+            response = await client.request(method, url, headers=request_headers, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                return response
+
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt * 0.5
+            logger.warning(f"Gmail API {response.status_code} sur {method} {url}, nouvel essai dans {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
         
     async def get_user_profile(self, user: User) -> Dict[str, Any]:
         """
@@ -32,19 +234,16 @@ class GmailAPIService:
         if not await self.oauth_service.ensure_valid_token(user):
             raise Exception("Token Gmail non valide")
             
-        headers = {"Authorization": f"Bearer {user.gmail_access_token}"}
+        response = await self._request(
+            user, "GET", f"{self.base_url}/users/me/profile",
+            quota_units=GMAIL_QUOTA_UNITS["users.getProfile"]
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/users/me/profile",
-                headers=headers
-            )
+        if response.status_code != 200:
+            logger.error(f"Erreur récupération profil Gmail: {response.status_code} - {response.text}")
+            raise Exception(f"Erreur API Gmail: {response.status_code}")
             
-            if response.status_code != 200:
-                logger.error(f"Erreur récupération profil Gmail: {response.status_code} - {response.text}")
-                raise Exception(f"Erreur API Gmail: {response.status_code}")
-                
-            return response.json()
+        return response.json()
 
     async def list_messages(
         self, 
@@ -65,8 +264,6 @@ class GmailAPIService:
         if not await self.oauth_service.ensure_valid_token(user):
             raise Exception("Token Gmail non valide")
             
-        headers = {"Authorization": f"Bearer {user.gmail_access_token}"}
-        
         params = {
             "maxResults": max_results,
             "includeSpamTrash": False
@@ -77,19 +274,18 @@ class GmailAPIService:
         if label_ids:
             params["labelIds"] = label_ids
             
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/users/me/messages",
-                headers=headers,
-                params=params
-            )
+        response = await self._request(
+            user, "GET", f"{self.base_url}/users/me/messages",
+            quota_units=GMAIL_QUOTA_UNITS["messages.list"],
+            params=params
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Erreur liste messages Gmail: {response.status_code} - {response.text}")
+            raise Exception(f"Erreur API Gmail: {response.status_code}")
             
-            if response.status_code != 200:
-                logger.error(f"Erreur liste messages Gmail: {response.status_code} - {response.text}")
-                raise Exception(f"Erreur API Gmail: {response.status_code}")
-                
-            data = response.json()
-            return data.get("messages", [])
+        data = response.json()
+        return data.get("messages", [])
 
     async def get_message_details(self, user: User, message_id: str) -> Dict[str, Any]:
         """
@@ -100,121 +296,393 @@ class GmailAPIService:
         if not await self.oauth_service.ensure_valid_token(user):
             raise Exception("Token Gmail non valide")
             
-        headers = {"Authorization": f"Bearer {user.gmail_access_token}"}
+        return await self._fetch_message(user, message_id)
+
+    async def _fetch_message(self, user: User, message_id: str) -> Dict[str, Any]:
+        """Appel unitaire messages.get (le token doit déjà être valide)"""
+        response = await self._request(
+            user, "GET", f"{self.base_url}/users/me/messages/{message_id}",
+            quota_units=GMAIL_QUOTA_UNITS["messages.get"],
+            params=MESSAGE_METADATA_PARAMS
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/users/me/messages/{message_id}",
-                headers=headers,
-                params={"format": "metadata", "metadataHeaders": ["From", "To", "Subject", "Date"]}
-            )
+        if response.status_code == 404:
+            raise GmailMessageNotFoundError(message_id)
+        if response.status_code != 200:
+            logger.error(f"Erreur récupération message Gmail: {response.status_code} - {response.text}")
+            raise Exception(f"Erreur API Gmail: {response.status_code}")
             
+        return response.json()
+
+    async def get_messages_details(self, user: User, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Récupère les détails de plusieurs messages en parallèle
+
+        Les messages sont regroupés en requêtes batch Gmail (`batch_size`
+        messages.get par requête HTTP), envoyées avec au plus
+        `max_concurrency` requêtes simultanées. Les messages en échec dans un
+        batch sont récupérés individuellement avec backoff.
+
+        Returns:
+            Dictionnaire {message_id: détails}; les messages introuvables
+            après les nouveaux essais sont absents du résultat.
+        """
+        details, _ = await self._get_messages_details(user, message_ids)
+        return details
+
+    async def _get_messages_details(
+        self, user: User, message_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Voir `get_messages_details`
+
+        Returns:
+            (détails des messages récupérés, IDs des messages supprimés côté Gmail)
+        """
+        if not message_ids:
+            return {}, []
+        if not await self.oauth_service.ensure_valid_token(user):
+            raise Exception("Token Gmail non valide")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chunks = [message_ids[i:i + self.batch_size] for i in range(0, len(message_ids), self.batch_size)]
+
+        async def fetch_chunk(chunk: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+            async with semaphore:
+                if len(chunk) == 1:
+                    return {}, chunk
+                try:
+                    return await self._batch_get_messages(user, chunk)
+                except Exception as e:
+                    logger.warning(f"Batch Gmail en échec ({len(chunk)} messages), repli unitaire: {str(e)}")
+                    return {}, chunk
+
+        details: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        not_found: List[str] = []
+        for chunk_details, chunk_failed in await asyncio.gather(*(fetch_chunk(c) for c in chunks)):
+            details.update(chunk_details)
+            failed.extend(chunk_failed)
+
+        async def fetch_single(message_id: str) -> None:
+            async with semaphore:
+                try:
+                    details[message_id] = await self._fetch_message(user, message_id)
+                except GmailMessageNotFoundError:
+                    logger.info(f"Message Gmail {message_id} supprimé depuis son listing")
+                    not_found.append(message_id)
+                except Exception as e:
+                    logger.error(f"Erreur récupération détails message {message_id}: {str(e)}")
+
+        if failed:
+            await asyncio.gather(*(fetch_single(message_id) for message_id in failed))
+
+        return details, not_found
+
+    async def _batch_get_messages(
+        self, user: User, message_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Envoie un lot de messages.get via l'endpoint batch HTTP de Gmail
+
+        Returns:
+            (détails des messages récupérés, IDs à réessayer individuellement)
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        query = urlencode(MESSAGE_METADATA_PARAMS, doseq=True)
+        parts = [
+            f"--{boundary}\r\n"
+            f"Content-Type: application/http\r\n"
+            f"Content-ID: <item-{index}>\r\n\r\n"
+            f"GET /gmail/v1/users/me/messages/{message_id}?{query}\r\n\r\n"
+            for index, message_id in enumerate(message_ids)
+        ]
+        body = "".join(parts) + f"--{boundary}--\r\n"
+
+        response = await self._request(
+            user, "POST", self.batch_url,
+            quota_units=GMAIL_QUOTA_UNITS["messages.get"] * len(message_ids),
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            content=body.encode("utf-8")
+        )
+        if response.status_code != 200:
+            raise Exception(f"Erreur API Gmail batch: {response.status_code}")
+
+        parsed = _parse_batch_response(response.headers.get("Content-Type", ""), response.text)
+        details: Dict[str, Dict[str, Any]] = {}
+        failed: List[str] = []
+        for index, message_id in enumerate(message_ids):
+            status_code, payload = parsed.get(index, (None, None))
+            if status_code == 200 and isinstance(payload, dict):
+                details[message_id] = payload
+            else:
+                failed.append(message_id)
+        return details, failed
+
+    async def list_history(
+        self,
+        user: User,
+        start_history_id: str
+    ) -> Tuple[List[str], Dict[str, List[str]], Optional[str]]:
+        """
+        Liste les changements de la boîte depuis `start_history_id` (users.history.list)
+
+        Returns:
+            (IDs des messages ajoutés dans l'ordre, labels à jour des messages
+            modifiés {message_id: labels}, nouvel historyId)
+
+        Raises:
+            GmailHistoryExpiredError: si l'historyId est trop ancien (HTTP 404)
+        """
+        if not await self.oauth_service.ensure_valid_token(user):
+            raise Exception("Token Gmail non valide")
+
+        added_ids: List[str] = []
+        label_updates: Dict[str, List[str]] = {}
+        latest_history_id: Optional[str] = None
+        params: Dict[str, Any] = {
+            "startHistoryId": start_history_id,
+            "historyTypes": ["messageAdded", "labelAdded", "labelRemoved"],
+            "maxResults": 500
+        }
+
+        while True:
+            response = await self._request(
+                user, "GET", f"{self.base_url}/users/me/history",
+                quota_units=GMAIL_QUOTA_UNITS["history.list"],
+                params=params
+            )
+            if response.status_code == 404:
+                raise GmailHistoryExpiredError(start_history_id)
             if response.status_code != 200:
-                logger.error(f"Erreur récupération message Gmail: {response.status_code} - {response.text}")
+                logger.error(f"Erreur historique Gmail: {response.status_code} - {response.text}")
                 raise Exception(f"Erreur API Gmail: {response.status_code}")
+
+            data = response.json()
+            latest_history_id = data.get("historyId", latest_history_id)
+            for record in data.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    message = added.get("message", {})
+                    if IGNORED_LABELS.intersection(message.get("labelIds", [])):
+                        continue
+                    if message.get("id") and message["id"] not in added_ids:
+                        added_ids.append(message["id"])
+                for changed in record.get("labelsAdded", []) + record.get("labelsRemoved", []):
+                    message = changed.get("message", {})
+                    if message.get("id"):
+                        label_updates[message["id"]] = message.get("labelIds", [])
+
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                break
+            params["pageToken"] = page_token
+
+        return added_ids, label_updates, latest_history_id
+
+    async def _run_db(self, func, *args):
+        """
+        Exécute une étape base de données de la synchronisation hors de la boucle asyncio
+        
+        La session synchrone de la requête n'est jamais utilisée par deux
+        threads à la fois : chaque étape est attendue avant la suivante.
+        """
+        return await asyncio.to_thread(func, *args)
+
+    def _apply_label_updates(self, user: User, label_updates: Dict[str, List[str]]) -> int:
+        """Met à jour les labels des emails déjà synchronisés"""
+        if not label_updates:
+            return 0
+        emails = self.db.query(Email).filter(
+            Email.user_id == user.id,
+            Email.gmail_message_id.in_(list(label_updates.keys()))
+        ).all()
+        for email_obj in emails:
+            email_obj.gmail_labels = ",".join(label_updates[email_obj.gmail_message_id])
+        return len(emails)
+
+    async def fetch_new_emails(
+        self,
+        user: User,
+        max_emails: int = 100,
+        days_back: int = 30,
+        full_sync: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Récupère et enregistre les nouveaux emails Gmail, sans traitement NLP
+
+        Si un historyId a été mémorisé lors d'une synchronisation précédente,
+        seuls les messages ajoutés depuis sont récupérés (users.history.list).
+        Le listing complet des N derniers messages ne sert qu'à la première
+        synchronisation, quand l'historique a expiré, ou si `full_sync` est demandé.
+        L'historyId n'avance que si tous les messages candidats ont été récupérés
+        et parsés (ou supprimés depuis côté Gmail) ; sinon la synchronisation suivante repart du même point (les
+        messages déjà enregistrés sont alors simplement ignorés).
+
+        Retourne les compteurs de la synchronisation et `inserted_ids`, les ids
+        des emails insérés (à passer au NLP puis à la liaison aux candidatures).
+        """
+        synced_count = 0
+        skipped_count = 0
+        error_count = 0
+        updated_count = 0
+        sync_mode = "incremental"
+        new_history_id = None
+        candidate_ids: List[str] = []
+        
+        if user.gmail_history_id and not full_sync:
+            try:
+                candidate_ids, label_updates, new_history_id = await self.list_history(
+                    user, user.gmail_history_id
+                )
+                updated_count = await self._run_db(self._apply_label_updates, user, label_updates)
+            except GmailHistoryExpiredError:
+                logger.warning(f"Historique Gmail expiré pour l'utilisateur {user.id}, synchronisation complète")
+                sync_mode = "full"
+        else:
+            sync_mode = "full"
+        
+        if sync_mode == "full":
+            # L'historyId est relevé avant le listing pour ne manquer aucun message
+            profile = await self.get_user_profile(user)
+            new_history_id = profile.get("historyId")
+            
+            # Note: Le scope gmail.metadata ne supporte pas le paramètre 'q' (query)
+            # On récupère simplement les N derniers emails sans filtre de date
+            # Le filtrage par date sera fait côté serveur après récupération
+            messages = await self.list_messages(user, max_emails, query=None)
+            candidate_ids = [message_info["id"] for message_info in messages]
+        
+        # Ne récupérer que les messages absents de la base (une requête IN par lot)
+        bulk_service = EmailBulkService(self.db)
+        existing_ids = await self._run_db(bulk_service.find_existing_gmail_ids, user.id, candidate_ids)
+        skipped_count += len(existing_ids)
+        message_ids = [message_id for message_id in candidate_ids if message_id not in existing_ids]
+        
+        # Récupération concurrente des détails (batch HTTP Gmail)
+        details_by_id, deleted_ids = await self._get_messages_details(user, message_ids)
+        # Messages supprimés entre le listing et leur récupération : rien à enregistrer
+        skipped_count += len(deleted_ids)
+        deleted = set(deleted_ids)
+        
+        # Calculer la date limite pour le filtrage côté serveur
+        date_limit = datetime.now() - timedelta(days=days_back)
+        rows = []
+        for message_id in message_ids:
+            try:
+                if message_id in deleted:
+                    continue
+                message_details = details_by_id.get(message_id)
+                if message_details is None:
+                    error_count += 1
+                    continue
                 
-            return response.json()
+                # Vérifier la date du message (filtrage côté serveur)
+                message_timestamp = int(message_details.get("internalDate", 0)) / 1000
+                message_date = datetime.fromtimestamp(message_timestamp)
+                
+                if message_date < date_limit:
+                    skipped_count += 1
+                    continue
+                
+                # Parser l'email (insertion groupée plus bas)
+                email_data = self._parse_gmail_message(message_details, user.id)
+                if email_data:
+                    rows.append(email_data)
+                else:
+                    error_count += 1
+                    
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement du message {message_id}: {str(e)}")
+                error_count += 1
+                continue
+        
+        # INSERT ... ON CONFLICT DO NOTHING : une synchronisation concurrente
+        # ayant déjà inséré un message ne provoque pas d'erreur
+        inserted_ids = await self._run_db(bulk_service.insert_emails, rows)
+        skipped_count += len(rows) - len(inserted_ids)
+        synced_count = len(inserted_ids)
+        
+        # Mémoriser le point de reprise pour la prochaine synchronisation, seulement si
+        # tous les messages ont été traités : un message en échec ne réapparaîtrait
+        # plus dans history.list après l'historyId suivant
+        if new_history_id and not error_count:
+            user.gmail_history_id = str(new_history_id)
+        elif new_history_id:
+            logger.warning(f"{error_count} message(s) Gmail en échec pour l'utilisateur {user.id}, "
+                           f"point de reprise conservé pour les récupérer à la prochaine synchronisation")
+        
+        # Nouveaux emails, point de reprise et labels validés ensemble
+        await self._run_db(self.db.commit)
+        
+        return {
+            "sync_mode": sync_mode,
+            "synced_emails": synced_count,
+            "skipped_emails": skipped_count,
+            "updated_emails": updated_count,
+            "errors": error_count,
+            "total_processed": len(candidate_ids),
+            "inserted_ids": inserted_ids
+        }
 
     async def sync_emails_from_gmail(
         self, 
         user: User, 
         max_emails: int = 100,
-        days_back: int = 30
+        days_back: int = 30,
+        full_sync: bool = False
     ) -> Dict[str, Any]:
         """
         Synchronise les emails depuis Gmail vers la base de données
+
+        Récupération (voir `fetch_new_emails`), analyse NLP des nouveaux
+        emails puis conversion des emails classifiés en candidatures, le tout
+        dans la requête. Au-delà de GMAIL_SYNC_INLINE_NLP_MAX_EMAILS nouveaux
+        emails (première synchronisation, `full_sync`), l'analyse NLP est
+        confiée à un job NLPBatchRunner dont l'id est renvoyé dans
+        `nlp_job_id`. Le planificateur d'ingestion (IngestionScheduler)
+        enchaîne les mêmes étapes en tâche de fond.
         
         Args:
             user: Utilisateur dont synchroniser les emails
-            max_emails: Nombre maximum d'emails à synchroniser
+            max_emails: Nombre maximum d'emails à synchroniser (listing complet)
             days_back: Nombre de jours dans le passé à synchroniser
+            full_sync: Ignorer l'historyId mémorisé et relister les messages
         """
         try:
-            # Note: Le scope gmail.metadata ne supporte pas le paramètre 'q' (query)
-            # On récupère simplement les N derniers emails sans filtre de date
-            # Le filtrage par date sera fait côté serveur après récupération
-            
-            # Récupérer la liste des messages (sans query)
-            messages = await self.list_messages(user, max_emails, query=None)
-            
-            synced_count = 0
-            skipped_count = 0
-            error_count = 0
-            
-            # Calculer la date limite pour le filtrage côté serveur
-            date_limit = datetime.now() - timedelta(days=days_back)
-            new_emails = []
-            for message_info in messages:
-                try:
-                    message_id = message_info["id"]
-                    
-                    # Vérifier si l'email existe déjà
-                    existing_email = self.db.query(Email).filter(
-                        Email.user_id == user.id,
-                        Email.gmail_message_id == message_id
-                    ).first()
-                    
-                    if existing_email:
-                        skipped_count += 1
-                        continue
-                    
-                    # Récupérer les détails du message
-                    message_details = await self.get_message_details(user, message_id)
-                    
-                    # Vérifier la date du message (filtrage côté serveur)
-                    message_timestamp = int(message_details.get("internalDate", 0)) / 1000
-                    message_date = datetime.fromtimestamp(message_timestamp)
-                    
-                    if message_date < date_limit:
-                        skipped_count += 1
-                        continue
-                    
-                    # Parser et sauvegarder l'email
-                    email_data = self._parse_gmail_message(message_details, user.id)
-                    if email_data:
-                        email_obj = Email(**email_data)
-                        self.db.add(email_obj)
-                        self.db.flush()  # Assurer un ID pour le traitement NLP
-                        new_emails.append(email_obj)
-                        synced_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"Erreur lors du traitement du message {message_info.get('id')}: {str(e)}")
-                    error_count += 1
-                    continue
+            user_id = user.id
+            synced_since = datetime.now(timezone.utc)
+            fetch_results = await self.fetch_new_emails(user, max_emails, days_back, full_sync=full_sync)
+            inserted_ids = fetch_results.pop("inserted_ids")
             
-            # Sauvegarder en lot
-            application_results = None
-            if synced_count > 0:
-                self.db.commit()
-                
+            nlp_results = None
+            nlp_job_id = None
+            if len(inserted_ids) > settings.GMAIL_SYNC_INLINE_NLP_MAX_EMAILS:
+                # Trop d'emails pour la durée d'une requête : traitement par lots en arrière-plan
+                from app.nlp.batch_jobs import NLPBatchRunner
+                nlp_job_id = await NLPBatchRunner.schedule(synced_since, user_id)
+            elif inserted_ids:
                 # Lancer automatiquement l'analyse NLP sur les nouveaux emails
+                # (workers concurrents, une session et un commit par lot chacun)
                 from app.nlp.nlp_orchestrator import NLPOrchestrator
-                orchestrator = NLPOrchestrator(self.db)
-                
-                for email_obj in new_emails:
-                    try:
-                        await orchestrator.process_email_complete(email_obj)
-                    except Exception as e:
-                        logger.error(f"Erreur NLP post-synchronisation pour l'email {email_obj.id}: {str(e)}")
-            else:
-                # Aucun nouvel email : s'assurer que la session ne garde pas de nouvelles instances
-                self.db.rollback()
+                try:
+                    nlp_results = await NLPOrchestrator.process_emails_concurrently(inserted_ids)
+                except Exception as e:
+                    logger.error(f"Erreur NLP post-synchronisation: {str(e)}")
             
-            # Toujours tenter la conversion des emails classifiés en candidatures
+            # Toujours tenter la conversion des emails classifiés de l'utilisateur en candidatures
             from app.services.email_to_application_service import EmailToApplicationService
             email_to_app = EmailToApplicationService(self.db)
-            application_results = email_to_app.process_classified_emails()
+            application_results = await self._run_db(email_to_app.process_classified_emails, user_id)
             
-            logger.info(f"Synchronisation Gmail terminée pour l'utilisateur {user.id}: "
-                       f"{synced_count} nouveaux, {skipped_count} ignorés, {error_count} erreurs")
+            logger.info(f"Synchronisation Gmail terminée pour l'utilisateur {user_id}: "
+                       f"{fetch_results['synced_emails']} nouveaux, {fetch_results['skipped_emails']} ignorés, "
+                       f"{fetch_results['errors']} erreurs (mode {fetch_results['sync_mode']})")
             
             return {
                 "success": True,
-                "synced_emails": synced_count,
-                "skipped_emails": skipped_count,
-                "errors": error_count,
-                "total_processed": len(messages),
+                **fetch_results,
+                "nlp": nlp_results,
+                "nlp_job_id": nlp_job_id,
                 "applications": application_results
             }
             
@@ -321,20 +789,17 @@ class GmailAPIService:
         if not await self.oauth_service.ensure_valid_token(user):
             raise Exception("Token Gmail non valide")
             
-        headers = {"Authorization": f"Bearer {user.gmail_access_token}"}
+        response = await self._request(
+            user, "GET", f"{self.base_url}/users/me/labels",
+            quota_units=GMAIL_QUOTA_UNITS["labels.list"]
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/users/me/labels",
-                headers=headers
-            )
+        if response.status_code != 200:
+            logger.error(f"Erreur récupération labels Gmail: {response.status_code} - {response.text}")
+            raise Exception(f"Erreur API Gmail: {response.status_code}")
             
-            if response.status_code != 200:
-                logger.error(f"Erreur récupération labels Gmail: {response.status_code} - {response.text}")
-                raise Exception(f"Erreur API Gmail: {response.status_code}")
-                
-            data = response.json()
-            return data.get("labels", [])
+        data = response.json()
+        return data.get("labels", [])
 
     async def search_job_related_emails(
         self, 
@@ -361,10 +826,14 @@ class GmailAPIService:
             # Date limite pour le filtrage
             date_limit = datetime.now() - timedelta(days=days_back)
             
+            details_by_id = await self.get_messages_details(user, [m["id"] for m in messages])
+            
             detailed_messages = []
             for message_info in messages:
                 try:
-                    details = await self.get_message_details(user, message_info["id"])
+                    details = details_by_id.get(message_info["id"])
+                    if details is None:
+                        continue
                     
                     # Filtrer par date
                     message_timestamp = int(details.get("internalDate", 0)) / 1000
@@ -11,6 +11,7 @@ import httpx
 from sqlalchemy.orm import Session
 from app.models.models import User
 from app.core.config import settings
+from app.services.gmail_token_cache import gmail_token_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -202,6 +203,7 @@ class GmailOAuthService:
                 user.gmail_scopes = " ".join(self.scopes)
                 
             self.db.commit()
+            gmail_token_cache.invalidate(user.id)
             
             logger.info(f"Gmail OAuth connecté avec succès pour l'utilisateur {user.id}, email: {user_email}")
             
@@ -303,6 +305,42 @@ class GmailOAuthService:
                 
             return response.json()
 
+    async def _request_token_refresh(self, refresh_token: str) -> Optional[Dict[str, any]]:
+        """
+        Appelle le endpoint token de Google avec un refresh token
+        
+        Returns:
+            Réponse JSON (access_token, expires_in...) ou None en cas d'échec
+        """
+        refresh_data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token"
+        }
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                self.token_url,
+                data=refresh_data,
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Erreur refresh token: {response.status_code} - {response.text}")
+                return None
+                
+            return response.json()
+
+    async def get_access_token(self, user: User, force_refresh: bool = False) -> Optional[str]:
+        """
+        Retourne un token d'accès valide pour l'utilisateur (cache mémoire du processus)
+        
+        Le token est rafraîchi si nécessaire, une seule fois pour tous les
+        appels concurrents ; voir GmailTokenCache.
+        """
+        return await gmail_token_cache.get(user, self._request_token_refresh, force_refresh=force_refresh)
+
     async def refresh_access_token(self, user: User) -> bool:
         """
         Rafraîchit le token d'accès d'un utilisateur
@@ -317,43 +355,7 @@ class GmailOAuthService:
             logger.warning(f"Pas de refresh token pour l'utilisateur {user.id}")
             return False
             
-        try:
-            refresh_data = {
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "refresh_token": user.gmail_refresh_token,
-                "grant_type": "refresh_token"
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.token_url,
-                    data=refresh_data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Erreur refresh token: {response.status_code} - {response.text}")
-                    return False
-                    
-                token_data = response.json()
-                
-                # Mettre à jour le token d'accès
-                user.gmail_access_token = token_data["access_token"]
-                user.gmail_token_expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data["expires_in"])
-                
-                # Nouveau refresh token s'il est fourni
-                if "refresh_token" in token_data:
-                    user.gmail_refresh_token = token_data["refresh_token"]
-                    
-                self.db.commit()
-                
-                logger.info(f"Token Gmail rafraîchi avec succès pour l'utilisateur {user.id}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Erreur lors du rafraîchissement du token: {str(e)}")
-            return False
+        return await self.get_access_token(user, force_refresh=True) is not None
 
     def is_token_valid(self, user: User) -> bool:
         """
@@ -374,14 +376,7 @@ class GmailOAuthService:
         Returns:
             bool: True si un token valide est disponible
         """
-        if self.is_token_valid(user):
-            return True
-            
-        if user.gmail_refresh_token:
-            return await self.refresh_access_token(user)
-            
-        logger.warning(f"Utilisateur {user.id} n'a pas de token valide et pas de refresh token")
-        return False
+        return await self.get_access_token(user) is not None
 
     def disconnect_gmail(self, user: User) -> bool:
         """
@@ -394,8 +389,10 @@ class GmailOAuthService:
             user.gmail_connected = False
             user.gmail_email = None
             user.gmail_scopes = None
+            user.gmail_history_id = None
             
             self.db.commit()
+            gmail_token_cache.invalidate(user.id)
             
             logger.info(f"Gmail déconnecté pour l'utilisateur {user.id}")
             return True
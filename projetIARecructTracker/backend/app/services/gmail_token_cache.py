@@ -0,0 +1,204 @@
+"""
+Cache en mémoire des tokens d'accès Gmail, par utilisateur
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+from sqlalchemy import inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import User
+
+logger = logging.getLogger(__name__)
+
+# Appel HTTP de rafraîchissement : refresh token -> réponse du endpoint token (None si échec)
+TokenRefresher = Callable[[str], Awaitable[Optional[Dict]]]
+
+# Délai avant un nouvel essai de rafraîchissement anticipé après un échec
+_RETRY_DELAY = timedelta(seconds=30)
+
+
+@dataclass
+class CachedToken:
+    access_token: Optional[str]
+    expires_at: Optional[datetime]
+    refresh_token: Optional[str]
+    retry_after: Optional[datetime] = None
+
+    def remaining(self, now: datetime) -> float:
+        """Secondes de validité restantes (négatif si expiré ou inconnu)"""
+        if not self.access_token or not self.expires_at:
+            return -1.0
+        return (self.expires_at - now).total_seconds()
+
+
+def _user_key(user: User) -> str:
+    """
+    Identifiant de l'utilisateur sans chargement
+
+    Après un commit de la session de synchronisation, l'objet User est
+    expiré : lire `user.id` relancerait un SELECT depuis la boucle asyncio.
+    """
+    identity = inspect(user).identity
+    return str(identity[0]) if identity else str(user.id)
+
+
+def _store_refreshed_token(user_id: str, old_refresh_token: str, token: CachedToken) -> bool:
+    """
+    Enregistre un token rafraîchi (UPDATE ciblé, session dédiée)
+
+    L'UPDATE n'a lieu que si le compte est toujours connecté avec le refresh
+    token utilisé : une déconnexion ou une reconnexion concurrente n'est pas
+    écrasée. Retourne False si aucune ligne n'a été modifiée.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(User).where(
+                User.id == user_id,
+                User.gmail_connected.is_(True),
+                User.gmail_refresh_token == old_refresh_token,
+            ).values(
+                gmail_access_token=token.access_token,
+                gmail_token_expires_at=token.expires_at,
+                gmail_refresh_token=token.refresh_token,
+            )
+        )
+        db.commit()
+        return result.rowcount > 0
+    finally:
+        db.close()
+
+
+class GmailTokenCache:
+    """
+    Tokens d'accès Gmail partagés par toutes les requêtes du processus
+
+    - Tant que le token est valide, il est servi depuis la mémoire (ni lecture
+      des colonnes de User, ni commit).
+    - Rafraîchissement anticipé : à moins de GMAIL_TOKEN_REFRESH_MARGIN_SECONDS
+      de l'expiration, le token courant reste servi et un rafraîchissement est
+      lancé en arrière-plan. Sous GMAIL_TOKEN_MIN_VALIDITY_SECONDS, l'appel
+      attend le nouveau token.
+    - Single-flight : un seul rafraîchissement par utilisateur à la fois, les
+      appels concurrents attendent le même résultat.
+    - Le nouveau token est enregistré par un UPDATE dans une session dédiée :
+      la session de l'appelant n'est pas validée.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, CachedToken] = {}
+        self._refreshes: Dict[str, Tuple[asyncio.AbstractEventLoop, "asyncio.Task[Optional[CachedToken]]"]] = {}
+        self._lock = threading.Lock()
+        self.refresh_count = 0
+
+    async def get(self, user: User, refresher: TokenRefresher, force_refresh: bool = False) -> Optional[str]:
+        """Token d'accès valide de l'utilisateur, None si aucun n'est disponible"""
+        key = _user_key(user)
+        entry = self._tokens.get(key)
+        if entry is None:
+            entry = CachedToken(user.gmail_access_token, user.gmail_token_expires_at, user.gmail_refresh_token)
+            if not entry.access_token and not entry.refresh_token:
+                return None
+            with self._lock:
+                entry = self._tokens.setdefault(key, entry)
+
+        now = datetime.now(timezone.utc)
+        remaining = entry.remaining(now)
+        if not force_refresh and remaining > settings.GMAIL_TOKEN_MIN_VALIDITY_SECONDS:
+            if (
+                remaining <= settings.GMAIL_TOKEN_REFRESH_MARGIN_SECONDS
+                and entry.refresh_token
+                and (entry.retry_after is None or now >= entry.retry_after)
+            ):
+                self._start_refresh(key, entry, refresher)
+            return entry.access_token
+
+        if not entry.refresh_token:
+            logger.warning(f"Utilisateur {key} n'a pas de token valide et pas de refresh token")
+            return None
+        # shield : l'annulation d'un appelant n'interrompt pas le rafraîchissement partagé
+        refreshed = await asyncio.shield(self._start_refresh(key, entry, refresher))
+        if refreshed is None:
+            return None
+        # L'objet de la session appelante reflète le nouveau token, sans écriture à valider
+        for attribute, value in (
+            ("gmail_access_token", refreshed.access_token),
+            ("gmail_token_expires_at", refreshed.expires_at),
+            ("gmail_refresh_token", refreshed.refresh_token),
+        ):
+            set_committed_value(user, attribute, value)
+        return refreshed.access_token
+
+    def _start_refresh(self, key: str, entry: CachedToken, refresher: TokenRefresher) -> "asyncio.Task[Optional[CachedToken]]":
+        """Rafraîchissement en cours pour l'utilisateur, ou nouveau si aucun"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            current = self._refreshes.get(key)
+            # Une tâche n'est attendable que depuis sa boucle (scripts, asyncio.run)
+            if current is not None and current[0] is loop and not current[1].done():
+                return current[1]
+            task = loop.create_task(self._refresh(key, entry, refresher))
+            self._refreshes[key] = (loop, task)
+            return task
+
+    async def _refresh(self, key: str, entry: CachedToken, refresher: TokenRefresher) -> Optional[CachedToken]:
+        try:
+            token_data = await refresher(entry.refresh_token)
+        except Exception as e:
+            logger.error(f"Erreur lors du rafraîchissement du token: {str(e)}")
+            token_data = None
+        finally:
+            with self._lock:
+                current = self._refreshes.get(key)
+                if current is not None and current[1] is asyncio.current_task():
+                    del self._refreshes[key]
+
+        if token_data is None:
+            entry.retry_after = datetime.now(timezone.utc) + _RETRY_DELAY
+            return None
+
+        refreshed = CachedToken(
+            access_token=token_data["access_token"],
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=token_data["expires_in"]),
+            # Nouveau refresh token s'il est fourni
+            refresh_token=token_data.get("refresh_token") or entry.refresh_token,
+        )
+        with self._lock:
+            if self._tokens.get(key) is not entry:
+                # Compte déconnecté ou reconnecté pendant le rafraîchissement : résultat ignoré
+                return None
+            self._tokens[key] = refreshed
+            self.refresh_count += 1
+        try:
+            stored = await asyncio.to_thread(_store_refreshed_token, key, entry.refresh_token, refreshed)
+        except Exception as e:
+            # Le token reste utilisable : seul l'enregistrement a échoué
+            logger.error(f"Impossible d'enregistrer le token Gmail rafraîchi de l'utilisateur {key}: {str(e)}")
+        else:
+            if not stored:
+                # Compte déconnecté ou reconnecté en base : le prochain appel relit User
+                with self._lock:
+                    if self._tokens.get(key) is refreshed:
+                        del self._tokens[key]
+                logger.warning(f"Token Gmail rafraîchi ignoré : le compte de l'utilisateur {key} a changé")
+                return None
+        logger.info(f"Token Gmail rafraîchi avec succès pour l'utilisateur {key}")
+        return refreshed
+
+    def invalidate(self, user_id=None) -> None:
+        """Oublie le token d'un utilisateur (connexion, déconnexion) ou de tous"""
+        with self._lock:
+            if user_id is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(str(user_id), None)
+
+
+gmail_token_cache = GmailTokenCache()
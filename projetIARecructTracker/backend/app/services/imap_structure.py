@@ -0,0 +1,214 @@
+"""
+Analyse des réponses IMAP FETCH (BODYSTRUCTURE, littéraux) et décodage des parties texte
+"""
+import base64
+import binascii
+import codecs
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Segment de réponse imaplib : texte brut, ou (texte se terminant par {n}, littéral)
+FetchData = List[Union[bytes, Tuple[bytes, bytes]]]
+
+# Les spécifications de section (BODY[HEADER.FIELDS (FROM TO)]<0>) forment un seul atome
+_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"\[]+(?:\[[^\]]*\][^\s()"]*)?))')
+_STREAM_CHUNK = 64 * 1024
+
+
+class Literal(bytes):
+    """Littéral IMAP ({n} suivi de n octets), distingué des atomes"""
+
+
+def _tokens(data: FetchData) -> Iterator[Any]:
+    """Jetons d'une réponse FETCH : '(' , ')' , atomes/chaînes (bytes) et littéraux"""
+    for item in data:
+        if isinstance(item, tuple):
+            text, literal = item
+        else:
+            text, literal = item, None
+        # Le marqueur {n} du littéral est retiré : le littéral le remplace
+        text = re.sub(rb'\{\d+\}$', b'', text or b'')
+        position = 0
+        while position < len(text):
+            match = _TOKEN_RE.match(text, position)
+            if match is None or match.end() == position:
+                break
+            position = match.end()
+            if match.group(1):
+                yield "("
+            elif match.group(2):
+                yield ")"
+            elif match.group(3) is not None:
+                yield re.sub(rb'\\(.)', rb'\1', match.group(3))
+            else:
+                yield match.group(4)
+        if literal is not None:
+            yield Literal(literal)
+
+
+def _read_list(tokens: Iterator[Any]) -> List[Any]:
+    values: List[Any] = []
+    for token in tokens:
+        if token == ")":
+            return values
+        if token == "(":
+            values.append(_read_list(tokens))
+        elif token == b"NIL":
+            values.append(None)
+        else:
+            values.append(token)
+    return values
+
+
+def parse_fetch_response(data: FetchData) -> Dict[int, Dict[str, Any]]:
+    """
+    Réponse de `UID FETCH` -> {uid: {élément: valeur}}
+
+    Les clés sont les noms d'éléments en majuscules (UID, BODYSTRUCTURE,
+    BODY[1.2]<0>, BODY[HEADER.FIELDS (...)]...) ; les listes IMAP deviennent
+    des listes Python, NIL devient None. Les réponses non sollicitées sans
+    UID (FLAGS...) sont ignorées.
+    """
+    messages: Dict[int, Dict[str, Any]] = {}
+    tokens = _tokens(data)
+    for token in tokens:
+        # "<seq> (" ouvre la réponse d'un message
+        if token == "(":
+            items = _read_list(tokens)
+            fields: Dict[str, Any] = {}
+            for key, value in zip(items[::2], items[1::2]):
+                if isinstance(key, bytes):
+                    fields[key.decode("ascii", "replace").upper()] = value
+            uid = fields.get("UID")
+            if uid is not None:
+                messages[int(uid)] = fields
+    return messages
+
+
+@dataclass
+class TextPart:
+    """Partie texte d'un message, repérée dans son BODYSTRUCTURE"""
+    section: str  # numéro de partie IMAP (1, 1.2, ...)
+    subtype: str  # plain / html
+    charset: str
+    encoding: str
+    size: int
+
+
+def _param(params: Optional[List[Any]], name: bytes) -> Optional[str]:
+    if not params:
+        return None
+    for key, value in zip(params[::2], params[1::2]):
+        if isinstance(key, bytes) and key.lower() == name and value is not None:
+            return value.decode("ascii", "replace")
+    return None
+
+
+def find_text_parts(structure: List[Any], section: str = "") -> Dict[str, TextPart]:
+    """
+    Première partie text/plain et text/html qui ne soit pas une pièce jointe
+
+    Les pièces jointes (Content-Disposition: attachment) et les messages
+    encapsulés (message/rfc822) ne sont jamais retenus : ils ne sont pas téléchargés.
+    """
+    found: Dict[str, TextPart] = {}
+    if not structure:
+        return found
+
+    if isinstance(structure[0], list):
+        # Multipart : sous-parties puis sous-type
+        number = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            number += 1
+            child_section = f"{section}.{number}" if section else str(number)
+            for subtype, part in find_text_parts(child, child_section).items():
+                found.setdefault(subtype, part)
+        return found
+
+    body_type = (structure[0] or b"").lower()
+    subtype = (structure[1] or b"").lower()
+    if body_type != b"text" or subtype not in (b"plain", b"html"):
+        return found
+
+    # Champs de base : type, sous-type, paramètres, id, description, encodage, taille, lignes
+    # puis extensions : md5, disposition...
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and disposition and (disposition[0] or b"").lower() == b"attachment":
+        return found
+
+    found[subtype.decode()] = TextPart(
+        section=section or "1",
+        subtype=subtype.decode(),
+        charset=_param(structure[2], b"charset") or "utf-8",
+        encoding=(structure[5] or b"7bit").decode("ascii", "replace").lower(),
+        size=int(structure[6] or 0),
+    )
+    return found
+
+
+def uid_set(uids: Iterable[int]) -> str:
+    """Ensemble de UID IMAP compact (1:4,7,9:10)"""
+    ranges: List[str] = []
+    start = previous = None
+    for uid in sorted(set(uids)):
+        if start is None:
+            start = previous = uid
+        elif uid == previous + 1:
+            previous = uid
+        else:
+            ranges.append(f"{start}:{previous}" if start != previous else str(start))
+            start = previous = uid
+    if start is not None:
+        ranges.append(f"{start}:{previous}" if start != previous else str(start))
+    return ",".join(ranges)
+
+
+def _decoded_chunks(data: bytes, encoding: str) -> Iterator[bytes]:
+    """Décodage du transfert (base64, quoted-printable) par blocs"""
+    if encoding == "base64":
+        compact = re.sub(rb"\s+", b"", data)
+        # Un corps tronqué (fetch partiel) peut s'arrêter au milieu d'un quadruplet
+        compact = compact[:len(compact) - len(compact) % 4]
+        step = _STREAM_CHUNK - _STREAM_CHUNK % 4
+        for start in range(0, len(compact), step):
+            try:
+                yield base64.b64decode(compact[start:start + step])
+            except binascii.Error:
+                return
+    elif encoding == "quoted-printable":
+        # Découpage sur fin de ligne : une séquence =XX n'est jamais coupée
+        start = 0
+        while start < len(data):
+            end = data.find(b"\n", start + _STREAM_CHUNK)
+            end = len(data) if end == -1 else end + 1
+            yield binascii.a2b_qp(data[start:end])
+            start = end
+    else:
+        for start in range(0, len(data), _STREAM_CHUNK):
+            yield data[start:start + _STREAM_CHUNK]
+
+
+def decode_text_part(data: bytes, part: TextPart, max_chars: Optional[int] = None) -> str:
+    """
+    Décode une partie texte par blocs (encodage de transfert puis charset)
+
+    Le décodage s'arrête dès que `max_chars` caractères ont été produits :
+    un corps volumineux n'est jamais décodé en entier.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(part.charset)(errors="ignore")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pieces: List[str] = []
+    length = 0
+    for chunk in _decoded_chunks(data, part.encoding):
+        text = decoder.decode(chunk)
+        pieces.append(text)
+        length += len(text)
+        if max_chars is not None and length >= max_chars:
+            return "".join(pieces)[:max_chars]
+    pieces.append(decoder.decode(b"", final=True))
+    return "".join(pieces)
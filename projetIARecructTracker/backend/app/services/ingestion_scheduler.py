@@ -0,0 +1,372 @@
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from uuid import UUID
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import or_, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.llm_cache import llm_cache
+from app.core.resilience import LatencyHistogram
+from app.models.models import User
+from app.services.stats_service import StatsService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionTask:
+    """Synchronisation d'un utilisateur, transmise d'une étape à la suivante"""
+    user_id: UUID
+    scheduled_at: float = field(default_factory=time.monotonic)
+    email_ids: List[UUID] = field(default_factory=list)
+    sync: Dict[str, Any] = field(default_factory=dict)
+    nlp: Optional[Dict[str, Any]] = None
+    applications: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class StageMetrics:
+    """Compteurs et latences d'une étape du pipeline"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self, queue: Optional[asyncio.Queue]) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queue_depth": queue.qsize() if queue else 0,
+            "queue_capacity": queue.maxsize if queue else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class IngestionScheduler:
+    """
+    Planificateur d'ingestion Gmail en tâche de fond
+
+    Toutes les INGESTION_POLL_SECONDS, les utilisateurs connectés dont la
+    prochaine synchronisation est échue sont réservés en base (bail
+    `ingestion_locked_until`, UPDATE ... FOR UPDATE SKIP LOCKED) : un
+    utilisateur n'est synchronisé que par un seul processus à la fois, même
+    avec plusieurs workers uvicorn. La prochaine échéance est tirée avec une
+    gigue de ±INGESTION_JITTER_RATIO pour étaler la charge.
+
+    Chaque synchronisation traverse trois files bornées : récupération Gmail,
+    NLP, liaison aux candidatures. Une étape saturée bloque la précédente
+    (backpressure) et le planificateur ne réserve pas plus d'utilisateurs que
+    la file de récupération ne peut en accepter.
+
+    La boucle du planificateur reporte aussi les deltas des compteurs
+    statistiques à chaque passage et purge le cache des réponses LLM (entrées
+    expirées) toutes les LLM_CACHE_PURGE_INTERVAL_MINUTES.
+    """
+
+    STAGES = ("fetch", "nlp", "link")
+
+    def __init__(self):
+        self.interval = timedelta(minutes=settings.INGESTION_INTERVAL_MINUTES)
+        self.lease = timedelta(seconds=settings.INGESTION_LEASE_SECONDS)
+        workers = {
+            "fetch": settings.INGESTION_FETCH_WORKERS,
+            "nlp": settings.INGESTION_NLP_WORKERS,
+            "link": settings.INGESTION_LINK_WORKERS,
+        }
+        self.metrics = {stage: StageMetrics(max(1, workers[stage])) for stage in self.STAGES}
+        self.stats = {"scheduled": 0, "completed": 0, "failed": 0, "last_tick_at": None}
+        self.recent: deque = deque(maxlen=20)
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active: Set[UUID] = set()
+        self._next_cache_purge = 0.0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    # --- Base de données (appelé via asyncio.to_thread) ---
+
+    def _next_run_at(self, now: datetime) -> datetime:
+        jitter = random.uniform(-settings.INGESTION_JITTER_RATIO, settings.INGESTION_JITTER_RATIO)
+        return now + self.interval * (1 + jitter)
+
+    def _claim_due_users(self, limit: int) -> List[UUID]:
+        """Réserve au plus `limit` utilisateurs dont la synchronisation est échue"""
+        now = datetime.now(timezone.utc)
+        due = (
+            select(User.id)
+            .where(
+                User.gmail_connected.is_(True),
+                User.gmail_refresh_token.isnot(None),
+                User.is_active.isnot(False),
+                or_(User.next_ingestion_at.is_(None), User.next_ingestion_at <= now),
+                or_(User.ingestion_locked_until.is_(None), User.ingestion_locked_until < now)
+            )
+            .order_by(User.next_ingestion_at.asc().nullsfirst())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        db = SessionLocal()
+        try:
+            user_ids = db.execute(
+                update(User)
+                .where(User.id.in_(due.scalar_subquery()))
+                .values(ingestion_locked_until=now + self.lease)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+            return list(user_ids)
+        finally:
+            db.close()
+
+    def _extend_lease(self, user_id: UUID) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(User).where(User.id == user_id)
+                .values(ingestion_locked_until=datetime.now(timezone.utc) + self.lease)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, user_id: UUID, completed: bool) -> None:
+        """Libère le bail ; une synchronisation terminée (même en échec) fixe la prochaine échéance"""
+        now = datetime.now(timezone.utc)
+        values: Dict[str, Any] = {"ingestion_locked_until": None}
+        if completed:
+            values.update(last_ingestion_at=now, next_ingestion_at=self._next_run_at(now))
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(User).where(User.id == user_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _fold_stats_counters(self) -> None:
+        db = SessionLocal()
+        try:
+            StatsService.fold_deltas(db)
+        finally:
+            db.close()
+
+    def request_sync(self, user_ids: Optional[List[UUID]] = None) -> int:
+        """
+        Rend la synchronisation immédiatement échue (tous les utilisateurs
+        connectés si `user_ids` est None) et réveille le planificateur
+        """
+        db = SessionLocal()
+        try:
+            query = update(User).where(User.gmail_connected.is_(True))
+            if user_ids is not None:
+                query = query.where(User.id.in_(user_ids))
+            count = db.execute(
+                query.values(next_ingestion_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if self.running:
+            # Appelable depuis un endpoint synchrone (thread du pool)
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return count
+
+    # --- Étapes du pipeline ---
+
+    async def _fetch(self, task: IngestionTask) -> None:
+        from app.services.gmail_api_service import GmailAPIService
+
+        db = SessionLocal()
+        try:
+            user = await asyncio.to_thread(db.get, User, task.user_id)
+            if user is None or not user.gmail_connected:
+                task.sync = {"skipped": "Gmail non connecté"}
+                return
+            async with GmailAPIService(db) as gmail_service:
+                result = await gmail_service.fetch_new_emails(
+                    user, settings.INGESTION_MAX_EMAILS, settings.INGESTION_DAYS_BACK
+                )
+            task.email_ids = result.pop("inserted_ids")
+            task.sync = result
+        finally:
+            db.close()
+
+    async def _nlp(self, task: IngestionTask) -> None:
+        if not task.email_ids:
+            return
+        from app.nlp.nlp_orchestrator import NLPOrchestrator
+
+        task.nlp = await NLPOrchestrator.process_emails_concurrently(task.email_ids)
+
+    def _link_sync(self, user_id: UUID) -> Dict[str, Any]:
+        from app.services.email_to_application_service import EmailToApplicationService
+
+        db = SessionLocal()
+        try:
+            return EmailToApplicationService(db).process_classified_emails(user_id=user_id)
+        finally:
+            db.close()
+
+    async def _link(self, task: IngestionTask) -> None:
+        task.applications = await asyncio.to_thread(self._link_sync, task.user_id)
+
+    def _handlers(self) -> Dict[str, Callable[[IngestionTask], Awaitable[None]]]:
+        return {"fetch": self._fetch, "nlp": self._nlp, "link": self._link}
+
+    async def _worker(self, stage: str) -> None:
+        queue = self._queues[stage]
+        handler = self._handlers()[stage]
+        next_index = self.STAGES.index(stage) + 1
+        next_stage = self.STAGES[next_index] if next_index < len(self.STAGES) else None
+        metrics = self.metrics[stage]
+
+        while True:
+            task = await queue.get()
+            started = time.perf_counter()
+            metrics.busy += 1
+            try:
+                if stage != "fetch":
+                    await asyncio.to_thread(self._extend_lease, task.user_id)
+                await handler(task)
+                metrics.processed += 1
+                metrics.latency.observe(time.perf_counter() - started, "success")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.failed += 1
+                metrics.latency.observe(time.perf_counter() - started, "error")
+                task.error = f"{stage}: {e}"
+                logger.error(f"Ingestion {stage} en échec pour l'utilisateur {task.user_id}: {e}")
+            finally:
+                metrics.busy -= 1
+                queue.task_done()
+
+            if task.error is None and next_stage is not None:
+                # Bloque si l'étape suivante est saturée
+                await self._queues[next_stage].put(task)
+            else:
+                await self._complete(task)
+
+    async def _complete(self, task: IngestionTask) -> None:
+        try:
+            await asyncio.to_thread(self._release, task.user_id, True)
+        except Exception as e:
+            # Le bail expirera de lui-même
+            logger.warning(f"Bail d'ingestion non libéré pour {task.user_id}: {e}")
+        self._active.discard(task.user_id)
+        self.stats["failed" if task.error else "completed"] += 1
+        summary = {
+            "user_id": str(task.user_id),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_seconds": round(time.monotonic() - task.scheduled_at, 3),
+            "synced_emails": task.sync.get("synced_emails", 0),
+            "nlp_processed": (task.nlp or {}).get("processed", 0),
+            "applications_processed": (task.applications or {}).get("processed", 0),
+            "error": task.error,
+        }
+        self.recent.appendleft(summary)
+        logger.info(f"Ingestion terminée pour l'utilisateur {task.user_id}: {summary}")
+
+    async def _purge_llm_cache(self) -> None:
+        """Supprime les réponses LLM expirées, au plus une fois par intervalle de purge"""
+        now = time.monotonic()
+        if now < self._next_cache_purge:
+            return
+        self._next_cache_purge = now + settings.LLM_CACHE_PURGE_INTERVAL_MINUTES * 60
+        deleted = await asyncio.to_thread(llm_cache.purge_expired)
+        if deleted:
+            logger.info(f"Cache LLM : {deleted} entrée(s) expirée(s) supprimée(s)")
+
+    async def _scheduler_loop(self) -> None:
+        fetch_queue = self._queues["fetch"]
+        while True:
+            try:
+                free_slots = fetch_queue.maxsize - fetch_queue.qsize()
+                if free_slots > 0:
+                    for user_id in await asyncio.to_thread(self._claim_due_users, free_slots):
+                        self._active.add(user_id)
+                        fetch_queue.put_nowait(IngestionTask(user_id))
+                        self.stats["scheduled"] += 1
+                self.stats["last_tick_at"] = datetime.now(timezone.utc).isoformat()
+                await asyncio.to_thread(self._fold_stats_counters)
+                await self._purge_llm_cache()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Planificateur d'ingestion: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INGESTION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    # --- Cycle de vie ---
+
+    def start(self) -> None:
+        """Démarre le planificateur et les workers (boucle asyncio courante)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._queues = {
+            stage: asyncio.Queue(maxsize=max(1, settings.INGESTION_QUEUE_SIZE)) for stage in self.STAGES
+        }
+        self._tasks = [asyncio.create_task(self._scheduler_loop())]
+        for stage in self.STAGES:
+            self._tasks += [
+                asyncio.create_task(self._worker(stage)) for _ in range(self.metrics[stage].workers)
+            ]
+        logger.info(f"Planificateur d'ingestion démarré (intervalle {self.interval}, "
+                    f"workers {[self.metrics[stage].workers for stage in self.STAGES]})")
+
+    async def stop(self) -> None:
+        """Arrête les workers et libère les baux en cours (repris au prochain passage)"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for user_id in list(self._active):
+            try:
+                await asyncio.to_thread(self._release, user_id, False)
+            except Exception as e:
+                logger.warning(f"Bail d'ingestion non libéré pour {user_id}: {e}")
+        self._active.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État du planificateur : files, workers, latences et dernières synchronisations"""
+        return {
+            "running": self.running,
+            "interval_minutes": settings.INGESTION_INTERVAL_MINUTES,
+            "active_users": len(self._active),
+            **self.stats,
+            "stages": {
+                stage: self.metrics[stage].snapshot(self._queues.get(stage)) for stage in self.STAGES
+            },
+            "recent": list(self.recent),
+        }
+
+
+# Instance du processus, démarrée au lancement de l'API
+ingestion_scheduler = IngestionScheduler()
@@ -1,6 +1,9 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from app.models.models import User
 from app.services.email_service import EmailService
 from app.services.application_service import ApplicationService
+from app.services.ingestion_scheduler import ingestion_scheduler
 from datetime import datetime
 
 
@@ -12,24 +15,17 @@ class IngestionService:
 
     def run_ingestion(self) -> dict:
         """
-        Exécuter le processus d'ingestion d'emails
-        Cette méthode sera étendue pour inclure les connecteurs IMAP/Gmail
+        Déclencher immédiatement l'ingestion de tous les comptes Gmail connectés
+
+        Les synchronisations sont exécutées par le planificateur d'ingestion
+        (récupération, classification, appariement avec les candidatures).
         """
         try:
-            # Pour l'instant, retourner un statut basique
-            # Dans une implémentation complète, ceci inclurait :
-            # - Connexion aux APIs d'email
-            # - Récupération des nouveaux emails
-            # - Classification automatique
-            # - Appariement avec les candidatures existantes
-            
+            scheduled = ingestion_scheduler.request_sync()
             return {
-                "status": "completed",
+                "status": "scheduled" if ingestion_scheduler.running else "scheduler_stopped",
                 "timestamp": datetime.utcnow().isoformat(),
-                "emails_processed": 0,
-                "new_emails": 0,
-                "linked_emails": 0,
-                "message": "Ingestion service ready - connecteurs email à implémenter"
+                "scheduled_accounts": scheduled
             }
         except Exception as e:
             return {
@@ -42,15 +38,14 @@ class IngestionService:
         """
         Récupérer le statut du service d'ingestion
         """
-        # Dans une implémentation complète, ceci inclurait :
-        # - Statut des dernières ingestions
-        # - Nombre d'emails en attente
-        # - Santé des connecteurs
+        connected_accounts = self.db.query(func.count(User.id)).filter(User.gmail_connected.is_(True)).scalar()
+        last_ingestion = self.db.query(func.max(User.last_ingestion_at)).scalar()
+        scheduler = ingestion_scheduler.snapshot()
         
         return {
-            "service_status": "ready",
-            "last_ingestion": None,
-            "pending_emails": 0,
-            "connected_accounts": 0,
-            "message": "Service d'ingestion prêt - configuration des connecteurs requise"
+            "service_status": "running" if scheduler["running"] else "stopped",
+            "last_ingestion": last_ingestion.isoformat() if last_ingestion else None,
+            "pending_emails": scheduler["stages"]["nlp"]["queue_depth"],
+            "connected_accounts": connected_accounts,
+            "scheduler": scheduler
         }
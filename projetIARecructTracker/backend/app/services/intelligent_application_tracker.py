@@ -1,18 +1,123 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, undefer
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from app.models.models import Email, Application
 from app.models.schemas import (
     ApplicationCreate, ApplicationUpdate, ApplicationStatus, EmailClassification,
-    UrgencyLevel, Priority
+    UrgencyLevel, Priority, EventType
 )
+from app.core.config import settings
 from app.services.application_service import ApplicationService
+from app.nlp.candidate_index import candidate_index_cache
+from app.nlp.pattern_engine import compile_patterns
 import re
 import logging
 from difflib import SequenceMatcher
 
 logger = logging.getLogger(__name__)
 
+# Rapprochement avec une candidature existante : poids du nom d'entreprise
+# face à l'intitulé de poste, et score minimal
+COMPANY_MATCH_WEIGHT = 0.7
+APPLICATION_MATCH_THRESHOLD = 0.6
+
+
+def application_match_score(
+    company_name: str,
+    job_title: Optional[str],
+    app_company: str,
+    app_job_title: Optional[str]
+) -> float:
+    """Similarité entre les informations extraites d'un email et une candidature existante"""
+    company_similarity = SequenceMatcher(None, company_name.lower(), app_company.lower()).ratio()
+    # Si on a aussi un titre de poste, l'inclure dans le calcul
+    if job_title and app_job_title:
+        job_similarity = SequenceMatcher(None, job_title.lower(), app_job_title.lower()).ratio()
+        return company_similarity * COMPANY_MATCH_WEIGHT + job_similarity * (1 - COMPANY_MATCH_WEIGHT)
+    return company_similarity
+
+# Motifs d'extraction, compilés une fois et appliqués au contenu en minuscules
+# (ordre significatif : le premier motif présent l'emporte)
+COMPANY_PATTERNS = compile_patterns([
+    r"équipe (\w+)",
+    r"société (\w+)",
+    r"entreprise (\w+)",
+    r"groupe (\w+)",
+    r"(\w+) recrute",
+    r"rejoindre (\w+)",
+    r"poste chez (\w+)",
+    r"candidature (\w+)",
+], flags=0)
+
+JOB_TITLE_PATTERNS = compile_patterns([
+    r"poste de ([^,\.\n]+)",
+    r"poste ([^,\.\n]+)",
+    r"développeur ([^,\.\n]+)",
+    r"ingénieur ([^,\.\n]+)",
+    r"chef de projet ([^,\.\n]+)",
+    r"manager ([^,\.\n]+)",
+    r"analyste ([^,\.\n]+)",
+    r"consultant ([^,\.\n]+)",
+    r"pour le poste ([^,\.\n]+)",
+    r"offre d'emploi ([^,\.\n]+)",
+    r"candidature ([^,\.\n]+)",
+], flags=0)
+
+SALARY_PATTERNS = compile_patterns([
+    r'(\d+\.?\d*k?)\s*€?\s*(?:par an|annuel|k€)',
+    r'salaire.*?(\d+\.?\d*k?)\s*€',
+    r'rémunération.*?(\d+\.?\d*k?)\s*€',
+    r'(\d+)\s*à\s*(\d+)\s*k€',
+], flags=0)
+
+JOB_REFERENCE_PATTERNS = compile_patterns([
+    r'ref[erence]*[:\s]*([A-Za-z0-9\-_]+)',
+    r'référence[:\s]*([A-Za-z0-9\-_]+)',
+    r'job[:\s]*([A-Za-z0-9\-_]+)',
+], flags=0)
+
+LOCATION_PATTERNS = compile_patterns([
+    r'localisation[:\s]*([^,\.\n]+)',
+    r'lieu[:\s]*([^,\.\n]+)',
+    r'basé[e]? à ([^,\.\n]+)',
+    r'situé[e]? à ([^,\.\n]+)',
+    r'télétravail',
+    r'remote',
+    r'paris|lyon|marseille|toulouse|nantes|strasbourg|bordeaux|lille',
+], flags=0)
+
+DATE_PATTERNS = [
+    re.compile(r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})'),
+    re.compile(r'(\d{1,2})\s+(janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s+(\d{4})'),
+]
+
+DEADLINE_PATTERNS = [
+    re.compile(r'avant le (\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})'),
+    re.compile(r'deadline.*?(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})'),
+    re.compile(r'réponse.*?(\d{1,2})\s+jours?'),
+]
+
+MONTHS = {
+    'janvier': 1, 'février': 2, 'mars': 3, 'avril': 4,
+    'mai': 5, 'juin': 6, 'juillet': 7, 'août': 8,
+    'septembre': 9, 'octobre': 10, 'novembre': 11, 'décembre': 12
+}
+
+TECH_KEYWORDS = [
+    'python', 'java', 'javascript', 'react', 'angular', 'vue', 'node.js',
+    'machine learning', 'ia', 'intelligence artificielle', 'data science',
+    'sql', 'postgresql', 'mongodb', 'aws', 'azure', 'docker', 'kubernetes',
+    'agile', 'scrum', 'devops', 'ci/cd', 'git'
+]
+
+URGENT_KEYWORDS = ['urgent', 'rapidement', 'dès que possible', 'immédiatement']
+HIGH_URGENCY_KEYWORDS = ['bientôt', 'prochainement', 'dans les plus brefs délais']
+
+PERSONAL_EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']
+
+_TITLE_CLEANUP_RE = re.compile(r'[^\w\s-]')
+_NAME_SEPARATOR_RE = re.compile(r'[.\-_]')
+
 
 class IntelligentApplicationTracker:
     """
@@ -27,13 +132,22 @@ class IntelligentApplicationTracker:
     def __init__(self, db: Session):
         self.db = db
         self.application_service = ApplicationService(db)
+        # Événements à insérer au prochain commit du lot
+        self._pending_events: List[Dict[str, Any]] = []
 
-    def process_email_batch(self, user_id: int, limit: int = 50) -> Dict[str, Any]:
+    def process_email_batch(self, user_id: int, limit: int = 50, commit_batch_size: Optional[int] = None) -> Dict[str, Any]:
         """
         Traite un lot d'emails pour détecter et mettre à jour les candidatures de l'utilisateur spécifié
+        
+        Les écritures sont validées par un commit tous les `commit_batch_size`
+        emails (TRACKER_COMMIT_BATCH_SIZE). Chaque email est traité dans un
+        SAVEPOINT : un échec n'annule que ses propres écritures. Les événements
+        de création de candidature sont insérés en une requête au commit.
         """
+        commit_batch_size = max(1, commit_batch_size or settings.TRACKER_COMMIT_BATCH_SIZE)
+        
         # Récupérer les emails non traités de l'utilisateur
-        emails = self.db.query(Email).filter(
+        emails = self.db.query(Email).options(undefer(Email.raw_body)).filter(
             Email.user_id == user_id,
             Email.application_id.is_(None),
             Email.classification.isnot(None)
@@ -48,9 +162,53 @@ class IntelligentApplicationTracker:
             "errors": []
         }
         
+        self._pending_events = []
+        chunk: List[Tuple[Any, str, Dict[str, Any]]] = []
         for email in emails:
+            email_id, subject = email.id, email.subject
+            events_mark = len(self._pending_events)
+            savepoint = self.db.begin_nested()
             try:
                 action_result = self._process_single_email(email)
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                del self._pending_events[events_mark:]
+                logger.error(f"Erreur lors du traitement de l'email {email_id}: {str(e)}")
+                results["errors"].append({
+                    "email_id": email_id,
+                    "subject": subject,
+                    "error": str(e)
+                })
+                continue
+                
+            chunk.append((email_id, subject, action_result))
+            if len(chunk) >= commit_batch_size:
+                self._commit_chunk(chunk, results)
+                
+        if chunk:
+            self._commit_chunk(chunk, results)
+                
+        return results
+
+    def _commit_chunk(self, chunk: List[Tuple[Any, str, Dict[str, Any]]], results: Dict[str, Any]) -> None:
+        """
+        Insère les événements en attente et valide les emails traités depuis le dernier commit
+        
+        Les compteurs ne sont mis à jour qu'une fois le commit réussi.
+        """
+        try:
+            self.application_service.insert_events(self._pending_events)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Échec de la validation d'un lot de {len(chunk)} emails: {str(e)}")
+            results["errors"].extend(
+                {"email_id": email_id, "subject": subject, "error": str(e)}
+                for email_id, subject, _ in chunk
+            )
+        else:
+            for _, _, action_result in chunk:
                 results["processed_emails"] += 1
                 
                 if action_result["action"] == "created":
@@ -61,20 +219,15 @@ class IntelligentApplicationTracker:
                     results["linked_emails"] += 1
                     
                 results["details"].append(action_result)
-                
-            except Exception as e:
-                logger.error(f"Erreur lors du traitement de l'email {email.id}: {str(e)}")
-                results["errors"].append({
-                    "email_id": email.id,
-                    "subject": email.subject,
-                    "error": str(e)
-                })
-                
-        return results
+        finally:
+            self._pending_events = []
+            chunk.clear()
 
     def _process_single_email(self, email: Email) -> Dict[str, Any]:
         """
         Traite un email individuel et détermine l'action à prendre
+        
+        Aucun commit : la transaction est gérée par process_email_batch.
         """
         # Extraire les informations clés de l'email
         extracted_info = self._extract_email_information(email)
@@ -86,7 +239,6 @@ class IntelligentApplicationTracker:
             # Mettre à jour la candidature existante si nécessaire
             updated = self._update_existing_application(matching_application, email, extracted_info)
             email.application_id = matching_application.id
-            self.db.commit()
             
             return {
                 "action": "updated" if updated else "linked",
@@ -101,7 +253,6 @@ class IntelligentApplicationTracker:
             # Créer une nouvelle candidature
             new_application = self._create_new_application(email, extracted_info)
             email.application_id = new_application.id
-            self.db.commit()
             
             return {
                 "action": "created",
@@ -116,94 +267,59 @@ class IntelligentApplicationTracker:
     def _extract_email_information(self, email: Email) -> Dict[str, Any]:
         """
         Extrait toutes les informations pertinentes d'un email pour les candidatures
+        
+        Le contenu est construit et mis en minuscules une seule fois, puis
+        partagé par tous les extracteurs (motifs précompilés au niveau du module).
         """
         content = f"{email.subject} {email.raw_body or email.snippet or ''}"
+        text = content.lower()
+        sender_domain = self._extract_domain(email.sender)
         
         info = {
             "email_type": email.classification,
-            "sender_domain": self._extract_domain(email.sender),
-            "company_name": self._extract_company_name(email),
-            "job_title": self._extract_job_title(email),
-            "detected_status": self._detect_application_status(email),
-            "salary_info": self._extract_salary_info(content),
-            "interview_date": self._extract_interview_date(content),
+            "sender_domain": sender_domain,
+            "company_name": self._extract_company_name(email, text, sender_domain),
+            "job_title": self._extract_job_title(email, text),
+            "detected_status": self._detect_application_status(email, text),
+            "salary_info": self._extract_salary_info(text),
+            "interview_date": self._extract_interview_date(text),
             "contact_person": self._extract_contact_person(email),
-            "urgency_level": self._assess_urgency(email),
-            "response_deadline": self._extract_deadline(content),
-            "job_reference": self._extract_job_reference(content),
-            "location": self._extract_location(content),
-            "keywords": self._extract_keywords(content)
+            "urgency_level": self._assess_urgency(text),
+            "response_deadline": self._extract_deadline(text),
+            "job_reference": self._extract_job_reference(text),
+            "location": self._extract_location(text),
+            "keywords": self._extract_keywords(text)
         }
         
         return info
 
-    def _extract_company_name(self, email: Email) -> str:
+    def _extract_company_name(self, email: Email, text: str, domain: Optional[str]) -> str:
         """
         Extrait le nom de l'entreprise avec plusieurs stratégies
         """
-        # 1. Depuis le domaine email
-        domain = self._extract_domain(email.sender)
-        if domain and domain not in ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']:
-            # Nettoyer le domaine pour obtenir le nom de l'entreprise
-            company_from_domain = domain.replace('.com', '').replace('.fr', '').replace('.org', '')
-            company_from_domain = company_from_domain.split('.')[0].title()
-            
-        # 2. Depuis le contenu de l'email
-        content = f"{email.subject} {email.raw_body or email.snippet or ''}"
+        # 1. Depuis le contenu de l'email
+        match = COMPANY_PATTERNS.first_match(text)
+        if match:
+            return match.group(1).title()
         
-        # Patterns courants pour détecter les noms d'entreprise
-        company_patterns = [
-            r"équipe (\w+)",
-            r"société (\w+)",
-            r"entreprise (\w+)",
-            r"groupe (\w+)",
-            r"(\w+) recrute",
-            r"rejoindre (\w+)",
-            r"poste chez (\w+)",
-            r"candidature (\w+)",
-        ]
-        
-        for pattern in company_patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(1).title()
-                
-        # 3. Si pas trouvé, utiliser le domaine nettoyé
-        if 'company_from_domain' in locals():
-            return company_from_domain
+        # 2. Si pas trouvé, utiliser le domaine email nettoyé
+        if domain and domain not in PERSONAL_EMAIL_DOMAINS:
+            company_from_domain = domain.replace('.com', '').replace('.fr', '').replace('.org', '')
+            return company_from_domain.split('.')[0].title()
             
-        # 4. Fallback sur l'expéditeur
+        # 3. Fallback sur l'expéditeur
         sender_name = email.sender.split('@')[0] if '@' in email.sender else email.sender
         return sender_name.title()
 
-    def _extract_job_title(self, email: Email) -> Optional[str]:
+    def _extract_job_title(self, email: Email, text: str) -> Optional[str]:
         """
         Extrait le titre du poste depuis l'email
         """
-        content = f"{email.subject} {email.raw_body or email.snippet or ''}"
-        
-        # Patterns pour détecter les titres de poste
-        job_patterns = [
-            r"poste de ([^,\.\n]+)",
-            r"poste ([^,\.\n]+)",
-            r"développeur ([^,\.\n]+)",
-            r"ingénieur ([^,\.\n]+)",
-            r"chef de projet ([^,\.\n]+)",
-            r"manager ([^,\.\n]+)",
-            r"analyste ([^,\.\n]+)",
-            r"consultant ([^,\.\n]+)",
-            r"pour le poste ([^,\.\n]+)",
-            r"offre d'emploi ([^,\.\n]+)",
-            r"candidature ([^,\.\n]+)",
-        ]
-        
-        for pattern in job_patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                job_title = match.group(1).strip()
-                # Nettoyer le titre
-                job_title = re.sub(r'[^\w\s-]', '', job_title)
-                return job_title.title()
+        match = JOB_TITLE_PATTERNS.first_match(text)
+        if match:
+            # Nettoyer le titre
+            job_title = _TITLE_CLEANUP_RE.sub('', match.group(1).strip())
+            return job_title.title()
                 
         # Si rien trouvé dans le contenu, utiliser des mots-clés du sujet
         subject_lower = email.subject.lower()
@@ -216,12 +332,10 @@ class IntelligentApplicationTracker:
             
         return "Poste non spécifié"
 
-    def _detect_application_status(self, email: Email) -> ApplicationStatus:
+    def _detect_application_status(self, email: Email, text: str) -> ApplicationStatus:
         """
         Détecte le statut de candidature basé sur le type d'email et le contenu
         """
-        content = f"{email.subject} {email.raw_body or email.snippet or ''}".lower()
-        
         # Mapping des classifications email vers les statuts d'application
         if email.classification == EmailClassification.ACK.value:
             return ApplicationStatus.ACKNOWLEDGED
@@ -233,69 +347,48 @@ class IntelligentApplicationTracker:
             return ApplicationStatus.OFFER
         elif email.classification == EmailClassification.REQUEST.value:
             # Pour les demandes, déterminer s'il s'agit d'une candidature sortante
-            if any(keyword in content for keyword in ['votre candidature', 'votre cv', 'candidature envoyée']):
+            if any(keyword in text for keyword in ['votre candidature', 'votre cv', 'candidature envoyée']):
                 return ApplicationStatus.APPLIED
             else:
                 return ApplicationStatus.SCREENING
         else:
             # Détection basée sur les mots-clés du contenu
-            if any(keyword in content for keyword in ['rejeté', 'refusé', 'pas retenu', 'n\'avons pas']):
+            if any(keyword in text for keyword in ['rejeté', 'refusé', 'pas retenu', 'n\'avons pas']):
                 return ApplicationStatus.REJECTED
-            elif any(keyword in content for keyword in ['entretien', 'interview', 'rencontre', 'rendez-vous']):
+            elif any(keyword in text for keyword in ['entretien', 'interview', 'rencontre', 'rendez-vous']):
                 return ApplicationStatus.INTERVIEW
-            elif any(keyword in content for keyword in ['offre', 'proposition', 'contrat']):
+            elif any(keyword in text for keyword in ['offre', 'proposition', 'contrat']):
                 return ApplicationStatus.OFFER
-            elif any(keyword in content for keyword in ['reçu', 'accusé', 'bien reçue']):
+            elif any(keyword in text for keyword in ['reçu', 'accusé', 'bien reçue']):
                 return ApplicationStatus.ACKNOWLEDGED
             else:
                 return ApplicationStatus.APPLIED
 
-    def _extract_salary_info(self, content: str) -> Optional[str]:
+    def _extract_salary_info(self, text: str) -> Optional[str]:
         """
-        Extrait les informations de salaire du contenu
+        Extrait les informations de salaire du contenu (en minuscules)
         """
-        salary_patterns = [
-            r'(\d+\.?\d*k?)\s*€?\s*(?:par an|annuel|k€)',
-            r'salaire.*?(\d+\.?\d*k?)\s*€',
-            r'rémunération.*?(\d+\.?\d*k?)\s*€',
-            r'(\d+)\s*à\s*(\d+)\s*k€',
-        ]
-        
-        for pattern in salary_patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(0)
-        return None
+        match = SALARY_PATTERNS.first_match(text)
+        return match.group(0) if match else None
 
-    def _extract_interview_date(self, content: str) -> Optional[datetime]:
+    def _extract_interview_date(self, text: str) -> Optional[datetime]:
         """
-        Extrait la date d'entretien du contenu
+        Extrait la date d'entretien du contenu (en minuscules)
         """
-        # Patterns pour détecter les dates
-        date_patterns = [
-            r'(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})',
-            r'(\d{1,2})\s+(janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s+(\d{4})',
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, content.lower())
+        # Un motif dont la date est invalide laisse sa chance au suivant
+        for pattern in DATE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 try:
-                    if len(match.groups()) == 3:
-                        if match.group(2).isdigit():
-                            # Format DD/MM/YYYY
-                            day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                            return datetime(year, month, day)
-                        else:
-                            # Format avec nom de mois
-                            months = {
-                                'janvier': 1, 'février': 2, 'mars': 3, 'avril': 4,
-                                'mai': 5, 'juin': 6, 'juillet': 7, 'août': 8,
-                                'septembre': 9, 'octobre': 10, 'novembre': 11, 'décembre': 12
-                            }
-                            day, month_name, year = int(match.group(1)), match.group(2), int(match.group(3))
-                            month = months.get(month_name, 1)
-                            return datetime(year, month, day)
+                    if match.group(2).isdigit():
+                        # Format DD/MM/YYYY
+                        day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+                        return datetime(year, month, day)
+                    else:
+                        # Format avec nom de mois
+                        day, month_name, year = int(match.group(1)), match.group(2), int(match.group(3))
+                        month = MONTHS.get(month_name, 1)
+                        return datetime(year, month, day)
                 except ValueError:
                     continue
         return None
@@ -308,42 +401,31 @@ class IntelligentApplicationTracker:
         if '@' in sender:
             name_part = sender.split('@')[0]
             # Nettoyer et formater le nom
-            name_parts = re.split(r'[.\-_]', name_part)
+            name_parts = _NAME_SEPARATOR_RE.split(name_part)
             if len(name_parts) >= 2:
                 return ' '.join(part.title() for part in name_parts[:2])
         return None
 
-    def _assess_urgency(self, email: Email) -> str:
+    def _assess_urgency(self, text: str) -> str:
         """
-        Évalue le niveau d'urgence basé sur le contenu
+        Évalue le niveau d'urgence basé sur le contenu (en minuscules)
         """
-        content = f"{email.subject} {email.raw_body or email.snippet or ''}".lower()
-        
-        urgent_keywords = ['urgent', 'rapidement', 'dès que possible', 'immédiatement']
-        high_keywords = ['bientôt', 'prochainement', 'dans les plus brefs délais']
-        
-        if any(keyword in content for keyword in urgent_keywords):
+        if any(keyword in text for keyword in URGENT_KEYWORDS):
             return "URGENT"
-        elif any(keyword in content for keyword in high_keywords):
+        elif any(keyword in text for keyword in HIGH_URGENCY_KEYWORDS):
             return "HIGH"
         else:
             return "NORMAL"
 
-    def _extract_deadline(self, content: str) -> Optional[datetime]:
+    def _extract_deadline(self, text: str) -> Optional[datetime]:
         """
-        Extrait la date limite de réponse
+        Extrait la date limite de réponse du contenu (en minuscules)
         """
-        deadline_patterns = [
-            r'avant le (\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})',
-            r'deadline.*?(\d{1,2})[\/\-](\d{1,2})[\/\-](\d{4})',
-            r'réponse.*?(\d{1,2})\s+jours?',
-        ]
-        
-        for pattern in deadline_patterns:
-            match = re.search(pattern, content.lower())
+        for pattern in DEADLINE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 try:
-                    if 'jours' in pattern:
+                    if 'jours' in pattern.pattern:
                         days = int(match.group(1))
                         return datetime.now() + timedelta(days=days)
                     else:
@@ -353,64 +435,29 @@ class IntelligentApplicationTracker:
                     continue
         return None
 
-    def _extract_job_reference(self, content: str) -> Optional[str]:
+    def _extract_job_reference(self, text: str) -> Optional[str]:
         """
-        Extrait la référence du poste
+        Extrait la référence du poste du contenu (en minuscules)
         """
-        ref_patterns = [
-            r'ref[erence]*[:\s]*([A-Za-z0-9\-_]+)',
-            r'référence[:\s]*([A-Za-z0-9\-_]+)',
-            r'job[:\s]*([A-Za-z0-9\-_]+)',
-        ]
-        
-        for pattern in ref_patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                return match.group(1).upper()
-        return None
+        match = JOB_REFERENCE_PATTERNS.first_match(text)
+        return match.group(1).upper() if match else None
 
-    def _extract_location(self, content: str) -> Optional[str]:
+    def _extract_location(self, text: str) -> Optional[str]:
         """
-        Extrait la localisation du poste
+        Extrait la localisation du poste du contenu (en minuscules)
         """
-        location_patterns = [
-            r'localisation[:\s]*([^,\.\n]+)',
-            r'lieu[:\s]*([^,\.\n]+)',
-            r'basé[e]? à ([^,\.\n]+)',
-            r'situé[e]? à ([^,\.\n]+)',
-            r'télétravail',
-            r'remote',
-            r'paris|lyon|marseille|toulouse|nantes|strasbourg|bordeaux|lille',
-        ]
-        
-        for pattern in location_patterns:
-            match = re.search(pattern, content.lower())
-            if match:
-                if match.group(0) in ['télétravail', 'remote']:
-                    return 'Télétravail'
-                else:
-                    return match.group(1).title() if hasattr(match, 'group') and len(match.groups()) > 0 else match.group(0).title()
-        return None
+        match = LOCATION_PATTERNS.first_match(text)
+        if not match:
+            return None
+        if match.group(0) in ['télétravail', 'remote']:
+            return 'Télétravail'
+        return match.group(1).title() if match.groups() else match.group(0).title()
 
-    def _extract_keywords(self, content: str) -> List[str]:
+    def _extract_keywords(self, text: str) -> List[str]:
         """
-        Extrait les mots-clés techniques pertinents
+        Extrait les mots-clés techniques pertinents du contenu (en minuscules)
         """
-        tech_keywords = [
-            'python', 'java', 'javascript', 'react', 'angular', 'vue', 'node.js',
-            'machine learning', 'ia', 'intelligence artificielle', 'data science',
-            'sql', 'postgresql', 'mongodb', 'aws', 'azure', 'docker', 'kubernetes',
-            'agile', 'scrum', 'devops', 'ci/cd', 'git'
-        ]
-        
-        found_keywords = []
-        content_lower = content.lower()
-        
-        for keyword in tech_keywords:
-            if keyword in content_lower:
-                found_keywords.append(keyword)
-                
-        return found_keywords
+        return [keyword for keyword in TECH_KEYWORDS if keyword in text]
 
     def _extract_domain(self, email_address: str) -> Optional[str]:
         """
@@ -430,9 +477,16 @@ class IntelligentApplicationTracker:
         if not company_name:
             return None
             
-        # Recherche par nom d'entreprise (similarité) pour l'utilisateur spécifique
+        # Recherche par nom d'entreprise (similarité) pour l'utilisateur spécifique,
+        # limitée aux candidatures dont le score majoré peut dépasser le seuil
+        candidate_ids = candidate_index_cache.get(self.db, user_id).company_candidates(
+            company_name, job_title, APPLICATION_MATCH_THRESHOLD, COMPANY_MATCH_WEIGHT
+        )
+        if not candidate_ids:
+            return None
         applications = self.db.query(Application).filter(
             Application.user_id == user_id,
+            Application.id.in_(candidate_ids),
             Application.company_name.isnot(None)
         ).all()
         
@@ -440,21 +494,8 @@ class IntelligentApplicationTracker:
         best_score = 0
         
         for app in applications:
-            # Calculer la similarité entre les noms d'entreprise
-            company_similarity = SequenceMatcher(None, 
-                company_name.lower(), 
-                app.company_name.lower()).ratio()
-            
-            # Si on a aussi un titre de poste, l'inclure dans le calcul
-            if job_title and app.job_title:
-                job_similarity = SequenceMatcher(None, 
-                    job_title.lower(), 
-                    app.job_title.lower()).ratio()
-                total_score = (company_similarity * 0.7) + (job_similarity * 0.3)
-            else:
-                total_score = company_similarity
-            
-            if total_score > best_score and total_score > 0.6:  # Seuil de similarité
+            total_score = application_match_score(company_name, job_title, app.company_name, app.job_title)
+            if total_score > best_score and total_score > APPLICATION_MATCH_THRESHOLD:
                 best_score = total_score
                 best_match = app
                 
@@ -510,9 +551,6 @@ class IntelligentApplicationTracker:
             else:
                 application.notes = salary_note
                 updated = True
-        
-        if updated:
-            self.db.commit()
             
         return updated
 
@@ -534,7 +572,22 @@ class IntelligentApplicationTracker:
             response_deadline=extracted_info.get("response_deadline")
         )
         
-        return self.application_service.create_application(application_data, user_id=email.user_id)
+        application = self.application_service.build_application(application_data, user_id=email.user_id)
+        self.db.add(application)
+        # Attribue l'identifiant : la candidature doit être visible des emails suivants du lot
+        self.db.flush()
+        
+        # Événement de création, inséré avec ceux du lot au prochain commit
+        self._pending_events.append(ApplicationService.event_values(
+            application.id,
+            EventType.STATUS_CHANGE,
+            {
+                "previous_status": None,
+                "new_status": application_data.status.value,
+                "action": "application_created"
+            }
+        ))
+        return application
 
     def _generate_application_notes(self, email: Email, extracted_info: Dict[str, Any]) -> str:
         """
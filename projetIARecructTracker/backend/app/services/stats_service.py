@@ -0,0 +1,80 @@
+from typing import Dict, Optional
+from uuid import UUID
+import logging
+
+from sqlalchemy import func, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import StatsCounter, StatsCounterDelta
+from app.models.stats_counters import fold_statement, rebuild_statements
+
+logger = logging.getLogger(__name__)
+
+Counters = Dict[str, Dict[str, int]]
+
+
+class StatsService:
+    """
+    Lecture des compteurs matérialisés (table stats_counters)
+
+    Les triggers ajoutent les variations de chaque écriture dans
+    stats_counter_deltas ; une lecture additionne les compteurs et les deltas
+    pas encore reportés (quelques lignes par utilisateur, quel que soit le
+    volume d'emails et de candidatures). `fold_deltas` reporte les deltas.
+    """
+
+    @staticmethod
+    def _counters_query(user_id: Optional[UUID] = None):
+        counters = select(StatsCounter.metric, StatsCounter.key, StatsCounter.value)
+        deltas = select(StatsCounterDelta.metric, StatsCounterDelta.key, StatsCounterDelta.delta)
+        if user_id is not None:
+            counters = counters.where(StatsCounter.user_id == user_id)
+            deltas = deltas.where(StatsCounterDelta.user_id == user_id)
+        # Sans utilisateur : tous utilisateurs confondus
+        rows = union_all(counters, deltas).subquery()
+        return select(
+            rows.c.metric, rows.c.key, func.sum(rows.c.value).label("value")
+        ).group_by(rows.c.metric, rows.c.key)
+
+    @staticmethod
+    def _to_counters(rows) -> Counters:
+        counters: Counters = {}
+        for metric, key, value in rows:
+            # Les compteurs retombés à zéro restent en table : ils sont omis
+            if value:
+                counters.setdefault(metric, {})[key] = int(value)
+        return counters
+
+    @classmethod
+    def get_counters(cls, db: Session, user_id: Optional[UUID] = None) -> Counters:
+        """Compteurs {metric: {key: value}} d'un utilisateur, ou de tous"""
+        return cls._to_counters(db.execute(cls._counters_query(user_id)).all())
+
+    @classmethod
+    async def aget_counters(cls, db: AsyncSession, user_id: Optional[UUID] = None) -> Counters:
+        """Compteurs {metric: {key: value}} d'un utilisateur, ou de tous (session asynchrone)"""
+        return cls._to_counters((await db.execute(cls._counters_query(user_id))).all())
+
+    @staticmethod
+    def fold_deltas(db: Session) -> int:
+        """Reporte les deltas en attente dans stats_counters ; retourne le nombre de compteurs modifiés"""
+        folded = db.execute(text(fold_statement())).rowcount
+        db.commit()
+        return folded
+
+    @staticmethod
+    async def afold_deltas(db: AsyncSession) -> int:
+        """Reporte les deltas en attente dans stats_counters (session asynchrone)"""
+        folded = (await db.execute(text(fold_statement()))).rowcount
+        await db.commit()
+        return folded
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """Recalcule tous les compteurs depuis emails et applications (réparation, import hors triggers)"""
+        connection = db.connection()
+        for statement in rebuild_statements():
+            connection.exec_driver_sql(statement)
+        db.commit()
+        logger.info("Stats counters rebuilt")
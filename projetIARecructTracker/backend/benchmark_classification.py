@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la classification par règles (emails/seconde)
+Compare l'ancienne boucle re.search motif par motif au moteur compilé
+de EmailClassificationService, et vérifie que les résultats sont identiques.
+
+Usage:
+    python benchmark_classification.py --emails 2000 --repeat 3
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import re
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+from app.nlp.classification_service import EmailClassificationService
+from create_test_emails import TEST_EMAILS
+
+# Emails hors recrutement pour équilibrer le corpus
+NOISE_EMAILS = [
+    {
+        "subject": "Vive les bons plans du mois d'octobre",
+        "body": "Profitez de -20% sur toute la boutique avec le code promo OCTOBRE. Livraison offerte dès 30€.",
+        "sender": "newsletter@zalando.com",
+    },
+    {
+        "subject": "Votre commande a été expédiée",
+        "body": "Bonjour, votre colis est en cours de livraison. Suivi de commande disponible dans votre espace client.",
+        "sender": "service@boutique.fr",
+    },
+    {
+        "subject": "Compte rendu de la réunion projet",
+        "body": "Salut, voici les notes de la réunion de mardi. On se retrouve jeudi pour finaliser la maquette.",
+        "sender": "collegue@entreprise.fr",
+    },
+]
+
+FILLER = (
+    "Nous restons à votre disposition pour toute question complémentaire concernant "
+    "notre entreprise, nos équipes et nos valeurs. "
+)
+
+
+def build_corpus(size: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Construit un corpus de `size` emails aux corps de longueurs variées"""
+    rng = random.Random(seed)
+    templates = TEST_EMAILS + NOISE_EMAILS
+    corpus = []
+    for _ in range(size):
+        template = rng.choice(templates)
+        corpus.append({
+            "subject": template["subject"],
+            "body": template["body"] + " " + FILLER * rng.randint(0, 20),
+            "sender": template["sender"],
+        })
+    return corpus
+
+
+def legacy_classify(service: EmailClassificationService, text: str):
+    """Ancienne implémentation : un re.search par motif et par email"""
+    for pattern in service.exclusion_patterns:
+        if re.search(pattern, text, re.IGNORECASE):
+            return "OTHER", []
+    if not any(re.search(p, text, re.IGNORECASE) for p in service.recruitment_indicators):
+        return "OTHER", []
+    all_matches = {}
+    for email_type, patterns in service.rules.items():
+        matches = [p for p in patterns if re.search(p, text, re.IGNORECASE)]
+        if matches:
+            all_matches[email_type] = matches
+    return all_matches
+
+
+def compiled_classify(service: EmailClassificationService, text: str):
+    """Moteur compilé du service"""
+    if service._is_excluded_email(text):
+        return "OTHER", []
+    if not service._has_recruitment_indicators(text):
+        return "OTHER", []
+    all_matches = {}
+    for email_type, matcher in service._rule_matchers.items():
+        matches = matcher.matching_patterns(text)
+        if matches:
+            all_matches[email_type] = matches
+    return all_matches
+
+
+def run(label: str, func, service, texts: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(service, text)
+        best = min(best, time.perf_counter() - start)
+    rate = len(texts) / best
+    print(f"  {label:<10} {rate:>10.0f} emails/s  ({best * 1000:.1f} ms pour {len(texts)} emails)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la classification par règles")
+    parser.add_argument("--emails", type=int, default=2000, help="Taille du corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (meilleur temps retenu)")
+    args = parser.parse_args()
+
+    # Les logs debug de la classification fausseraient la mesure
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    service = EmailClassificationService()
+    corpus = build_corpus(args.emails)
+    texts = [f"{e['sender']} {e['subject']} {e['body']}".lower() for e in corpus]
+
+    # Vérifier l'équivalence avant de mesurer
+    mismatches = sum(
+        1 for text in texts
+        if legacy_classify(service, text) != compiled_classify(service, text)
+    )
+    print(f"📊 Corpus: {len(texts)} emails, {mismatches} divergence(s) entre les deux moteurs")
+
+    before = run("avant", legacy_classify, service, texts, args.repeat)
+    after = run("après", compiled_classify, service, texts, args.repeat)
+    print(f"⚡ Accélération: x{after / before:.1f}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
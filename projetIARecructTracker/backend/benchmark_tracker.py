@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark du suivi intelligent des candidatures (emails/seconde)
+1. Extraction : compare l'ancienne extraction (un re.search non compilé par
+   motif et par extracteur, contenu remis en minuscules à chaque fois) à
+   l'extraction en une passe de IntelligentApplicationTracker, et vérifie que
+   les informations extraites sont identiques.
+2. Lot complet : process_email_batch sur des emails classifiés générés à
+   partir de create_test_emails.py, pour un utilisateur de benchmark
+   supprimé en fin de mesure ; un commit par email puis un commit tous les
+   --commit-batch-size emails (SAVEPOINT par email dans les deux cas).
+
+Usage:
+    python benchmark_tracker.py --emails 2000 --repeat 3 --batch 500 --commit-batch-size 50
+    python benchmark_tracker.py --skip-db
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from loguru import logger
+
+from app.services import intelligent_application_tracker as tracker_module
+from app.services.intelligent_application_tracker import IntelligentApplicationTracker
+from create_test_emails import TEST_EMAILS
+
+FILLER = (
+    "Nous restons à votre disposition pour toute question complémentaire concernant "
+    "notre entreprise, nos équipes et nos valeurs. "
+)
+
+# Variantes ajoutées aux corps pour exercer dates, salaires, références et lieux
+EXTRAS = [
+    "",
+    "Salaire : 45k€ par an. Poste basé à Lyon.",
+    "Entretien prévu le 12/03/2025, merci de confirmer avant le 10/03/2025.",
+    "Référence: DEV-2024-017. Télétravail partiel possible.",
+    "Rendez-vous le 5 juin 2025 dans nos locaux de Paris. Merci d'une réponse sous 7 jours.",
+    "Stack : python, react, docker, kubernetes et aws.",
+]
+
+
+def build_corpus(size: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Construit un corpus de `size` emails classifiés aux corps de longueurs variées"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        template = rng.choice(TEST_EMAILS)
+        corpus.append({
+            "subject": template["subject"],
+            "body": " ".join([template["body"], rng.choice(EXTRAS), FILLER * rng.randint(0, 20)]),
+            "sender": template["sender"],
+            "snippet": template["snippet"],
+            "classification": template["classification"],
+        })
+    return corpus
+
+
+def legacy_extract(tracker: IntelligentApplicationTracker, email) -> Dict[str, Any]:
+    """Ancienne implémentation : chaque extracteur reconstruit le contenu et parcourt ses motifs"""
+    def content():
+        return f"{email.subject} {email.raw_body or email.snippet or ''}"
+
+    def first(patterns, text):
+        for pattern in patterns:
+            match = re.search(pattern, text.lower())
+            if match:
+                return match
+        return None
+
+    def dates(patterns, text, days_marker=None):
+        for pattern in patterns:
+            match = re.search(pattern, text.lower())
+            if match:
+                try:
+                    if days_marker and days_marker in pattern:
+                        return datetime.now() + timedelta(days=int(match.group(1)))
+                    if match.group(2).isdigit():
+                        return datetime(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+                    return datetime(int(match.group(3)), tracker_module.MONTHS.get(match.group(2), 1), int(match.group(1)))
+                except ValueError:
+                    continue
+        return None
+
+    domain = tracker._extract_domain(email.sender)
+    match = first(tracker_module.COMPANY_PATTERNS.patterns, content())
+    if match:
+        company = match.group(1).title()
+    elif domain and domain not in tracker_module.PERSONAL_EMAIL_DOMAINS:
+        company = domain.replace('.com', '').replace('.fr', '').replace('.org', '').split('.')[0].title()
+    else:
+        company = (email.sender.split('@')[0] if '@' in email.sender else email.sender).title()
+
+    match = first(tracker_module.JOB_TITLE_PATTERNS.patterns, content())
+    job_title = re.sub(r'[^\w\s-]', '', match.group(1).strip()).title() if match else None
+
+    salary = first(tracker_module.SALARY_PATTERNS.patterns, content())
+    reference = first(tracker_module.JOB_REFERENCE_PATTERNS.patterns, content())
+    location = first(tracker_module.LOCATION_PATTERNS.patterns, content())
+    if location:
+        location = 'Télétravail' if location.group(0) in ['télétravail', 'remote'] else (
+            location.group(1).title() if location.groups() else location.group(0).title()
+        )
+    deadline = dates([p.pattern for p in tracker_module.DEADLINE_PATTERNS], content(), days_marker='jours')
+
+    return {
+        "company_name": company,
+        "job_title": job_title or tracker._extract_job_title(email, ""),
+        "detected_status": tracker._detect_application_status(email, content().lower()),
+        "salary_info": salary.group(0) if salary else None,
+        "interview_date": dates([p.pattern for p in tracker_module.DATE_PATTERNS], content()),
+        "urgency_level": tracker._assess_urgency(content().lower()),
+        "response_deadline": deadline.date() if deadline else None,
+        "job_reference": reference.group(1).upper() if reference else None,
+        "location": location,
+        "keywords": [k for k in tracker_module.TECH_KEYWORDS if k in content().lower()],
+    }
+
+
+def current_extract(tracker: IntelligentApplicationTracker, email) -> Dict[str, Any]:
+    """Extraction en une passe du tracker (champs comparés à l'ancienne implémentation)"""
+    info = tracker._extract_email_information(email)
+    if info["response_deadline"] is not None:
+        info["response_deadline"] = info["response_deadline"].date()
+    for key in ("email_type", "sender_domain", "contact_person"):
+        info.pop(key)
+    return info
+
+
+def run(label: str, func, tracker, emails: List[Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for email in emails:
+            func(tracker, email)
+        best = min(best, time.perf_counter() - start)
+    rate = len(emails) / best
+    print(f"  {label:<10} {rate:>10.0f} emails/s  ({best * 1000:.1f} ms pour {len(emails)} emails)")
+    return rate
+
+
+def benchmark_batch(corpus: List[Dict[str, str]], batch: int, commit_batch_size: int) -> float:
+    """process_email_batch de bout en bout sur un utilisateur de benchmark"""
+    from app.core.database import SessionLocal
+    from app.models.models import Email, User
+
+    db = SessionLocal()
+    user = User(email=f"benchmark-{uuid.uuid4().hex[:8]}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    try:
+        now = datetime.now(timezone.utc)
+        for index, item in enumerate(corpus[:batch]):
+            db.add(Email(
+                user_id=user.id,
+                external_id=f"<benchmark-{index}-{uuid.uuid4().hex}@example.com>",
+                subject=item["subject"],
+                sender=item["sender"],
+                raw_body=item["body"],
+                snippet=item["snippet"],
+                classification=item["classification"],
+                sent_at=now - timedelta(minutes=index),
+            ))
+        db.commit()
+
+        tracker = IntelligentApplicationTracker(db)
+        start = time.perf_counter()
+        results = tracker.process_email_batch(user.id, limit=batch, commit_batch_size=commit_batch_size)
+        elapsed = time.perf_counter() - start
+        rate = results['processed_emails'] / elapsed
+        print(f"  commit tous les {commit_batch_size:<3} emails: {rate:>6.0f} emails/s ({elapsed:.2f} s) - "
+              f"{results['created_applications']} créées, {results['updated_applications']} mises à jour, "
+              f"{results['linked_emails']} liées, {len(results['errors'])} erreur(s)")
+        return rate
+    finally:
+        db.rollback()
+        db.delete(db.get(User, user.id))
+        db.commit()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du suivi intelligent des candidatures")
+    parser.add_argument("--emails", type=int, default=2000, help="Taille du corpus d'extraction")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (meilleur temps retenu)")
+    parser.add_argument("--batch", type=int, default=500, help="Emails insérés pour process_email_batch")
+    parser.add_argument("--commit-batch-size", type=int, default=50, help="Emails par commit pour process_email_batch")
+    parser.add_argument("--skip-db", action="store_true", help="Extraction uniquement (sans base de données)")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    corpus = build_corpus(max(args.emails, args.batch))
+    emails = [
+        SimpleNamespace(subject=e["subject"], raw_body=e["body"], snippet=e["snippet"],
+                        sender=e["sender"], classification=e["classification"])
+        for e in corpus[:args.emails]
+    ]
+    tracker = IntelligentApplicationTracker(db=None)
+
+    # Vérifier l'équivalence avant de mesurer
+    mismatches = sum(
+        1 for email in emails
+        if legacy_extract(tracker, email) != current_extract(tracker, email)
+    )
+    print(f"📊 Corpus: {len(emails)} emails, {mismatches} divergence(s) entre les deux extractions")
+
+    before = run("avant", legacy_extract, tracker, emails, args.repeat)
+    after = run("après", lambda t, e: t._extract_email_information(e), tracker, emails, args.repeat)
+    print(f"⚡ Accélération: x{after / before:.1f}")
+
+    if not args.skip_db:
+        print(f"\n📦 process_email_batch ({args.batch} emails)")
+        per_email = benchmark_batch(corpus, args.batch, 1)
+        batched = benchmark_batch(corpus, args.batch, args.commit_batch_size)
+        print(f"⚡ Accélération: x{batched / per_email:.1f}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
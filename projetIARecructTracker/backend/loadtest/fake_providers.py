@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Fournisseurs externes simulés pour les tests de charge : Mistral, Gemini, Gmail
+
+Un seul serveur HTTP répond aux routes utilisées par le backend, avec une
+latence configurable (simule le temps de réponse d'un LLM) :
+- Mistral : POST /v1/chat/completions, POST /v1/embeddings (MISTRAL_SERVER_URL)
+- Gemini : POST /v1beta/models/{modèle}:generateContent (GEMINI_API_BASE_URL)
+- Gmail : profil, labels, messages.list/get, history.list et endpoint batch
+  (GMAIL_API_BASE_URL)
+
+Les réponses sont déterministes (mêmes entrées, mêmes sorties).
+
+Usage:
+    python loadtest/fake_providers.py --port 9100 --llm-latency-ms 300
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+# Latences simulées (secondes), modifiables par les options de la ligne de commande
+LATENCY = {"llm": 0.3, "gmail": 0.02}
+GMAIL_MESSAGES = 500
+
+# Mots-clés -> catégorie renvoyée par les classifications simulées
+CATEGORY_KEYWORDS = [
+    ("REJECTED", ("malheureusement", "pas retenu", "refus", "unfortunately")),
+    ("INTERVIEW", ("entretien", "interview", "rencontrer")),
+    ("OFFER", ("offre", "proposition", "offer")),
+    ("ACK", ("bien reçu", "accusé", "received")),
+    ("REQUEST", ("merci de", "pourriez-vous", "documents")),
+]
+
+SUBJECTS = [
+    ("Accusé de réception de votre candidature - Développeur Python", "rh@techcorp.com"),
+    ("Invitation à un entretien - Data Engineer", "recrutement@dataviz.com"),
+    ("Votre candidature chez StartupAI", "jobs@startup-ai.fr"),
+    ("Suite à votre candidature - Ingénieur DevOps", "talents@cloudnine.io"),
+    ("Newsletter - les offres de la semaine", "news@jobboard.com"),
+]
+
+app = FastAPI(title="Fournisseurs simulés (tests de charge)")
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:8], 16)
+
+
+def _llm_answer(prompt: str) -> str:
+    """Réponse JSON plausible : classification si le prompt liste des catégories, extraction sinon"""
+    categories = re.search(r"cat[ée]gories possibles\s*:\s*([^\n]+)", prompt, re.IGNORECASE)
+    if categories:
+        choices = [c.strip() for c in categories.group(1).split(",") if c.strip()]
+        text = prompt.lower()
+        category = next(
+            (name for name, words in CATEGORY_KEYWORDS if name in choices and any(w in text for w in words)),
+            "OTHER" if "OTHER" in choices else choices[0]
+        )
+        return json.dumps({
+            "category": category,
+            "confidence": 0.8 + (_digest(prompt) % 15) / 100,
+            "reasoning": "Réponse simulée (tests de charge)",
+        })
+    companies = ["TechCorp", "DataViz", "StartupAI", "CloudNine", "InnovTech"]
+    return json.dumps({
+        "company": companies[_digest(prompt) % len(companies)],
+        "job_title": "Développeur Python",
+        "location": "Paris",
+        "contact_person": None,
+        "contact_email": None,
+        "status": "ACK",
+    })
+
+
+# --- Mistral ---
+
+@app.post("/v1/chat/completions")
+async def mistral_chat(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(LATENCY["llm"])
+    prompt = "\n".join(message.get("content", "") for message in payload.get("messages", []))
+    return {
+        "id": f"cmpl-{_digest(prompt):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "mistral-small-latest"),
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 50, "total_tokens": len(prompt) // 4 + 50},
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": _llm_answer(prompt)},
+        }],
+    }
+
+
+@app.post("/v1/embeddings")
+async def mistral_embeddings(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(LATENCY["llm"] / 3)
+    inputs = payload.get("input") or []
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    data = []
+    for index, text in enumerate(inputs):
+        seed = _digest(text)
+        data.append({
+            "object": "embedding",
+            "index": index,
+            "embedding": [((seed >> (i % 24)) % 1000) / 1000.0 for i in range(1024)],
+        })
+    return {
+        "id": f"emb-{len(inputs)}",
+        "object": "list",
+        "model": payload.get("model", "mistral-embed"),
+        "data": data,
+        "usage": {"prompt_tokens": 10 * len(inputs), "completion_tokens": 0, "total_tokens": 10 * len(inputs)},
+    }
+
+
+# --- Gemini ---
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini_generate(model_action: str, request: Request):
+    payload = await request.json()
+    await asyncio.sleep(LATENCY["llm"])
+    prompt = "\n".join(
+        part.get("text", "")
+        for content in payload.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    return {"candidates": [{"content": {"parts": [{"text": _llm_answer(prompt)}], "role": "model"}}]}
+
+
+# --- Gmail ---
+
+def _gmail_message(message_id: str) -> Dict[str, Any]:
+    number = int(message_id.rsplit("-", 1)[-1]) if message_id.rsplit("-", 1)[-1].isdigit() else _digest(message_id)
+    subject, sender = SUBJECTS[number % len(SUBJECTS)]
+    sent_at = int(time.time()) - number * 600
+    return {
+        "id": message_id,
+        "threadId": f"thread-{number // 3}",
+        "labelIds": ["INBOX"],
+        "snippet": f"{subject} - message simulé n°{number}",
+        "historyId": str(1000 + number),
+        "internalDate": str(sent_at * 1000),
+        "sizeEstimate": 2048,
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": sender},
+                {"name": "To", "value": "candidat@example.com"},
+                {"name": "Subject", "value": subject},
+                {"name": "Date", "value": time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(sent_at))},
+            ],
+        },
+    }
+
+
+@app.get("/gmail/v1/users/me/profile")
+async def gmail_profile():
+    await asyncio.sleep(LATENCY["gmail"])
+    return {"emailAddress": "candidat@example.com", "messagesTotal": GMAIL_MESSAGES,
+            "threadsTotal": GMAIL_MESSAGES // 3, "historyId": str(1000 + GMAIL_MESSAGES)}
+
+
+@app.get("/gmail/v1/users/me/labels")
+async def gmail_labels():
+    await asyncio.sleep(LATENCY["gmail"])
+    return {"labels": [{"id": label, "name": label, "type": "system"} for label in ("INBOX", "SENT", "SPAM", "TRASH")]}
+
+
+@app.get("/gmail/v1/users/me/messages")
+async def gmail_list_messages(maxResults: int = 100, pageToken: str = "0"):
+    await asyncio.sleep(LATENCY["gmail"])
+    start = int(pageToken) if pageToken.isdigit() else 0
+    end = min(start + maxResults, GMAIL_MESSAGES)
+    result: Dict[str, Any] = {
+        "messages": [{"id": f"fake-{i}", "threadId": f"thread-{i // 3}"} for i in range(start, end)],
+        "resultSizeEstimate": GMAIL_MESSAGES,
+    }
+    if end < GMAIL_MESSAGES:
+        result["nextPageToken"] = str(end)
+    return result
+
+
+@app.get("/gmail/v1/users/me/messages/{message_id}")
+async def gmail_get_message(message_id: str):
+    await asyncio.sleep(LATENCY["gmail"])
+    return _gmail_message(message_id)
+
+
+@app.get("/gmail/v1/users/me/history")
+async def gmail_history(startHistoryId: str = "0"):
+    await asyncio.sleep(LATENCY["gmail"])
+    return {"history": [], "historyId": str(1000 + GMAIL_MESSAGES)}
+
+
+@app.post("/batch/gmail/v1")
+async def gmail_batch(request: Request):
+    """Endpoint batch : une réponse HTTP par requête messages.get du corps multipart"""
+    body = (await request.body()).decode("utf-8", "replace")
+    await asyncio.sleep(LATENCY["gmail"])
+    items: List[str] = []
+    boundary = "batch_fake_response"
+    for index, message_id in re.findall(r"Content-ID:\s*<item-(\d+)>.*?GET /gmail/v1/users/me/messages/([^?\s]+)", body, re.S):
+        items.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: application/http\r\n"
+            f"Content-ID: <response-item-{index}>\r\n\r\n"
+            f"HTTP/1.1 200 OK\r\n"
+            f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(_gmail_message(message_id))}\r\n"
+        )
+    content = "".join(items) + f"--{boundary}--\r\n"
+    return Response(content=content, media_type=f"multipart/mixed; boundary={boundary}")
+
+
+@app.get("/health")
+def health():
+    return JSONResponse({"status": "ok"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fournisseurs externes simulés (Mistral, Gemini, Gmail)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Latence simulée des appels LLM")
+    parser.add_argument("--gmail-latency-ms", type=float, default=20, help="Latence simulée des appels Gmail")
+    parser.add_argument("--gmail-messages", type=int, default=500, help="Nombre de messages de la boîte simulée")
+    args = parser.parse_args()
+
+    global GMAIL_MESSAGES
+    LATENCY["llm"] = args.llm_latency_ms / 1000
+    LATENCY["gmail"] = args.gmail_latency_ms / 1000
+    GMAIL_MESSAGES = args.gmail_messages
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Test de charge du backend : latences p50/p95/p99 et débit par endpoint
+
+Par défaut le script démarre les fournisseurs simulés (fake_providers.py) et
+l'API (uvicorn) sur des ports libres, contre la base DATABASE_URL, après y
+avoir créé les comptes de test (seed_data.py), un par utilisateur virtuel.
+Les utilisateurs virtuels (client asyncio httpx) enchaînent ensuite des requêtes tirées selon le
+mélange pondéré SCENARIOS pendant la durée demandée, après un préchauffage
+non mesuré. Les résultats sont écrits en JSON et comparés à une référence.
+
+Usage:
+    python loadtest/run_load_test.py --users 20 --duration 60
+    python loadtest/run_load_test.py --scenarios emails.list,nlp.classify --duration 30
+    python loadtest/run_load_test.py --base-url http://localhost:8000 --skip-seed
+    python loadtest/run_load_test.py --save-baseline   # met à jour loadtest/baseline.json
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOADTEST_DIR = os.path.join(BACKEND_DIR, "loadtest")
+DEFAULT_BASELINE = os.path.join(LOADTEST_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(LOADTEST_DIR, "results", "latest.json")
+
+API = "/api/v1"
+
+# Corps variés pour les endpoints NLP (suffixe unique : pas de réponse LLM en cache)
+NLP_SAMPLES = [
+    ("Votre candidature - Développeur Python", "Bonjour, nous avons bien reçu votre candidature et reviendrons vers vous.", "rh@techcorp.com"),
+    ("Invitation entretien", "Nous souhaiterions vous rencontrer pour un entretien mardi prochain à 14h.", "talents@dataviz.com"),
+    ("Suite de votre candidature", "Malheureusement nous ne donnerons pas suite à votre candidature.", "jobs@startup-ai.fr"),
+    ("Point d'étape", "Pourriez-vous nous transmettre vos disponibilités et vos attentes ?", "recrutement@cloudnine.io"),
+    ("Re: notre échange", "Merci pour l'échange d'hier, je reviens vers vous en fin de semaine.", "contact@finsoft.com"),
+]
+
+
+@dataclass
+class VirtualUser:
+    account: Dict[str, Any]
+    token: str
+    rng: random.Random
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+def _nlp_body(user: VirtualUser) -> Dict[str, str]:
+    subject, body, sender = user.rng.choice(NLP_SAMPLES)
+    return {"subject": subject, "body": f"{body} (réf. {user.rng.randrange(10**9)})", "sender_email": sender}
+
+
+def _match_body(user: VirtualUser) -> Dict[str, str]:
+    body = _nlp_body(user)
+    return {"email_subject": body["subject"], "email_body": body["body"], "sender_email": body["sender_email"]}
+
+
+# Nom -> (poids, construction de la requête : méthode, chemin, options httpx)
+Scenario = Tuple[int, Callable[[VirtualUser], Tuple[str, str, Dict[str, Any]]]]
+SCENARIOS: Dict[str, Scenario] = {
+    "emails.list": (6, lambda u: ("GET", f"{API}/emails/", {"params": {"limit": 50}})),
+    "emails.get": (6, lambda u: ("GET", f"{API}/emails/{u.rng.choice(u.account['email_ids'])}", {})),
+    "nlp.classify": (4, lambda u: ("POST", f"{API}/nlp/classify", {"json": _nlp_body(u)})),
+    "nlp.extract": (2, lambda u: ("POST", f"{API}/nlp/extract", {"json": _nlp_body(u)})),
+    "nlp.match": (3, lambda u: ("POST", f"{API}/nlp/match", {"json": _match_body(u)})),
+    "nlp.stats": (2, lambda u: ("GET", f"{API}/nlp/stats", {})),
+    "tracker.process-emails": (1, lambda u: ("POST", f"{API}/intelligent-tracker/process-emails", {"params": {"limit": 20}})),
+    "tracker.processing-summary": (3, lambda u: ("GET", f"{API}/intelligent-tracker/processing-summary", {})),
+    "tracker.application-insights": (2, lambda u: (
+        "GET", f"{API}/intelligent-tracker/application-insights/{u.rng.choice(u.account['application_ids'])}", {}
+    )),
+    "gmail.test-connection": (1, lambda u: ("GET", f"{API}/oauth/gmail/test-connection", {})),
+    "gmail.sync-emails": (1, lambda u: ("POST", f"{API}/oauth/gmail/sync-emails", {"params": {"max_emails": 50}})),
+}
+
+
+# --- Démarrage des services ---
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_process(command: List[str], env: Dict[str, str], log_name: str) -> subprocess.Popen:
+    os.makedirs(os.path.join(LOADTEST_DIR, "results"), exist_ok=True)
+    log = open(os.path.join(LOADTEST_DIR, "results", log_name), "w")
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le processus s'est arrêté (code {process.returncode}) avant d'être prêt : {url}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Service non prêt après {timeout:.0f} s : {url}")
+
+
+def start_services(args) -> Tuple[str, List[subprocess.Popen]]:
+    """Fournisseurs simulés puis API, configurée pour n'appeler que ces fournisseurs"""
+    fake_port, api_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = start_process([
+        sys.executable, os.path.join(LOADTEST_DIR, "fake_providers.py"), "--port", str(fake_port),
+        "--llm-latency-ms", str(args.llm_latency_ms),
+    ], dict(os.environ), "fake_providers.log")
+    processes = [fake]
+    wait_ready(f"{fake_url}/health", fake)
+
+    env = dict(os.environ)
+    env.update({
+        "GMAIL_API_BASE_URL": fake_url,
+        "MISTRAL_SERVER_URL": fake_url,
+        "MISTRAL_API_KEY": "loadtest",
+        "GEMINI_API_BASE_URL": f"{fake_url}/v1beta",
+        "GEMINI_API_KEY": "loadtest",
+        "INGESTION_SCHEDULER_ENABLED": "false",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+    })
+    api = start_process([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(api_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ], env, "api.log")
+    processes.append(api)
+    base_url = f"http://127.0.0.1:{api_port}"
+    wait_ready(f"{base_url}/health", api)
+    return base_url, processes
+
+
+def stop_services(processes: List[subprocess.Popen]) -> None:
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# --- Mesures ---
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile par rang le plus proche (valeurs triées)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, statuses: Dict[int, int], duration: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / duration, 2),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "mean_ms": round(sum(values) / len(values) * 1000, 1) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def login(client: httpx.AsyncClient, account: Dict[str, Any]) -> str:
+    response = await client.post(f"{API}/auth/login", json={"email": account["email"], "password": account["password"]})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(base_url: str, accounts: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    names = list(SCENARIOS) if not args.scenarios else [name.strip() for name in args.scenarios.split(",")]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Scénarios inconnus : {unknown} (disponibles : {', '.join(SCENARIOS)})")
+    weights = [SCENARIOS[name][0] for name in names]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        tokens = await asyncio.gather(*(login(client, account) for account in accounts))
+        users = [
+            VirtualUser(accounts[index % len(accounts)], tokens[index % len(accounts)], random.Random(args.seed + index))
+            for index in range(args.users)
+        ]
+
+        started = time.monotonic()
+        measure_from = started + args.warmup
+        stop_at = measure_from + args.duration
+
+        async def worker(user: VirtualUser) -> None:
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    return
+                name = user.rng.choices(names, weights)[0]
+                method, path, options = SCENARIOS[name][1](user)
+                request_start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, headers=user.headers, **options)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0  # Timeout / connexion refusée
+                elapsed = time.perf_counter() - request_start
+                if now < measure_from:
+                    continue
+                latencies[name].append(elapsed)
+                statuses[name][status] += 1
+                if status == 0 or status >= 400:
+                    errors[name] += 1
+
+        await asyncio.gather(*(worker(user) for user in users))
+
+    endpoints = {
+        name: summarize(latencies[name], errors[name], statuses[name], args.duration)
+        for name in names if latencies[name]
+    }
+    all_latencies = [value for name in names for value in latencies[name]]
+    total_statuses: Dict[int, int] = defaultdict(int)
+    for name in names:
+        for code, count in statuses[name].items():
+            total_statuses[code] += count
+    return {
+        "endpoints": endpoints,
+        "total": summarize(all_latencies, sum(errors.values()), total_statuses, args.duration),
+    }
+
+
+# --- Rapport ---
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    header = f"{'endpoint':<32} {'req':>6} {'err':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(f"\n📊 {header}")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, stats in rows:
+        print(f"   {name:<32} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>7.1f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Écarts de p95 et de débit par rapport à la référence enregistrée"""
+    print(f"\n📐 Comparaison avec la référence ({baseline['meta'].get('date')}, {baseline['meta'].get('git_revision')})")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, stats in rows:
+        reference = baseline["endpoints"].get(name) if name != "TOTAL" else baseline.get("total")
+        if not reference or not reference.get("p95_ms") or not reference.get("rps"):
+            continue
+        p95_delta = (stats["p95_ms"] - reference["p95_ms"]) / reference["p95_ms"] * 100
+        rps_delta = (stats["rps"] - reference["rps"]) / reference["rps"] * 100
+        flag = "⚠️ " if p95_delta > 20 or rps_delta < -20 else "  "
+        print(f" {flag}{name:<32} p95 {reference['p95_ms']:>8.1f} -> {stats['p95_ms']:>8.1f} ms ({p95_delta:+.0f} %)   "
+              f"rps {reference['rps']:>6.1f} -> {stats['rps']:>6.1f} ({rps_delta:+.0f} %)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du backend (API + fournisseurs simulés)")
+    parser.add_argument("--base-url", help="API déjà démarrée (sinon API et fournisseurs simulés sont lancés)")
+    parser.add_argument("--users", type=int, default=20, help="Utilisateurs virtuels simultanés")
+    parser.add_argument("--duration", type=float, default=60, help="Durée mesurée (s)")
+    parser.add_argument("--warmup", type=float, default=5, help="Préchauffage non mesuré (s)")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout d'une requête (s)")
+    parser.add_argument("--scenarios", help="Scénarios séparés par des virgules (défaut : tous, pondérés)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers uvicorn de l'API lancée")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Latence des LLM simulés")
+    parser.add_argument("--llm-cache", action="store_true", help="Laisser actif le cache des réponses LLM")
+    parser.add_argument("--accounts", type=int, help="Comptes de test (défaut : un par utilisateur virtuel)")
+    parser.add_argument("--emails-per-account", type=int, default=500)
+    parser.add_argument("--applications-per-account", type=int, default=40)
+    parser.add_argument("--skip-seed", action="store_true", help="Réutiliser les comptes de test existants")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des tirages (reproductibilité)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Référence à laquelle comparer")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    from seed_data import seed
+
+    # Un compte par utilisateur virtuel : pas de synchronisations concurrentes d'une même boîte
+    args.accounts = args.accounts or args.users
+
+    if args.skip_seed:
+        accounts = load_accounts(args.accounts)
+    else:
+        started = time.perf_counter()
+        accounts = seed(args.accounts, args.emails_per_account, args.applications_per_account, args.seed)
+        print(f"🌱 {len(accounts)} comptes de test ({args.emails_per_account} emails, "
+              f"{args.applications_per_account} candidatures chacun) en {time.perf_counter() - started:.1f} s")
+
+    processes: List[subprocess.Popen] = []
+    try:
+        base_url = args.base_url
+        if not base_url:
+            base_url, processes = start_services(args)
+            print(f"🚀 API {base_url} ({args.workers} worker(s)), LLM simulés à {args.llm_latency_ms:.0f} ms")
+        print(f"⏱️  {args.users} utilisateurs virtuels, {args.warmup:.0f} s de préchauffage puis {args.duration:.0f} s mesurées")
+        results = asyncio.run(run_load(base_url, accounts, args))
+    finally:
+        stop_services(processes)
+
+    from app.core.config import settings
+    results["meta"] = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "database": settings.DATABASE_URL.split(":", 1)[0],
+        "users": args.users,
+        "duration_s": args.duration,
+        "workers": args.workers,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_cache": args.llm_cache,
+        "accounts": len(accounts),
+        "emails_per_account": args.emails_per_account,
+        "applications_per_account": args.applications_per_account,
+        "scenarios": args.scenarios or "all",
+    }
+    print_report(results)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            compare_with_baseline(results, json.load(f))
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 {path}")
+
+
+def load_accounts(count: int) -> List[Dict[str, Any]]:
+    """Comptes de test déjà présents en base (--skip-seed)"""
+    from app.core.database import SessionLocal
+    from app.models.models import Application, Email, User
+    from seed_data import PASSWORD, USER_EMAIL_TEMPLATE
+
+    db = SessionLocal()
+    try:
+        accounts = []
+        for index in range(count):
+            user = db.query(User).filter(User.email == USER_EMAIL_TEMPLATE.format(index)).first()
+            if user is None:
+                break
+            accounts.append({
+                "email": user.email,
+                "password": PASSWORD,
+                "user_id": str(user.id),
+                "email_ids": [str(row.id) for row in db.query(Email.id).filter(Email.user_id == user.id).limit(5000)],
+                "application_ids": [str(row.id) for row in db.query(Application.id).filter(Application.user_id == user.id)],
+            })
+        if not accounts:
+            raise SystemExit("❌ Aucun compte de test : lancer sans --skip-seed ou loadtest/seed_data.py")
+        return accounts
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
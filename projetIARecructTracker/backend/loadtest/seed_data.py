@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Données réalistes pour les tests de charge
+
+Crée des comptes `loadtest-<n>@example.com` (mot de passe commun), chacun
+avec des candidatures et des emails générés à partir de create_test_emails.py :
+une partie des emails est classifiée et liée, une partie classifiée mais non
+liée (travail pour /intelligent-tracker/process-emails), le reste brut.
+Les comptes sont connectés à Gmail avec un token valide un an (fournisseur
+simulé). Une nouvelle exécution remplace les comptes existants.
+
+Usage:
+    python loadtest/seed_data.py --users 4 --emails-per-user 500 --applications-per-user 40
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, insert
+
+from app.core.database import SessionLocal
+from app.models.models import Application, Email, User
+from app.services.auth_service import get_password_hash
+from benchmark_tracker import build_corpus
+
+USER_EMAIL_TEMPLATE = "loadtest-{}@example.com"
+PASSWORD = "loadtest-password"
+INSERT_CHUNK = 1000
+
+COMPANIES = ["TechCorp", "DataViz", "StartupAI", "InnovTech", "CloudNine", "FinSoft", "GreenLab", "MediaPlus"]
+JOB_TITLES = ["Développeur Python", "Data Engineer", "Ingénieur DevOps", "Lead Developer", "Data Scientist"]
+STATUSES = ["APPLIED", "ACKNOWLEDGED", "SCREENING", "INTERVIEW", "REJECTED", "OFFER"]
+
+
+def delete_users(db) -> int:
+    """Supprime les comptes de test existants (candidatures et emails : ON DELETE CASCADE)"""
+    result = db.execute(delete(User).where(User.email.like(USER_EMAIL_TEMPLATE.format("%"))))
+    db.commit()
+    return result.rowcount
+
+
+def seed(users: int = 4, emails_per_user: int = 500, applications_per_user: int = 40, seed_value: int = 42) -> List[Dict[str, Any]]:
+    """
+    Crée les comptes de test et leurs données
+
+    Returns:
+        Pour chaque compte : identifiants de connexion, ids des emails et des candidatures
+    """
+    rng = random.Random(seed_value)
+    corpus = build_corpus(emails_per_user, seed=seed_value)
+    password_hash = get_password_hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    accounts = []
+
+    db = SessionLocal()
+    try:
+        delete_users(db)
+        for index in range(users):
+            user = User(
+                email=USER_EMAIL_TEMPLATE.format(index),
+                hashed_password=password_hash,
+                gmail_connected=True,
+                gmail_email=USER_EMAIL_TEMPLATE.format(index),
+                gmail_access_token=f"fake-access-{index}",
+                gmail_refresh_token=f"fake-refresh-{index}",
+                gmail_token_expires_at=now + timedelta(days=365),
+            )
+            db.add(user)
+            db.flush()
+
+            applications = [{
+                "id": uuid.uuid4(),
+                "user_id": user.id,
+                "company_name": COMPANIES[number % len(COMPANIES)] + ("" if number < len(COMPANIES) else f" {number}"),
+                "job_title": rng.choice(JOB_TITLES),
+                "status": rng.choice(STATUSES),
+                "source": "loadtest",
+                "location": rng.choice(["Paris", "Lyon", "Télétravail", None]),
+                "created_at": now - timedelta(days=rng.randint(0, 90)),
+                "updated_at": now,
+            } for number in range(applications_per_user)]
+            if applications:
+                db.execute(insert(Application), applications)
+
+            emails = []
+            for number, item in enumerate(corpus):
+                draw = rng.random()
+                # ~50 % classifiés et liés, ~30 % classifiés non liés, ~20 % bruts
+                linked = draw < 0.5 and applications
+                classified = draw < 0.8
+                emails.append({
+                    "id": uuid.uuid4(),
+                    "user_id": user.id,
+                    "application_id": rng.choice(applications)["id"] if linked else None,
+                    "external_id": f"<loadtest-{index}-{number}@example.com>",
+                    "subject": item["subject"],
+                    "sender": item["sender"],
+                    "recipient": USER_EMAIL_TEMPLATE.format(index),
+                    "raw_body": item["body"],
+                    "snippet": item["snippet"],
+                    "classification": item["classification"] if classified else None,
+                    "thread_id": f"loadtest-thread-{index}-{number // 3}",
+                    "sent_at": now - timedelta(minutes=10 * number),
+                    "created_at": now - timedelta(minutes=10 * number),
+                    "is_sent": "false",
+                })
+            for start in range(0, len(emails), INSERT_CHUNK):
+                db.execute(insert(Email), emails[start:start + INSERT_CHUNK])
+            db.commit()
+
+            accounts.append({
+                "email": user.email,
+                "password": PASSWORD,
+                "user_id": str(user.id),
+                "email_ids": [str(row["id"]) for row in emails],
+                "application_ids": [str(row["id"]) for row in applications],
+            })
+        return accounts
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Données de test de charge")
+    parser.add_argument("--users", type=int, default=4, help="Nombre de comptes")
+    parser.add_argument("--emails-per-user", type=int, default=500)
+    parser.add_argument("--applications-per-user", type=int, default=40)
+    parser.add_argument("--delete", action="store_true", help="Supprimer les comptes de test sans en créer")
+    args = parser.parse_args()
+
+    if args.delete:
+        db = SessionLocal()
+        try:
+            print(f"🗑️  {delete_users(db)} compte(s) de test supprimé(s)")
+        finally:
+            db.close()
+        return
+
+    accounts = seed(args.users, args.emails_per_user, args.applications_per_user)
+    print(f"🌱 {len(accounts)} compte(s) créés ({args.emails_per_user} emails, "
+          f"{args.applications_per_user} candidatures chacun), mot de passe: {PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Tests de l'index de candidatures (app/nlp/candidate_index.py)
+
+Le pré-filtre ne doit jamais écarter une candidature que le scoring complet
+retiendrait : chaque test compare les candidates au scoring sans filtre.
+"""
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Application
+from app.nlp.candidate_index import ApplicationCandidateIndex, CandidateIndexCache
+from app.nlp.matching_service import EmailMatchingService
+from app.services.intelligent_application_tracker import (
+    APPLICATION_MATCH_THRESHOLD, COMPANY_MATCH_WEIGHT, application_match_score
+)
+
+NOW = datetime.now(timezone.utc)
+
+
+def make_application(company_name, job_title, location=None, status="APPLIED", days_old=3):
+    return Application(
+        id=uuid.uuid4(),
+        company_name=company_name,
+        job_title=job_title,
+        location=location,
+        status=status,
+        created_at=NOW - timedelta(days=days_old),
+        updated_at=NOW - timedelta(days=days_old),
+    )
+
+
+def build_index(applications):
+    return ApplicationCandidateIndex.build(
+        (app.id, app.company_name, app.job_title, app.status) for app in applications
+    )
+
+
+def tracker_matches(applications, company_name, job_title):
+    """Candidatures que le suivi intelligent accepterait sans pré-filtre"""
+    return {
+        str(app.id) for app in applications
+        if application_match_score(company_name, job_title, app.company_name, app.job_title) > APPLICATION_MATCH_THRESHOLD
+    }
+
+
+def company_candidates(index, company_name, job_title):
+    return index.company_candidates(company_name, job_title, APPLICATION_MATCH_THRESHOLD, COMPANY_MATCH_WEIGHT)
+
+
+def rule_matches(applications, subject, body, sender):
+    """Candidatures que le matching par règles retiendrait sans pré-filtre"""
+    service = EmailMatchingService(db=None)
+    domain = sender.split("@")[-1] if "@" in sender else ""
+    return {
+        str(app.id) for app in applications
+        if service._match_with_rules(app, subject, body, sender, domain).similarity_score >= settings.SIMILARITY_THRESHOLD
+    }
+
+
+def email_candidates(index, subject, body, sender):
+    domain = sender.split("@")[-1] if "@" in sender else ""
+    return index.email_candidates(f"{subject} {body}", domain)
+
+
+# --- company_candidates (suivi intelligent) ---
+
+@pytest.mark.parametrize("extracted, existing", [
+    (("Loreal", "Data Scientist"), ("L'Oréal", "Data Scientist")),  # accents et apostrophe
+    (("Loreal", None), ("L'Oréal", "Data Scientist")),
+    (("Societe Generale", "Analyste"), ("Société Générale", "Analyste")),
+    (("Acne", "Stage data"), ("Acme", "Stage data")),  # aucun trigramme commun, intitulé identique
+    (("BNP-Paribas", "Développeur Java"), ("BNP Paribas", "Developpeur Java")),
+    (("Ab", "Chef de projet"), ("AB", "Chef de projet")),  # noms trop courts pour des trigrammes
+])
+def test_company_candidates_keep_tracker_matches(extracted, existing):
+    applications = [
+        make_application(*existing),
+        make_application("Totalement Différent", "Boulanger"),
+    ]
+    expected = tracker_matches(applications, *extracted)
+
+    assert str(applications[0].id) in expected
+    assert expected <= company_candidates(build_index(applications), *extracted)
+
+
+def test_company_candidates_exclude_unreachable_applications():
+    applications = [make_application("Capgemini", "Consultant SAP"), make_application("Zalando", "Data Engineer")]
+    candidates = company_candidates(build_index(applications), "Capgemini", "Consultant SAP")
+
+    assert candidates == {str(applications[0].id)}
+
+
+def mutate(rng, text):
+    """Variante d'un nom : accents, ponctuation, casse, lettre supprimée ou remplacée"""
+    accents = {"e": "é", "a": "à", "o": "ô", "c": "ç", "i": "î"}
+    chars = list(text)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars))
+        operation = rng.choice(("accent", "punct", "upper", "drop", "swap"))
+        if operation == "accent":
+            chars[position] = accents.get(chars[position].lower(), chars[position])
+        elif operation == "punct":
+            chars.insert(position, rng.choice("'-. &"))
+        elif operation == "upper":
+            chars[position] = chars[position].upper()
+        elif operation == "drop" and len(chars) > 2:
+            del chars[position]
+        else:
+            chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def test_company_candidates_superset_of_tracker_matches_randomized():
+    rng = random.Random(33)
+    companies = ["Loreal", "Acme", "Capgemini", "Societe Generale", "Thales", "Ubisoft", "Orange", "Decathlon", "Airbus", "Sopra Steria"]
+    titles = ["Data Scientist", "Developpeur Python", "Stage data", "Chef de projet", "Analyste financier", None]
+    applications = [
+        make_application(mutate(rng, rng.choice(companies)), rng.choice(titles))
+        for _ in range(60)
+    ]
+    index = build_index(applications)
+
+    for _ in range(300):
+        company_name = mutate(rng, rng.choice(companies))
+        job_title = rng.choice(titles)
+        job_title = mutate(rng, job_title) if job_title else None
+        expected = tracker_matches(applications, company_name, job_title)
+        assert expected <= company_candidates(index, company_name, job_title), (company_name, job_title)
+
+
+# --- email_candidates (matching par règles) ---
+
+@pytest.mark.parametrize("subject, body, sender", [
+    ("Votre candidature chez L'Oréal", "Poste de data scientist.", "rh@jobs.example.com"),  # accents dans le texte
+    ("Candidature", "Votre profil de data scientist.", "recrutement@bnpparibas.com"),  # domaine sans ponctuation
+    ("Candidature", "Votre profil de consultant.", "talent@ibm.com"),  # acronyme
+    ("Candidature", "Poste ingénieur support.", "talent@hp.com"),  # domaine trop court
+    ("Candidature", "Votre profil d'analyste.", "noreply@.fr"),  # libellé de domaine vide
+    ("Société Générale - Analyste", "Entretien prévu.", "noreply@mail.example.com"),
+    ("Poste Data Scientist", "Votre profil chez BNP Paribas.", "rh@bnp-paribas.com"),
+])
+def test_email_candidates_keep_rule_matches(subject, body, sender):
+    applications = [
+        make_application("L'Oréal", "Data Scientist", location="Paris"),
+        make_application("IBM", "Consultant"),
+        make_application("HP", "Ingénieur support"),
+        make_application("Société Générale", "Analyste"),
+        make_application("BNP Paribas", "Data Scientist"),
+        make_application("Zalando", "Développeur Java", days_old=90),
+    ]
+    expected = rule_matches(applications, subject, body, sender)
+
+    assert expected
+    assert expected <= email_candidates(build_index(applications), subject, body, sender)
+
+
+def test_email_candidates_superset_of_rule_matches_randomized():
+    rng = random.Random(39)
+    companies = ["L'Oréal", "Acme", "IBM", "HP", "Société Générale", "Sopra-Steria", "Thales", "Ubisoft"]
+    titles = ["Data Scientist", "Développeur Python", "Chef de projet", "Analyste", None]
+    domains = ["loreal.com", "acme.fr", "ibm.com", "hp.com", "socgen.com", "sopra-steria.com", "gmail.com", ".fr", "thales-group.com"]
+    words = ["candidature", "entretien", "poste", "python", "data", "scientist", "projet", "merci", "paris", "lyon"]
+    applications = [
+        make_application(rng.choice(companies), rng.choice(titles), location=rng.choice(["Paris", "Lyon", None]),
+                         days_old=rng.choice((2, 60)))
+        for _ in range(40)
+    ]
+    index = build_index(applications)
+
+    for _ in range(300):
+        mentioned = rng.sample(companies, rng.randint(0, 2))
+        body = " ".join(rng.sample(words, 4) + mentioned)
+        sender = f"rh@{rng.choice(domains)}"
+        expected = rule_matches(applications, "Votre candidature", body, sender)
+        assert expected <= email_candidates(index, "Votre candidature", body, sender), (body, sender)
+
+
+# --- CandidateIndexCache : reconstruction selon l'empreinte ---
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def one(self):
+        return self.rows[0]
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Session minimale : répond aux requêtes d'empreinte et de lignes du cache"""
+
+    def __init__(self, applications):
+        self.applications = applications
+        self.rows_queries = 0
+
+    def execute(self, statement):
+        if "count" in str(statement).lower():
+            return FakeResult([(
+                len(self.applications),
+                max((app.updated_at for app in self.applications), default=None),
+                max((app.created_at for app in self.applications), default=None),
+            )])
+        self.rows_queries += 1
+        return FakeResult([(app.id, app.company_name, app.job_title, app.status) for app in self.applications])
+
+
+class FakeAsyncSession(FakeSession):
+    async def execute(self, statement):
+        return FakeSession.execute(self, statement)
+
+
+def test_cache_reuses_index_while_fingerprint_is_unchanged():
+    db = FakeSession([make_application("Acme", "Data Scientist")])
+    cache = CandidateIndexCache()
+    user_id = uuid.uuid4()
+
+    first = cache.get(db, user_id)
+
+    assert cache.get(db, user_id) is first
+    assert db.rows_queries == 1
+
+
+def test_cache_rebuilds_index_after_insert():
+    db = FakeSession([make_application("Acme", "Data Scientist")])
+    cache = CandidateIndexCache()
+    user_id = uuid.uuid4()
+    cache.get(db, user_id)
+
+    inserted = make_application("L'Oréal", "Data Scientist", days_old=0)
+    db.applications.append(inserted)
+    index = cache.get(db, user_id)
+
+    assert db.rows_queries == 2
+    assert str(inserted.id) in company_candidates(index, "Loreal", "Data Scientist")
+
+
+def test_cache_rebuilds_index_after_update():
+    application = make_application("Acme", "Data Scientist")
+    db = FakeSession([application])
+    cache = CandidateIndexCache()
+    user_id = uuid.uuid4()
+    assert str(application.id) not in company_candidates(cache.get(db, user_id), "Ubisoft", "Game Designer")
+
+    application.company_name = "Ubisoft"
+    application.job_title = "Game Designer"
+    application.updated_at = NOW
+    index = cache.get(db, user_id)
+
+    assert db.rows_queries == 2
+    assert str(application.id) in company_candidates(index, "Ubisoft", "Game Designer")
+    assert index.applications() == {str(application.id)}
+
+
+def test_async_cache_rebuilds_index_after_status_update():
+    application = make_application("Acme", "Data Scientist")
+    db = FakeAsyncSession([application])
+    cache = CandidateIndexCache()
+    user_id = uuid.uuid4()
+    assert asyncio.run(cache.aget(db, user_id)).applications(["APPLIED"]) == {str(application.id)}
+
+    application.status = "REJECTED"
+    application.updated_at = NOW
+    index = asyncio.run(cache.aget(db, user_id))
+
+    assert db.rows_queries == 2
+    assert index.applications(["APPLIED"]) == set()
@@ -0,0 +1,162 @@
+"""
+Tests de GmailAPIService contre le faux serveur Gmail (scripts/fake_gmail_server.py)
+
+Le faux serveur est appelé en mémoire via httpx.ASGITransport.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from fake_gmail_server import create_app
+from app.services import gmail_api_service
+from app.services.gmail_api_service import GmailAPIService, _parse_batch_response
+
+
+class StaticTokenOAuthService:
+    """Remplace GmailOAuthService : token toujours valide, sans base de données"""
+
+    async def get_access_token(self, user, force_refresh=False):
+        return "test-token"
+
+    async def ensure_valid_token(self, user):
+        return True
+
+
+@pytest.fixture
+def fake_gmail():
+    return create_app(message_count=120)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Délais de backoff demandés par le service (sans attente réelle)"""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(gmail_api_service.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def make_service(app, batch_size=50):
+    service = GmailAPIService(
+        db=None, max_concurrency=2, batch_size=batch_size, transport=httpx.ASGITransport(app=app)
+    )
+    service.oauth_service = StaticTokenOAuthService()
+    return service
+
+
+USER = SimpleNamespace(id=1)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_parse_batch_response():
+    body = (
+        "--b1\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-item-0>\r\n\r\n"
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: application/json\r\n\r\n"
+        '{"id": "a"}\r\n'
+        "--b1\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-item-2>\r\n\r\n"
+        "HTTP/1.1 429 Too Many Requests\r\n"
+        "Content-Type: application/json\r\n\r\n"
+        '{"error": {"code": 429}}\r\n'
+        "--b1\r\n"
+        "Content-Type: application/http\r\n"
+        "Content-ID: <response-item-3>\r\n\r\n"
+        "HTTP/1.1 500 Internal Server Error\r\n\r\n"
+        "pas du json\r\n"
+        "--b1--\r\n"
+    )
+    parsed = _parse_batch_response('multipart/mixed; boundary="b1"', body)
+
+    assert parsed == {
+        0: (200, {"id": "a"}),
+        2: (429, {"error": {"code": 429}}),
+        3: (500, None),
+    }
+
+
+def test_parse_batch_response_requires_boundary():
+    with pytest.raises(ValueError):
+        _parse_batch_response("multipart/mixed", "")
+
+
+def test_messages_fetched_through_batches(fake_gmail):
+    mailbox = fake_gmail.state.mailbox
+    message_ids = mailbox.order[:120]
+
+    async def scenario():
+        async with make_service(fake_gmail) as service:
+            return await service.get_messages_details(USER, message_ids)
+
+    details = run(scenario())
+
+    assert set(details) == set(message_ids)
+    assert details[message_ids[0]]["payload"]["headers"]
+    assert mailbox.calls["batch"] == 3
+    assert mailbox.calls["messages.get"] == 120
+    assert mailbox.calls["http"] == 3
+
+
+def test_failed_batch_items_fall_back_to_single_requests(fake_gmail, sleeps):
+    mailbox = fake_gmail.state.mailbox
+    message_ids = mailbox.order[:10] + ["inconnu"]
+    # Les deux premiers éléments du batch répondent 429
+    mailbox.throttled = 2
+
+    async def scenario():
+        async with make_service(fake_gmail) as service:
+            return await service.get_messages_details(USER, message_ids)
+
+    details = run(scenario())
+
+    assert set(details) == set(message_ids[:10])
+    assert mailbox.calls["batch"] == 1
+    # 1 batch, puis un messages.get unitaire par élément en échec (2 x 429 et le 404)
+    assert mailbox.calls["http"] == 1 + 3
+    assert sleeps == []
+
+
+def test_retry_after_is_honoured(fake_gmail, sleeps):
+    mailbox = fake_gmail.state.mailbox
+    message_id = mailbox.order[0]
+    mailbox.throttled = 2
+    mailbox.retry_after = 3
+
+    async def scenario():
+        async with make_service(fake_gmail) as service:
+            return await service.get_message_details(USER, message_id)
+
+    details = run(scenario())
+
+    assert details["id"] == message_id
+    assert sleeps == [3.0, 3.0]
+    assert mailbox.calls["messages.get"] == 3
+
+
+def test_retry_backoff_without_retry_after(fake_gmail, sleeps):
+    mailbox = fake_gmail.state.mailbox
+    mailbox.throttled = 10
+
+    async def scenario():
+        async with make_service(fake_gmail) as service:
+            return await service.get_message_details(USER, mailbox.order[0])
+
+    with pytest.raises(Exception, match="429"):
+        run(scenario())
+
+    # GMAIL_MAX_RETRIES nouveaux essais, backoff exponentiel
+    assert sleeps == [0.5, 1.0, 2.0]
+    assert mailbox.calls["messages.get"] == 4
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Entraînement et évaluation du classifieur local d'emails
+Les données sont les emails déjà classifiés en base (colonne `classification`,
+renseignée par les règles, les LLM ou l'utilisateur).
+
+Usage:
+    python train_classifier.py train [--limit 50000] [--test-size 0.2] [--output models/classification_model.pkl]
+    python train_classifier.py evaluate [--since-training] [--model models/classification_model.pkl]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Email
+from app.nlp.classification_service import EmailType
+from app.nlp.local_classifier import LocalEmailClassifier, email_text
+
+LABELS = [email_type.value for email_type in EmailType]
+
+
+def load_labeled_emails(limit: Optional[int] = None, since: Optional[datetime] = None) -> Tuple[List[str], List[str]]:
+    """Textes et labels des emails classifiés, du plus récent au plus ancien"""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Email.subject, Email.snippet, Email.raw_body, Email.sender, Email.classification
+        ).filter(Email.classification.in_(LABELS))
+        if since is not None:
+            query = query.filter(Email.created_at > since)
+        query = query.order_by(Email.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+
+        texts, labels = [], []
+        for subject, snippet, raw_body, sender, classification in query.yield_per(1000):
+            # Même corps que celui soumis à la classification par le pipeline NLP
+            texts.append(email_text(subject, snippet or raw_body or "", sender))
+            labels.append(classification)
+        return texts, labels
+    finally:
+        db.close()
+
+
+def evaluate(model: LocalEmailClassifier, texts: Sequence[str], labels: Sequence[str], threshold: float) -> Dict:
+    """
+    Métriques sur un jeu étiqueté
+
+    `coverage` : part des emails prédits avec une probabilité >= seuil,
+    c'est-à-dire traités sans appel LLM ; `covered_accuracy` : précision sur cette part.
+    """
+    from sklearn.metrics import accuracy_score, classification_report, f1_score
+
+    predictions = model.predict_texts(texts)
+    predicted = [label for label, _ in predictions]
+    covered = [(label, truth) for (label, probability), truth in zip(predictions, labels) if probability >= threshold]
+    return {
+        "samples": len(labels),
+        "accuracy": round(accuracy_score(labels, predicted), 4),
+        "macro_f1": round(f1_score(labels, predicted, average="macro", zero_division=0), 4),
+        "threshold": threshold,
+        "coverage": round(len(covered) / len(labels), 4) if labels else 0.0,
+        "covered_accuracy": round(sum(1 for label, truth in covered if label == truth) / len(covered), 4) if covered else None,
+        "report": classification_report(labels, predicted, zero_division=0),
+    }
+
+
+def measure_latency(model: LocalEmailClassifier, texts: Sequence[str], samples: int = 500) -> float:
+    """Latence moyenne d'une prédiction unitaire (µs), comme dans le pipeline NLP"""
+    texts = list(texts)[:samples]
+    if not texts:
+        return 0.0
+    model.predict_text(texts[0])  # Préchauffage
+    start = time.perf_counter()
+    for text in texts:
+        model.predict_text(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def print_metrics(title: str, metrics: Dict, latency_us: Optional[float] = None) -> None:
+    print(f"\n📊 {title} ({metrics['samples']} emails)")
+    print(f"  accuracy: {metrics['accuracy']:.3f}   macro F1: {metrics['macro_f1']:.3f}")
+    if metrics["covered_accuracy"] is not None:
+        print(f"  p >= {metrics['threshold']}: {metrics['coverage']:.1%} des emails sans appel LLM, "
+              f"précision {metrics['covered_accuracy']:.3f}")
+    if latency_us is not None:
+        print(f"  latence: {latency_us:.0f} µs / email")
+    print(metrics["report"])
+
+
+def command_train(args) -> int:
+    texts, labels = load_labeled_emails(limit=args.limit)
+    counts = {label: labels.count(label) for label in sorted(set(labels))}
+    print(f"📥 {len(labels)} emails étiquetés: {counts}")
+    if len(counts) < 2:
+        print("❌ Au moins deux classes sont nécessaires pour entraîner le modèle")
+        return 1
+    rare = [label for label, count in counts.items() if count < args.min_per_class]
+    if rare:
+        # Trop peu d'exemples pour apprendre ou évaluer ces classes
+        print(f"⚠️  Classes ignorées (< {args.min_per_class} exemples): {rare}")
+        kept = [(text, label) for text, label in zip(texts, labels) if label not in rare]
+        texts, labels = [text for text, _ in kept], [label for _, label in kept]
+
+    metrics = None
+    if args.test_size > 0:
+        from sklearn.model_selection import train_test_split
+
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=args.test_size, stratify=labels, random_state=42
+        )
+        start = time.perf_counter()
+        model = LocalEmailClassifier.train(train_texts, train_labels)
+        print(f"\n🧠 Entraîné sur {len(train_labels)} emails en {time.perf_counter() - start:.1f} s")
+        metrics = evaluate(model, test_texts, test_labels, args.threshold)
+        print_metrics("Évaluation sur le jeu de test", metrics, measure_latency(model, test_texts))
+
+    if args.dry_run:
+        return 0
+
+    # Modèle final entraîné sur toutes les données
+    model = LocalEmailClassifier.train(texts, labels)
+    if metrics is not None:
+        model.metadata["holdout_metrics"] = {key: value for key, value in metrics.items() if key != "report"}
+    model.save(args.output)
+    print(f"💾 Modèle enregistré: {args.output} ({len(labels)} emails, classes {model.labels})")
+    return 0
+
+
+def command_evaluate(args) -> int:
+    model = LocalEmailClassifier.load(args.model)
+    if model is None:
+        print(f"❌ Aucun modèle utilisable: {args.model}")
+        return 1
+    print(f"🧠 Modèle du {model.metadata.get('trained_at')} ({model.metadata.get('samples')} emails)")
+
+    since = None
+    if args.since_training and model.metadata.get("trained_at"):
+        # Emails arrivés après l'entraînement : jamais vus par le modèle
+        since = datetime.fromisoformat(model.metadata["trained_at"])
+    texts, labels = load_labeled_emails(limit=args.limit, since=since)
+    if not labels:
+        print("Aucun email étiqueté à évaluer")
+        return 0
+    metrics = evaluate(model, texts, labels, args.threshold)
+    print_metrics("Évaluation" + (" (emails postérieurs à l'entraînement)" if since else ""), metrics, measure_latency(model, texts))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifieur local d'emails (entraînement / évaluation)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train = subparsers.add_parser("train", help="Entraîner le modèle sur les emails classifiés en base")
+    train.add_argument("--limit", type=int, default=None, help="Nombre maximal d'emails (les plus récents)")
+    train.add_argument("--test-size", type=float, default=0.2, help="Part réservée à l'évaluation (0 pour aucune)")
+    train.add_argument("--min-per-class", type=int, default=5, help="Exemples minimum pour garder une classe")
+    train.add_argument("--output", default=settings.CLASSIFICATION_MODEL_PATH, help="Fichier du modèle")
+    train.add_argument("--dry-run", action="store_true", help="Évaluer sans enregistrer le modèle")
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Évaluer le modèle enregistré")
+    evaluate_parser.add_argument("--model", default=settings.CLASSIFICATION_MODEL_PATH, help="Fichier du modèle")
+    evaluate_parser.add_argument("--limit", type=int, default=None, help="Nombre maximal d'emails (les plus récents)")
+    evaluate_parser.add_argument("--since-training", action="store_true",
+                                 help="Uniquement les emails arrivés après l'entraînement")
+
+    for sub in (train, evaluate_parser):
+        sub.add_argument("--threshold", type=float, default=settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+                         help="Seuil de confiance sous lequel le LLM est appelé")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    handler = command_train if args.command == "train" else command_evaluate
+    sys.exit(handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ set -e
 # Create additional databases or setup initial configuration if needed
 echo "PostgreSQL initialization complete for AI Recruit Tracker"
 
-# Enable UUID extension
+# Enable UUID and trigram extensions
 psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
     CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+    -- Index trigrammes de la recherche des candidatures
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
 EOSQL
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Faux serveur Gmail API pour le développement et les tests de synchronisation
+Simule users.getProfile, labels.list, messages.list, messages.get,
+history.list et l'endpoint batch HTTP, avec latence et erreurs 429
+configurables. POST /_receive?count=N simule l'arrivée de nouveaux messages,
+POST /_expire-history l'expiration de l'historique, POST /_throttle?count=N
+des 429 (avec Retry-After) sur les N prochains messages.get.
+
+Usage:
+    python scripts/fake_gmail_server.py --messages 500 --latency 0.05
+    # puis dans backend/.env : GMAIL_API_BASE_URL=http://localhost:8765
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+COMPANIES = ["TechCorp", "DataViz Solutions", "AI Innovations", "CloudFirst", "WebFactory"]
+SUBJECTS = [
+    "Accusé de réception - Candidature {job}",
+    "Suite de votre candidature - {company}",
+    "Convocation entretien - Poste {job}",
+    "Newsletter {company} de la semaine",
+]
+JOBS = ["Développeur Python", "Data Scientist", "DevOps Engineer", "Ingénieur IA"]
+
+
+class FakeMailbox:
+    """Boîte mail en mémoire avec compteurs d'appels"""
+
+    def __init__(self, message_count: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.history_id = 1000
+        # Plus ancien historyId encore disponible (en deçà : 404 comme Gmail)
+        self.min_history_id = self.history_id
+        self.history: List[Dict[str, Any]] = []
+        # 429 forcés sur les prochains messages.get : (nombre restant, Retry-After)
+        self.throttled = 0
+        self.retry_after: Optional[int] = None
+        now = datetime.now(timezone.utc)
+        for index in range(message_count):
+            self._append(self._make_message(index, now - timedelta(minutes=index * 37)))
+        self.calls: Dict[str, int] = {}
+
+    def _make_message(self, index: int, sent_at: datetime) -> Dict[str, Any]:
+        company = self.rng.choice(COMPANIES)
+        subject = self.rng.choice(SUBJECTS).format(job=self.rng.choice(JOBS), company=company)
+        body = f"Bonjour,\n\n{subject}.\n\nCordialement,\nÉquipe RH {company}"
+        return {
+            "id": f"{index:016x}",
+            "threadId": f"t{index // 3:015x}",
+            "labelIds": ["INBOX"],
+            "snippet": body[:100],
+            "internalDate": str(int(sent_at.timestamp() * 1000)),
+            "payload": {
+                "mimeType": "text/plain",
+                "headers": [
+                    {"name": "From", "value": f"rh@{company.lower().replace(' ', '')}.com"},
+                    {"name": "To", "value": "candidat@example.com"},
+                    {"name": "Subject", "value": subject},
+                    {"name": "Date", "value": format_datetime(sent_at)},
+                ],
+                "body": {"data": base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii")},
+            },
+        }
+
+    def _append(self, message: Dict[str, Any]) -> None:
+        self.history_id += 1
+        message["historyId"] = str(self.history_id)
+        self.messages[message["id"]] = message
+        self.order.append(message["id"])
+
+    def receive(self, count: int) -> List[str]:
+        """Simule l'arrivée de nouveaux messages (enregistrés dans l'historique)"""
+        now = datetime.now(timezone.utc)
+        new_ids = []
+        for _ in range(count):
+            message = self._make_message(len(self.messages), now)
+            self._append(message)
+            self.order.remove(message["id"])
+            self.order.insert(0, message["id"])
+            self.history.append({
+                "id": message["historyId"],
+                "messagesAdded": [{"message": {
+                    "id": message["id"],
+                    "threadId": message["threadId"],
+                    "labelIds": message["labelIds"],
+                }}],
+            })
+            new_ids.append(message["id"])
+        return new_ids
+
+    def expire_history(self) -> None:
+        """Rend tous les historyId antérieurs invalides"""
+        self.history_id += 1
+        self.min_history_id = self.history_id
+        self.history.clear()
+
+    def count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+
+def create_app(
+    message_count: int = 200,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 42,
+) -> FastAPI:
+    """
+    Crée l'application du faux serveur
+
+    Args:
+        message_count: Nombre de messages dans la boîte simulée
+        latency: Latence ajoutée à chaque requête HTTP (secondes)
+        error_rate: Probabilité qu'un messages.get réponde 429
+    """
+    app = FastAPI(title="Fake Gmail API")
+    mailbox = FakeMailbox(message_count, seed)
+    rng = random.Random(seed)
+    app.state.mailbox = mailbox
+
+    def get_message(message_id: str) -> Tuple[int, Dict[str, Any]]:
+        mailbox.count("messages.get")
+        if mailbox.throttled:
+            mailbox.throttled -= 1
+            return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}
+        if error_rate and rng.random() < error_rate:
+            return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}
+        message = mailbox.messages.get(message_id)
+        if message is None:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        return 200, message
+
+    @app.middleware("http")
+    async def add_latency(request: Request, call_next):
+        mailbox.count("http")
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    @app.get("/gmail/v1/users/me/profile")
+    async def get_profile():
+        mailbox.count("users.getProfile")
+        return {
+            "emailAddress": "candidat@example.com",
+            "messagesTotal": len(mailbox.order),
+            "historyId": str(mailbox.history_id),
+            "threadsTotal": len({m["threadId"] for m in mailbox.messages.values()}),
+        }
+
+    @app.get("/gmail/v1/users/me/labels")
+    async def list_labels():
+        mailbox.count("labels.list")
+        return {"labels": [{"id": "INBOX", "name": "INBOX", "type": "system"}]}
+
+    @app.get("/gmail/v1/users/me/messages")
+    async def list_messages(maxResults: int = 100, pageToken: Optional[str] = None):
+        mailbox.count("messages.list")
+        start = int(pageToken or 0)
+        page = mailbox.order[start:start + maxResults]
+        data: Dict[str, Any] = {
+            "messages": [{"id": mid, "threadId": mailbox.messages[mid]["threadId"]} for mid in page],
+            "resultSizeEstimate": len(page),
+        }
+        if start + maxResults < len(mailbox.order):
+            data["nextPageToken"] = str(start + maxResults)
+        return data
+
+    @app.get("/gmail/v1/users/me/messages/{message_id}")
+    async def get_message_endpoint(message_id: str):
+        status_code, payload = get_message(message_id)
+        headers = {}
+        if status_code == 429 and mailbox.retry_after is not None:
+            headers["Retry-After"] = str(mailbox.retry_after)
+        return JSONResponse(payload, status_code=status_code, headers=headers)
+
+    @app.get("/gmail/v1/users/me/history")
+    async def list_history(startHistoryId: int, maxResults: int = 100, pageToken: Optional[str] = None):
+        mailbox.count("history.list")
+        if startHistoryId < mailbox.min_history_id:
+            return JSONResponse({"error": {"code": 404, "message": "Requested entity was not found."}}, status_code=404)
+        records = [record for record in mailbox.history if int(record["id"]) > startHistoryId]
+        start = int(pageToken or 0)
+        data: Dict[str, Any] = {
+            "history": records[start:start + maxResults],
+            "historyId": str(mailbox.history_id),
+        }
+        if start + maxResults < len(records):
+            data["nextPageToken"] = str(start + maxResults)
+        return data
+
+    @app.post("/batch/gmail/v1")
+    async def batch(request: Request):
+        mailbox.count("batch")
+        match = re.search(r'boundary="?([^";]+)"?', request.headers.get("content-type", ""))
+        if not match:
+            return JSONResponse({"error": {"code": 400, "message": "Missing boundary"}}, status_code=400)
+
+        body = (await request.body()).decode("utf-8")
+        out_boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in body.split(f"--{match.group(1)}"):
+            part = part.strip()
+            if not part or part == "--":
+                continue
+            mime_headers, http_request = re.split(r"\r?\n\r?\n", part, maxsplit=1)
+            content_id = re.search(r"Content-ID:\s*<([^>]+)>", mime_headers, re.IGNORECASE)
+            request_line = http_request.strip().splitlines()[0]
+            path = urlsplit(request_line.split()[1]).path
+            message_id = path.rsplit("/", 1)[-1]
+            status_code, payload = get_message(message_id)
+            chunks.append(
+                f"--{out_boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id.group(1) if content_id else ''}>\r\n\r\n"
+                f"HTTP/1.1 {status_code} {'OK' if status_code == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        chunks.append(f"--{out_boundary}--\r\n")
+        return Response(
+            "".join(chunks),
+            media_type=f"multipart/mixed; boundary={out_boundary}",
+        )
+
+    @app.post("/_receive")
+    async def receive(count: int = 1):
+        return {"messages": mailbox.receive(count), "historyId": str(mailbox.history_id)}
+
+    @app.post("/_expire-history")
+    async def expire_history():
+        mailbox.expire_history()
+        return {"historyId": str(mailbox.history_id)}
+
+    @app.post("/_throttle")
+    async def throttle(count: int = 1, retry_after: Optional[int] = None):
+        mailbox.throttled = count
+        mailbox.retry_after = retry_after
+        return {"throttled": count}
+
+    @app.get("/_stats")
+    async def stats():
+        return mailbox.calls
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Gmail API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--messages", type=int, default=200, help="Nombre de messages simulés")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence par requête (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Taux de 429 sur messages.get")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(args.messages, args.latency, args.error_rate)
+    print(f"🧪 Faux serveur Gmail sur http://localhost:{args.port} ({args.messages} messages)")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()